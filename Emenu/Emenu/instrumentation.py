@@ -0,0 +1,279 @@
+"""
+Instrumentation des vues : requêtes SQL, temps base de données, temps de
+rendu des gabarits, durée totale et taille de la réponse.
+
+``InstrumentationMiddleware`` mesure chaque requête et range l'échantillon
+sous le nom de l'URL résolue (``namespace:nom``). Les ``INSTRUMENTATION_FENETRE``
+derniers échantillons de chaque vue sont conservés en mémoire, par processus,
+et résumés (centiles et histogramme de durée) sur la page ``instrumentation/``
+réservée au staff ; ``instrumentation/vider/`` (POST) les remet à zéro. Le middleware fonctionne en WSGI comme en ASGI : avec
+des vues asynchrones, la chaîne reste asynchrone, et les requêtes SQL
+exécutées par ``sync_to_async`` (dans un autre thread, donc sur une autre
+connexion) sont comptées grâce à la mesure portée par le contexte.
+
+Le temps de rendu est mesuré par le moteur de gabarits ``DjangoTemplatesMesures``,
+déclaré dans ``TEMPLATES`` à la place de ``DjangoTemplates``.
+
+Une vue peut déclarer un budget de requêtes avec ``@budget_requetes(n)`` :
+tout dépassement est journalisé et compté, et ``verifier_budget`` permet
+d'en faire une assertion dans un test.
+"""
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connection, connections
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.http import JsonResponse
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template as TemplateDjango, reraise
+from django.urls import resolve
+from django.views.decorators.http import require_POST
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures (ms) des classes de l'histogramme de durée
+CLASSES_MS = (10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_mesure_courante = contextvars.ContextVar('mesure_courante', default=None)
+
+
+class Mesure:
+    __slots__ = ('requetes', 'temps_sql', 'temps_gabarits', 'profondeur')
+
+    def __init__(self):
+        self.requetes = 0
+        self.temps_sql = 0.0
+        self.temps_gabarits = 0.0
+        self.profondeur = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Appelée par le filtre posé sur chaque connexion, pendant la requête mesurée
+        debut = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.temps_sql += time.perf_counter() - debut
+            self.requetes += 1
+
+
+class GabaritMesure(TemplateDjango):
+    def render(self, context=None, request=None):
+        mesure = _mesure_courante.get()
+        if mesure is None or mesure.profondeur:
+            # Gabarit imbriqué (formulaires crispy...) : déjà compté par le parent
+            return super().render(context, request)
+        mesure.profondeur += 1
+        debut = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            mesure.temps_gabarits += time.perf_counter() - debut
+            mesure.profondeur -= 1
+
+
+class DjangoTemplatesMesures(DjangoTemplates):
+    """Moteur ``DjangoTemplates`` dont les gabarits mesurent leur temps de rendu."""
+
+    def from_string(self, template_code):
+        return GabaritMesure(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return GabaritMesure(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
+
+
+def _mesurer_sql(execute, sql, params, many, context):
+    mesure = _mesure_courante.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    return mesure(execute, sql, params, many, context)
+
+
+def _instrumenter_connexion(connection, **kwargs):
+    # Une connexion par thread : le filtre est posé sur chacune, et la mesure en cours
+    # est lue dans le contexte, copié par sync_to_async vers le thread de la vue
+    if _mesurer_sql not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_mesurer_sql)
+
+
+def _instrumenter_connexions(**kwargs):
+    # Connexions déjà ouvertes dans le thread qui traitera la requête (request_started
+    # est émis dans ce thread, en WSGI comme par sync_to_async en ASGI)
+    for connection in connections.all(initialized_only=True):
+        _instrumenter_connexion(connection)
+
+
+class Statistiques:
+    """Fenêtre glissante des derniers échantillons, par nom de vue."""
+
+    def __init__(self, fenetre=500):
+        self.fenetre = fenetre
+        self._echantillons = {}
+        self._depassements = {}
+        self._verrou = threading.Lock()
+
+    def ajouter(self, vue, echantillon, depassement=False):
+        with self._verrou:
+            if vue not in self._echantillons:
+                self._echantillons[vue] = deque(maxlen=self.fenetre)
+            self._echantillons[vue].append(echantillon)
+            if depassement:
+                self._depassements[vue] = self._depassements.get(vue, 0) + 1
+
+    def vider(self):
+        with self._verrou:
+            self._echantillons.clear()
+            self._depassements.clear()
+
+    def resume(self):
+        with self._verrou:
+            copie = {vue: list(echantillons) for vue, echantillons in self._echantillons.items()}
+            depassements = dict(self._depassements)
+
+        resume = {}
+        for vue, echantillons in sorted(copie.items()):
+            colonnes = dict(zip(('requetes', 'sql_ms', 'gabarits_ms', 'total_ms', 'octets'), zip(*echantillons)))
+            histogramme = dict.fromkeys([f'<{borne}ms' for borne in CLASSES_MS] + ['lent'], 0)
+            for duree in colonnes['total_ms']:
+                classe = next((f'<{borne}ms' for borne in CLASSES_MS if duree < borne), 'lent')
+                histogramme[classe] += 1
+            resume[vue] = {
+                'echantillons': len(echantillons),
+                'budget': _BUDGETS_PAR_VUE.get(vue),
+                'depassements': depassements.get(vue, 0),
+                **{nom: centiles(valeurs) for nom, valeurs in colonnes.items()},
+                'histogramme_total_ms': histogramme,
+            }
+        return resume
+
+
+def centiles(valeurs):
+    valeurs = sorted(valeurs)
+    rang = lambda p: valeurs[min(len(valeurs) - 1, int(len(valeurs) * p / 100))]  # noqa: E731
+    return {'p50': round(rang(50), 2), 'p95': round(rang(95), 2), 'max': round(valeurs[-1], 2)}
+
+
+statistiques = Statistiques(fenetre=getattr(settings, 'INSTRUMENTATION_FENETRE', 500))
+
+# Budgets déclarés, par nom de vue (renseignés à la première requête mesurée)
+_BUDGETS_PAR_VUE = {}
+
+
+def budget_requetes(maximum):
+    """Déclare le nombre maximal de requêtes SQL attendu pour une vue."""
+    def decorateur(vue):
+        vue.budget_requetes = maximum
+        return vue
+    return decorateur
+
+
+def _nom_vue(request):
+    match = request.resolver_match or resolve(request.path_info)
+    return match.view_name, getattr(match.func, 'budget_requetes', None)
+
+
+class InstrumentationMiddleware:
+    # Compatible ASGI : avec des vues asynchrones, la chaîne reste asynchrone
+    # au lieu d'être exécutée dans un thread par async_to_sync
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(_instrumenter_connexion)
+        request_started.connect(_instrumenter_connexions)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        mesure = Mesure()
+        jeton = _mesure_courante.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.enregistrer(request, response, mesure, time.perf_counter() - debut)
+
+    async def __acall__(self, request):
+        mesure = Mesure()
+        jeton = _mesure_courante.set(mesure)
+        debut = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _mesure_courante.reset(jeton)
+        return self.enregistrer(request, response, mesure, time.perf_counter() - debut)
+
+    def enregistrer(self, request, response, mesure, total):
+        try:
+            vue, budget = _nom_vue(request)
+        except Exception:
+            # URL non résolue (404 du résolveur) : rien à rattacher
+            return response
+
+        depassement = budget is not None and mesure.requetes > budget
+        if budget is not None:
+            _BUDGETS_PAR_VUE[vue] = budget
+        if depassement:
+            logger.warning("%s : %d requêtes SQL pour un budget de %d", vue, mesure.requetes, budget)
+
+        taille = len(response.content) if not response.streaming else 0
+        statistiques.ajouter(vue, (
+            mesure.requetes, mesure.temps_sql * 1000, mesure.temps_gabarits * 1000, total * 1000, taille,
+        ), depassement)
+        return response
+
+
+@staff_member_required
+def tableau_instrumentation(request):
+    """Résumé des mesures par vue (JSON), avec l'état des écritures différées."""
+    from accounts.audit import login_history_writer
+
+    return JsonResponse({
+        'fenetre': statistiques.fenetre,
+        'vues': statistiques.resume(),
+        'historique_connexion': login_history_writer.stats(),
+    }, json_dumps_params={'indent': 2, 'ensure_ascii': False})
+
+
+@require_POST
+@staff_member_required
+def vider_instrumentation(request):
+    """Remet à zéro les échantillons et les dépassements de budget."""
+    statistiques.vider()
+    return JsonResponse({'vide': True})
+
+
+def verifier_budget(client, url, method='get', **kwargs):
+    """
+    Assertion pour les tests : exécute la requête avec ``client`` et échoue si
+    la vue dépasse le budget déclaré par ``@budget_requetes``. Retourne la réponse.
+    """
+    from django.test.utils import CaptureQueriesContext
+
+    match = resolve(url.split('?')[0])
+    budget = getattr(match.func, 'budget_requetes', None)
+    if budget is None:
+        raise AssertionError(f"Aucun budget de requêtes déclaré pour {match.view_name}")
+
+    with CaptureQueriesContext(connection) as requetes:
+        response = getattr(client, method)(url, **kwargs)
+    if len(requetes) > budget:
+        detail = '\n'.join(f"  {i}. {q['sql']}" for i, q in enumerate(requetes.captured_queries, 1))
+        raise AssertionError(
+            f"{match.view_name} : {len(requetes)} requêtes SQL pour un budget de {budget}\n{detail}"
+        )
+    return response
@@ -40,26 +40,42 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'menu',
     'accounts',
+    'recherche',
+    'taches',
     'crispy_forms',
     'crispy_bootstrap5',
 ]
 
 MIDDLEWARE = [
+    'Emenu.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Fichiers statiques collectés, servis avant les sessions et les vues (voir Emenu/statiques.py)
+    'Emenu.statiques.StatiquesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
 ]
 
+# Sessions lues depuis le cache (la base n'est interrogée qu'en cas d'absence),
+# écrites seulement si elles ont été modifiées. Le cache doit être partagé par
+# tous les processus (Redis, Memcached) : avec un cache propre à chaque
+# processus, une session supprimée (déconnexion, changement de mot de passe)
+# resterait valide dans les autres. settings_production refuse de démarrer
+# dans ce cas ; le cache local par défaut ne convient qu'au développement.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_SAVE_EVERY_REQUEST = False
+# Messages dans un cookie signé : un message n'entraîne aucune écriture de session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 ROOT_URLCONF = 'Emenu.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, avec le temps de rendu compté par l'instrumentation
+        'BACKEND': 'Emenu.instrumentation.DjangoTemplatesMesures',
         'DIRS': [BASE_DIR / "templates"],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -140,6 +156,12 @@ STATICFILES_DIRS = [
 # Dossier différent pour la collecte des fichiers statiques en production
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')  # Notez le nom différent
 
+# collectstatic écrit des noms à empreinte et des versions .gz/.br (voir Emenu/statiques.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'Emenu.statiques.StockageStatique'},
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -155,5 +177,46 @@ LOGOUT_REDIRECT_URL = 'accounts:login'  # Redirection après déconnexion
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Historique de connexion : écriture différée par lots (voir accounts/audit.py)
+LOGIN_HISTORY_ASYNC = True
+LOGIN_HISTORY_BATCH_SIZE = 100
+LOGIN_HISTORY_FLUSH_INTERVAL_MS = 500
+# Rétention : au-delà, les lignes sont déplacées par « manage.py archiver_historique »
+LOGIN_HISTORY_RETENTION_DAYS = 180
+LOGIN_HISTORY_ARCHIVE_DIR = os.path.join(BASE_DIR, 'archives', 'historique')
+# Limitation des tentatives de connexion (voir accounts/limitation.py) : (échecs, fenêtre en secondes)
+LOGIN_LIMITE_IP = (30, 5 * 60)
+LOGIN_LIMITE_EMAIL = (5, 5 * 60)
+# Les échecs sont journalisés par résumé, au plus toutes les N secondes
+LOGIN_RESUME_INTERVALLE = 60
+# Nombre de proxies inverses devant l'application qui ajoutent l'adresse du client à
+# X-Forwarded-For ; 0 : l'en-tête est ignoré et REMOTE_ADDR fait foi
+EMENU_PROXIES_DE_CONFIANCE = 0
+
+# Adresse publique du site, encodée dans les QR codes des menus imprimables (voir menu/impression.py)
+EMENU_URL_PUBLIQUE = 'http://localhost:8000'
+
+# Géocodage des structures (voir accounts/geocodage.py) : fonction (adresse, ville) -> (latitude, longitude)
+GEOCODEUR = 'accounts.geocodage.geocodeur_local'
+
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
-CRISPY_TEMPLATE_PACK = "bootstrap5"
\ No newline at end of file
+CRISPY_TEMPLATE_PACK = "bootstrap5"
+
+# File de tâches locale (voir taches/file.py), traitée par : python manage.py executer_taches
+# TACHES_ASYNC = False exécute les tâches après la requête, sans worker (développement)
+TACHES_ASYNC = True
+TACHES_DELAI_RETRY = 30  # secondes, doublé à chaque nouvelle tentative
+TACHES_VERROU_EXPIRATION = 600  # secondes avant de remettre en file une tâche abandonnée
+TACHES_RETENTION_JOURS = 7  # tâches terminées ou en échec supprimées au-delà (python manage.py purger_taches)
+
+# Import de plats (voir menu/import_export.py) : fichiers refusés au-delà, avant lecture
+IMPORT_PLATS_TAILLE_MAX = 5 * 1024 * 1024  # octets
+IMPORT_PLATS_LIGNES_MAX = 10000
+
+# Recherche par index inversé (voir recherche/index.py) : termes écartés au-delà de cette part
+# du corpus, si la requête en contient de plus sélectifs ; résultats classés au plus
+RECHERCHE_FREQUENCE_MAX = 0.25
+RECHERCHE_RESULTATS_MAX = 1000
+
+# Instrumentation des vues (voir Emenu/instrumentation.py) : échantillons conservés par vue
+INSTRUMENTATION_FENETRE = 500
@@ -0,0 +1,18 @@
+"""
+Réglages des mesures de performance : base SQLite locale, sans serveur MySQL.
+
+Usage : DJANGO_SETTINGS_MODULE=Emenu.settings_bench python manage.py migrate
+puis les commandes de mesure (par exemple comparer_wsgi_asgi).
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DEBUG = False
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    }
+}
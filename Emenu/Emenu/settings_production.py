@@ -0,0 +1,104 @@
+"""
+Réglages de production : connexions MySQL persistantes, vérifiées, et pool optionnel.
+
+Usage : DJANGO_SETTINGS_MODULE=Emenu.settings_production, avec les variables
+d'environnement ci-dessous.
+
+Sans ``CONN_MAX_AGE``, chaque requête ouvre une connexion MySQL (poignée de
+main TCP, authentification, ``SET sql_mode`` de ``init_command``) et la
+ferme en fin de requête. Avec des connexions persistantes, chaque processus
+ou thread WSGI garde la sienne ``EMENU_DB_CONN_MAX_AGE`` secondes ;
+``CONN_HEALTH_CHECKS`` la vérifie avant réutilisation (une connexion coupée
+par ``wait_timeout`` côté MySQL est rouverte au lieu de faire échouer la
+requête).
+
+Sous ASGI (vues asynchrones, voir Emenu/asgi.py), les connexions ne
+peuvent pas être conservées d'une requête à l'autre : il faut alors le pool
+de connexions en processus, ``EMENU_DB_POOL=1``, qui s'appuie sur le paquet
+optionnel django-db-connection-pool (``dj_db_conn_pool``).
+
+Mesure (``manage.py mesurer_connexions``, 2 000 requêtes sur l'API
+``api/structures/``, SQLite local) : 2 000 connexions ouvertes sans
+persistance, aucune avec ; 2,59 ms en moyenne par requête contre 1,98 ms,
+soit 0,6 ms de gagnés sans aucun réseau. Sur MySQL, le gain par requête
+comprend en plus l'aller-retour d'authentification et ``init_command`` :
+à mesurer avec la même commande sous ces réglages.
+
+Le cache (``EMENU_CACHE_URL``, Redis ou Memcached) est obligatoire : les
+facettes, les versions des structures, la limitation des connexions et les
+sessions (``cached_db``) doivent être partagées entre les processus ;
+``manage.py check --deploy`` le vérifie (voir accounts/checks.py).
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, EMENU_URL_PUBLIQUE
+
+DEBUG = False
+ALLOWED_HOSTS = [hote for hote in os.environ.get('EMENU_ALLOWED_HOSTS', '').split(',') if hote]
+EMENU_URL_PUBLIQUE = os.environ.get('EMENU_URL_PUBLIQUE', EMENU_URL_PUBLIQUE)
+# Proxies inverses (nginx, répartiteur de charge) devant les processus Django
+EMENU_PROXIES_DE_CONFIANCE = int(os.environ.get('EMENU_PROXIES_DE_CONFIANCE', 0))
+
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.environ.get('EMENU_DB_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('EMENU_DB_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('EMENU_DB_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ.get('EMENU_DB_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('EMENU_DB_PORT', DATABASES['default']['PORT']),
+        # Connexion conservée entre les requêtes (secondes), vérifiée avant réutilisation
+        'CONN_MAX_AGE': int(os.environ.get('EMENU_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+if os.environ.get('EMENU_DB_POOL') == '1':
+    try:
+        import dj_db_conn_pool  # noqa: F401
+    except ImportError:
+        raise ImproperlyConfigured(
+            "EMENU_DB_POOL=1 nécessite le paquet django-db-connection-pool (pip install django-db-connection-pool[mysql])."
+        )
+    DATABASES['default'].update({
+        'ENGINE': 'dj_db_conn_pool.backends.mysql',
+        # Le pool réutilise les connexions : Django les lui rend en fin de requête
+        'CONN_MAX_AGE': 0,
+        'POOL_OPTIONS': {
+            'POOL_SIZE': int(os.environ.get('EMENU_DB_POOL_TAILLE', 10)),
+            'MAX_OVERFLOW': int(os.environ.get('EMENU_DB_POOL_DEBORDEMENT', 10)),
+            # Renouvelée avant le wait_timeout MySQL (8 h par défaut)
+            'RECYCLE': 60 * 60,
+        },
+    })
+
+# Cache partagé par tous les processus, obligatoire : compteurs des facettes, versions des
+# structures (ETag de l'API, fragments), limitation des tentatives de connexion et sessions
+# y sont lus et invalidés. redis://hote:6379/0 (paquet redis) ou memcached://hote:11211 (pymemcache).
+EMENU_CACHE_URL = os.environ.get('EMENU_CACHE_URL', '')
+if EMENU_CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': EMENU_CACHE_URL,
+            'KEY_PREFIX': 'emenu',
+        },
+    }
+elif EMENU_CACHE_URL.startswith('memcached://'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': EMENU_CACHE_URL[len('memcached://'):],
+            'KEY_PREFIX': 'emenu',
+        },
+    }
+else:
+    raise ImproperlyConfigured(
+        "EMENU_CACHE_URL doit désigner un cache partagé entre processus : redis://hote:6379/0 "
+        "ou memcached://hote:11211. Sans lui, facettes, ETag de l'API, limitation des connexions "
+        "et sessions divergeraient d'un processus à l'autre."
+    )
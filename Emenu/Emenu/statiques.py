@@ -0,0 +1,232 @@
+"""
+Fichiers statiques : noms à empreinte, versions précompressées et service
+par l'application avec des en-têtes de cache longs.
+
+``StockageStatique`` (``STORAGES['staticfiles']``) : ``collectstatic``
+copie chaque fichier dans ``STATIC_ROOT`` sous son nom et sous un nom
+contenant l'empreinte de son contenu (``css/style.3f9a1c2b7e40.css``), les
+``url()`` des feuilles de style étant réécrites vers ces noms ; la balise
+``{% static %}`` renvoie le nom à empreinte. Les fichiers texte sont en
+plus écrits compressés à côté de l'original : ``.gz`` et, si le paquet
+optionnel ``brotli`` est installé, ``.br``. Aucun outil de construction
+n'est nécessaire.
+
+``StatiquesMiddleware`` sert ``STATIC_ROOT`` avant toute vue : la liste
+des fichiers est lue une fois au démarrage du processus (à redémarrer après
+``collectstatic``), la version compressée est choisie selon
+``Accept-Encoding``. Un nom à empreinte ne change jamais de contenu : il
+est servi avec un cache d'un an (``immutable``) ; les autres noms avec un
+cache court et un ETag. En DEBUG, ``runserver`` sert les fichiers depuis
+les dossiers sources et le middleware est désactivé. Sous ASGI, le
+middleware reste asynchrone et lit les fichiers par morceaux hors de la
+boucle d'événements.
+"""
+import gzip
+import logging
+import mimetypes
+import os
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS_COMPRESSIBLES = ('.css', '.js', '.svg', '.ttf', '.eot', '.ico', '.json', '.map', '.txt', '.xml', '.html')
+# Une version compressée n'est conservée que si elle gagne au moins 5 %
+GAIN_MINIMAL = 0.95
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+CACHE_COURT = 'public, max-age=60'
+# Préférence du serveur quand le client accepte les deux
+ENCODAGES = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StockageStatique(ManifestStaticFilesStorage):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._absents = set()
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        # Noms d'origine et noms à empreinte définitifs (les fichiers intermédiaires sont supprimés)
+        noms = {nom for paire in self.hashed_files.items() for nom in paire}
+        for nom in sorted(noms):
+            if nom.endswith(EXTENSIONS_COMPRESSIBLES) and self.exists(nom):
+                self.compresser(nom)
+
+    def compresser(self, nom):
+        with self.open(nom) as fichier:
+            contenu = fichier.read()
+        versions = {'.gz': gzip.compress(contenu, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            versions['.br'] = brotli.compress(contenu, quality=11)
+        for suffixe, compresse in versions.items():
+            # Fichier d'une collecte précédente : remplacé, jamais renommé
+            if self.exists(nom + suffixe):
+                self.delete(nom + suffixe)
+            if len(compresse) < len(contenu) * GAIN_MINIMAL:
+                self._save(nom + suffixe, ContentFile(compresse))
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Fichier absent de la dernière collecte : lien sous son nom d'origine, sans cache long,
+            # plutôt qu'une erreur sur toute la page
+            if name not in self._absents:
+                # Signalé une fois par processus, pas à chaque rendu
+                self._absents.add(name)
+                logger.warning("Fichier statique absent du manifeste : %s (relancer collectstatic)", name)
+            return name
+
+
+@dataclass
+class FichierStatique:
+    chemin: str
+    taille: int
+    modification: float
+    type_contenu: str
+    immuable: bool
+    # encodage -> (chemin, taille)
+    encodages: dict = field(default_factory=dict)
+
+    @property
+    def etag(self):
+        return f'{int(self.modification):x}-{self.taille:x}'
+
+
+def _type_contenu(nom):
+    type_contenu, _ = mimetypes.guess_type(nom)
+    if nom.endswith('.woff2'):
+        return 'font/woff2'
+    if type_contenu is None:
+        return 'application/octet-stream'
+    if type_contenu.startswith('text/') or type_contenu in ('application/javascript', 'application/json'):
+        return f'{type_contenu}; charset=utf-8'
+    return type_contenu
+
+
+def indexer(racine, immuables):
+    """Fichiers servis, par chemin relatif à ``racine`` (séparateur ``/``)."""
+    fichiers = {}
+    suffixes = tuple(suffixe for _, suffixe in ENCODAGES)
+    for dossier, _, noms in os.walk(racine):
+        for nom in noms:
+            chemin = os.path.join(dossier, nom)
+            relatif = os.path.relpath(chemin, racine).replace(os.sep, '/')
+            # Les versions compressées ne sont servies qu'à la place de leur original
+            if relatif.endswith(suffixes) and os.path.exists(os.path.splitext(chemin)[0]):
+                continue
+            etat = os.stat(chemin)
+            fichier = FichierStatique(chemin, etat.st_size, etat.st_mtime, _type_contenu(nom), relatif in immuables)
+            for encodage, suffixe in ENCODAGES:
+                if os.path.exists(chemin + suffixe):
+                    fichier.encodages[encodage] = (chemin + suffixe, os.path.getsize(chemin + suffixe))
+            fichiers[relatif] = fichier
+    return fichiers
+
+
+def encodages_acceptes(entete):
+    """Encodages de l'en-tête ``Accept-Encoding``, sans ceux refusés par ``q=0``."""
+    acceptes = set()
+    for element in entete.split(','):
+        encodage, _, parametres = element.strip().partition(';')
+        parametres = parametres.replace(' ', '')
+        if encodage and parametres not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            acceptes.add(encodage.lower())
+    return acceptes
+
+
+async def lire_morceaux(chemin, taille_morceau=64 * 1024):
+    """Contenu d'un fichier par morceaux, lus hors de la boucle d'événements (ASGI)."""
+    fichier = await sync_to_async(open, thread_sensitive=False)(chemin, 'rb')
+    try:
+        while morceau := await sync_to_async(fichier.read, thread_sensitive=False)(taille_morceau):
+            yield morceau
+    finally:
+        await sync_to_async(fichier.close, thread_sensitive=False)()
+
+
+class StatiquesMiddleware:
+    # Compatible ASGI : un fichier est servi sans faire passer la requête par un thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        if settings.DEBUG or not settings.STATIC_ROOT or not os.path.isdir(settings.STATIC_ROOT):
+            raise MiddlewareNotUsed
+        self.prefixe = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else f'/{settings.STATIC_URL}'
+        immuables = set(getattr(staticfiles_storage, 'hashed_files', {}).values())
+        self.fichiers = indexer(settings.STATIC_ROOT, immuables)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        fichier = self.trouver(request)
+        if fichier is not None:
+            return self.servir(request, fichier)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        fichier = self.trouver(request)
+        if fichier is not None:
+            return self.servir(request, fichier, lecture=lire_morceaux)
+        return await self.get_response(request)
+
+    def trouver(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefixe):
+            return self.fichiers.get(request.path_info[len(self.prefixe):])
+        return None
+
+    def servir(self, request, fichier, lecture=None):
+        """
+        Réponse pour ``fichier`` ; ``lecture(chemin)``, générateur asynchrone,
+        remplace la lecture synchrone de FileResponse sous ASGI.
+        """
+        chemin, taille, encodage = fichier.chemin, fichier.taille, None
+        acceptes = encodages_acceptes(request.headers.get('Accept-Encoding', ''))
+        for nom, _ in ENCODAGES:
+            if nom in acceptes and nom in fichier.encodages:
+                encodage = nom
+                chemin, taille = fichier.encodages[nom]
+                break
+
+        # Une représentation par encodage : chacune son ETag
+        etag = f'"{fichier.etag}-{encodage}"' if encodage else f'"{fichier.etag}"'
+        entetes = {
+            'ETag': etag,
+            'Cache-Control': CACHE_IMMUABLE if fichier.immuable else CACHE_COURT,
+            'Last-Modified': http_date(fichier.modification),
+        }
+        if fichier.encodages:
+            entetes['Vary'] = 'Accept-Encoding'
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponseNotModified(headers=entetes)
+
+        if request.method == 'HEAD':
+            response = HttpResponse(content_type=fichier.type_contenu, headers=entetes)
+        elif lecture is not None:
+            response = StreamingHttpResponse(lecture(chemin), content_type=fichier.type_contenu, headers=entetes)
+        else:
+            response = FileResponse(open(chemin, 'rb'), content_type=fichier.type_contenu, headers=entetes)
+            response.headers.pop('Content-Disposition', None)
+        response['Content-Length'] = str(taille)
+        if encodage:
+            response['Content-Encoding'] = encodage
+        return response
@@ -0,0 +1,122 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from asgiref.sync import async_to_sync
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .statiques import CACHE_COURT, CACHE_IMMUABLE, StatiquesMiddleware, StockageStatique, indexer
+
+FEUILLE = b'body { color: #333; margin: 0; }\n' * 200
+
+
+class StatiquesMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        self.racine = tempfile.mkdtemp(prefix='emenu-static-')
+        self.addCleanup(shutil.rmtree, self.racine, ignore_errors=True)
+        os.makedirs(os.path.join(self.racine, 'css'))
+        for nom in ('style.css', 'style.3f9a1c2b7e40.css'):
+            chemin = os.path.join(self.racine, 'css', nom)
+            with open(chemin, 'wb') as fichier:
+                fichier.write(FEUILLE)
+            with open(chemin + '.gz', 'wb') as fichier:
+                fichier.write(gzip.compress(FEUILLE))
+            with open(chemin + '.br', 'wb') as fichier:
+                fichier.write(b'br' * 10)
+        with open(os.path.join(self.racine, 'logo.png'), 'wb') as fichier:
+            fichier.write(b'\x89PNG')
+        self.factory = RequestFactory()
+
+    def middleware(self, get_response=lambda request: HttpResponse('vue')):
+        with override_settings(DEBUG=False, STATIC_ROOT=self.racine):
+            middleware = StatiquesMiddleware(get_response)
+        # Seul le nom à empreinte figure au manifeste
+        middleware.fichiers = indexer(self.racine, {'css/style.3f9a1c2b7e40.css'})
+        return middleware
+
+    def get(self, chemin, **entetes):
+        return self.middleware()(self.factory.get(chemin, **entetes))
+
+    def test_desactive_en_debug(self):
+        with override_settings(DEBUG=True, STATIC_ROOT=self.racine):
+            with self.assertRaises(MiddlewareNotUsed):
+                StatiquesMiddleware(lambda request: HttpResponse())
+
+    def test_cache_immuable_des_noms_a_empreinte(self):
+        self.assertEqual(self.get('/static/css/style.3f9a1c2b7e40.css')['Cache-Control'], CACHE_IMMUABLE)
+        self.assertEqual(self.get('/static/css/style.css')['Cache-Control'], CACHE_COURT)
+
+    def test_etag_et_304(self):
+        response = self.get('/static/logo.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'\x89PNG')
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertNotIn('Vary', response)
+        non_modifie = self.get('/static/logo.png', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(non_modifie.status_code, 304)
+        self.assertEqual(non_modifie['ETag'], response['ETag'])
+        self.assertEqual(self.get('/static/logo.png', HTTP_IF_NONE_MATCH='"autre"').status_code, 200)
+
+    def test_choix_de_la_version_compressee(self):
+        etags = set()
+        for accept, encodage, taille in (
+            ('gzip, deflate, br', 'br', 20),
+            ('gzip', 'gzip', len(gzip.compress(FEUILLE))),
+            ('br;q=0, gzip', 'gzip', len(gzip.compress(FEUILLE))),
+            ('', None, len(FEUILLE)),
+        ):
+            response = self.get('/static/css/style.css', HTTP_ACCEPT_ENCODING=accept)
+            self.assertEqual(response.get('Content-Encoding'), encodage, accept)
+            self.assertEqual(response['Content-Length'], str(taille))
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertEqual(response['Content-Type'], 'text/css; charset=utf-8')
+            etags.add(response['ETag'])
+        # Une représentation par encodage : chacune son ETag
+        self.assertEqual(len(etags), 3)
+        gz = self.get('/static/css/style.css', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(gzip.decompress(b''.join(gz.streaming_content)), FEUILLE)
+
+    def test_autres_requetes_transmises(self):
+        for requete in (self.factory.get('/static/absent.css'), self.factory.get('/menus/'),
+                        self.factory.post('/static/logo.png')):
+            self.assertEqual(self.middleware()(requete).content, b'vue')
+        self.assertNotIn('css/style.css.gz', self.middleware().fichiers)
+
+    def test_head(self):
+        response = self.middleware()(self.factory.head('/static/logo.png'))
+        self.assertEqual((response.status_code, response.content, response['Content-Length']), (200, b'', '4'))
+
+    def test_asynchrone(self):
+        async def vue(request):
+            return HttpResponse('vue')
+
+        middleware = self.middleware(vue)
+
+        async def lire(requete):
+            response = await middleware(requete)
+            if response.streaming:
+                return response, b''.join([morceau async for morceau in response.streaming_content])
+            return response, response.content
+
+        response, contenu = async_to_sync(lire)(self.factory.get('/static/css/style.css', HTTP_ACCEPT_ENCODING='gzip'))
+        self.assertEqual((response['Content-Encoding'], gzip.decompress(contenu)), ('gzip', FEUILLE))
+        self.assertEqual(async_to_sync(lire)(self.factory.get('/menus/'))[1], b'vue')
+
+
+class StockageStatiqueTests(SimpleTestCase):
+    def test_compression(self):
+        racine = tempfile.mkdtemp(prefix='emenu-static-')
+        self.addCleanup(shutil.rmtree, racine, ignore_errors=True)
+        stockage = StockageStatique(location=racine)
+        stockage._save('css/style.css', ContentFile(FEUILLE))
+        stockage._save('js/court.js', ContentFile(b'x'))
+        stockage.compresser('css/style.css')
+        stockage.compresser('js/court.js')
+        with stockage.open('css/style.css.gz') as fichier:
+            self.assertEqual(gzip.decompress(fichier.read()), FEUILLE)
+        # Moins de 5 % de gain : pas de version compressée
+        self.assertFalse(stockage.exists('js/court.js.gz'))
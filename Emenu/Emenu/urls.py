@@ -1,8 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from .instrumentation import tableau_instrumentation, vider_instrumentation
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('instrumentation/', tableau_instrumentation, name='instrumentation'),
+    path('instrumentation/vider/', vider_instrumentation, name='instrumentation-vider'),
     path('', include('accounts.urls')),
     path('', include('menu.urls')),
+    path('', include('recherche.urls')),
 ]
\ No newline at end of file
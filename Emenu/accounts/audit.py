@@ -0,0 +1,126 @@
+"""
+Écriture différée de l'historique de connexion (UserLoginHistory).
+
+Les vues ne font plus d'INSERT : elles déposent un événement dans une file
+en mémoire. Un thread d'arrière-plan regroupe les événements et les écrit
+par ``bulk_create``, dès que ``LOGIN_HISTORY_BATCH_SIZE`` événements sont
+en attente ou au plus tard après ``LOGIN_HISTORY_FLUSH_INTERVAL_MS``.
+
+Les tentatives échouées sont déposées avec l'email saisi ; la résolution en
+utilisateur se fait au moment de l'écriture, en une requête par lot. La file
+est vidée à l'arrêt du processus (atexit).
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class LoginHistoryWriter:
+    def __init__(self, batch_size=100, flush_interval_ms=500, max_queue_size=10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue_size = max_queue_size
+        self.ecrits = 0
+        self.perdus = 0
+        self._verrou = threading.Lock()
+        self._pid = None
+        self._thread = None
+
+    def _demarrer(self):
+        # Démarrage paresseux, et à nouveau dans chaque processus issu d'un fork
+        with self._verrou:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._file = queue.Queue(maxsize=self.max_queue_size)
+            self._arret = threading.Event()
+            self._thread = threading.Thread(target=self._boucle, name='login-history-writer', daemon=True)
+            self._thread.start()
+
+    def enregistrer(self, **evenement):
+        """Dépose un événement (champs de UserLoginHistory, ``user_id`` ou ``email``)."""
+        evenement.setdefault('login_time', timezone.now())
+        if not getattr(settings, 'LOGIN_HISTORY_ASYNC', True):
+            self._ecrire([evenement])
+            return
+
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            self._demarrer()
+        try:
+            self._file.put_nowait(evenement)
+        except queue.Full:
+            # Ne jamais bloquer une requête : l'événement est abandonné et comptabilisé
+            self.perdus += 1
+
+    def profondeur(self):
+        """Nombre d'événements en attente d'écriture."""
+        return self._file.qsize() if self._thread else 0
+
+    def stats(self):
+        return {'profondeur': self.profondeur(), 'ecrits': self.ecrits, 'perdus': self.perdus}
+
+    def _boucle(self):
+        while not (self._arret.is_set() and self._file.empty()):
+            lot = []
+            echeance = time.monotonic() + self.flush_interval
+            while len(lot) < self.batch_size:
+                reste = echeance - time.monotonic()
+                try:
+                    if self._arret.is_set():
+                        # Arrêt demandé : vidage sans attente
+                        lot.append(self._file.get_nowait())
+                    elif reste > 0:
+                        lot.append(self._file.get(timeout=reste))
+                    else:
+                        break
+                except queue.Empty:
+                    break
+            if lot:
+                self._ecrire(lot)
+
+    def _ecrire(self, lot):
+        from .models import User, UserLoginHistory
+
+        try:
+            emails = {e['email'] for e in lot if not e.get('user_id') and e.get('email')}
+            users = dict(User.objects.filter(email__in=emails).values_list('email', 'pk')) if emails else {}
+
+            lignes = []
+            for evenement in lot:
+                evenement = dict(evenement)
+                email = evenement.pop('email', None)
+                evenement['user_id'] = evenement.get('user_id') or users.get(email)
+                # Email inconnu : comme auparavant, rien n'est enregistré
+                if evenement['user_id']:
+                    lignes.append(UserLoginHistory(**evenement))
+
+            UserLoginHistory.objects.bulk_create(lignes)
+            self.ecrits += len(lignes)
+        except Exception:
+            self.perdus += len(lot)
+            logger.exception("Échec d'écriture de %d événement(s) de connexion", len(lot))
+        finally:
+            if threading.current_thread() is self._thread:
+                close_old_connections()
+
+    def arreter(self, timeout=5):
+        """Vide la file puis arrête le thread d'écriture."""
+        if self._thread and self._thread.is_alive() and self._pid == os.getpid():
+            self._arret.set()
+            self._thread.join(timeout)
+
+
+login_history_writer = LoginHistoryWriter(
+    batch_size=getattr(settings, 'LOGIN_HISTORY_BATCH_SIZE', 100),
+    flush_interval_ms=getattr(settings, 'LOGIN_HISTORY_FLUSH_INTERVAL_MS', 500),
+)
+atexit.register(login_history_writer.arreter)
@@ -0,0 +1,28 @@
+"""
+Vérifications de déploiement (``manage.py check --deploy``), valables quel
+que soit le module de réglages utilisé.
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Caches propres à chaque processus : une session supprimée dans l'un resterait lue depuis les autres
+CACHES_LOCAUX = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def verifier_cache_sessions(app_configs, **kwargs):
+    """Refuse des sessions en cache servies par un cache non partagé entre processus."""
+    if not settings.SESSION_ENGINE.startswith('django.contrib.sessions.backends.cache'):
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in CACHES_LOCAUX:
+        return []
+    return [Error(
+        f"SESSION_ENGINE={settings.SESSION_ENGINE} nécessite un cache partagé entre processus, pas {backend}.",
+        hint="Définissez EMENU_CACHE_URL (redis://hote:6379/0 ou memcached://hote:11211).",
+        id='accounts.E001',
+    )]
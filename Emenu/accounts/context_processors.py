@@ -1,8 +1,11 @@
-from .models import Structure
+from django.utils.functional import SimpleLazyObject
+
+from .structure_utilisateur import a_une_structure
+
 
 def structure_context(request):
     if request.user.is_authenticated:
-        return {
-            'has_structure': Structure.objects.filter(user=request.user).exists()
-        }
-    return {}
\ No newline at end of file
+        user_id = request.user.pk
+        # Évalué seulement si le gabarit le lit, puis servi depuis le cache
+        return {'has_structure': SimpleLazyObject(lambda: a_une_structure(user_id))}
+    return {}
@@ -0,0 +1,51 @@
+"""
+Compteurs de structures par type et par ville (facettes de l'annuaire).
+
+Les compteurs sont calculés par un GROUP BY puis conservés dans le cache
+Django ; les signaux de ``accounts.signals`` suppriment l'entrée après
+chaque création, suppression ou changement de type ou de ville d'une
+structure, et le lecteur suivant la recalcule. Modifier l'entrée en place
+(lecture, delta, écriture) perdrait des mises à jour entre processus
+concurrents. Une lecture ne coûte donc qu'un accès au cache, tant que les
+structures ne changent pas.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Structure
+
+FACETTES_CACHE_KEY = 'structures:facettes'
+# Recalcul complet périodique pour rattraper une éventuelle dérive
+FACETTES_TIMEOUT = 60 * 60
+
+
+def calculer_facettes():
+    """Recalcule les compteurs depuis la base (un GROUP BY par dimension)."""
+    base = Structure.objects.order_by()
+    return {
+        'type': dict(base.values_list('type').annotate(n=Count('id'))),
+        'ville': dict(base.values_list('ville').annotate(n=Count('id'))),
+    }
+
+
+def get_facettes():
+    """Retourne ``{'type': {...}, 'ville': {...}}`` depuis le cache."""
+    facettes = cache.get(FACETTES_CACHE_KEY)
+    if facettes is None:
+        facettes = calculer_facettes()
+        cache.set(FACETTES_CACHE_KEY, facettes, FACETTES_TIMEOUT)
+    return facettes
+
+
+async def aget_facettes():
+    """Version asynchrone de ``get_facettes`` (API de cache asynchrone)."""
+    facettes = await cache.aget(FACETTES_CACHE_KEY)
+    if facettes is None:
+        facettes = await sync_to_async(calculer_facettes)()
+        await cache.aset(FACETTES_CACHE_KEY, facettes, FACETTES_TIMEOUT)
+    return facettes
+
+
+def invalider_facettes():
+    cache.delete(FACETTES_CACHE_KEY)
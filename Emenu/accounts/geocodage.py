@@ -0,0 +1,43 @@
+"""
+Géocodage des structures (adresse et ville vers latitude et longitude).
+
+Le géocodeur est interchangeable : ``GEOCODEUR`` désigne (chemin pointé)
+une fonction ``geocodeur(adresse, ville)`` qui retourne un couple
+(latitude, longitude) ou None. Par défaut, ``geocodeur_local`` se contente
+d'une table locale des centres des villes, sans accès réseau : suffisant
+pour les tests et pour un premier placement. Un service externe se branche
+en écrivant une autre fonction de même signature.
+
+Le géocodage se fait hors requête, par lot : ``manage.py geocoder_structures``.
+"""
+import unicodedata
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+COORDONNEES_VILLES = {
+    'lome': (6.1319, 1.2228),
+    'kara': (9.5511, 1.1861),
+    'sokode': (8.9833, 1.1333),
+    'kpalime': (6.9000, 0.6333),
+    'atakpame': (7.5333, 1.1333),
+    'dapaong': (10.8622, 0.2076),
+    'tsevie': (6.4261, 1.2133),
+    'aneho': (6.2280, 1.5919),
+    'bassar': (9.2500, 0.7833),
+    'mango': (10.3592, 0.4708),
+}
+
+
+def _normaliser(texte):
+    texte = unicodedata.normalize('NFKD', texte or '').encode('ascii', 'ignore').decode()
+    return ' '.join(texte.lower().replace('-', ' ').split())
+
+
+def geocodeur_local(adresse, ville):
+    """Centre de la ville d'après la table locale, ou None si elle n'y figure pas."""
+    return COORDONNEES_VILLES.get(_normaliser(ville))
+
+
+def get_geocodeur():
+    return import_string(getattr(settings, 'GEOCODEUR', 'accounts.geocodage.geocodeur_local'))
@@ -0,0 +1,209 @@
+"""
+Déclinaisons redimensionnées des photos (plats, structures, utilisateurs).
+
+Chaque photo est déclinée en plusieurs largeurs, en WebP et en JPEG, à côté
+de l'original : ``plats/riz.jpg`` donne par exemple
+``plats/riz.3f9a1c2b7e40.400w.webp``. L'empreinte du contenu dans le nom rend
+les fichiers immuables (cache navigateur illimité) et la génération
+idempotente. La liste des déclinaisons est conservée dans le champ JSON
+``photo_variantes`` du modèle, lu par la balise ``{% image_responsive %}``
+sans aucun accès disque.
+
+Le traitement (normalisation de l'original puis déclinaisons) ne se fait pas
+pendant la requête de téléversement : il est confié à la file de tâches
+(voir taches/file.py) et son avancement est suivi dans ``photo_statut``.
+Une fois la nouvelle photo enregistrée, les fichiers de la précédente sont
+supprimés : aucun menu publié ne cite de fichier (voir menu/publication.py).
+"""
+import hashlib
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+LARGEURS = (200, 400, 800)
+# Largeur maximale de l'original une fois normalisé
+LARGEUR_MAX = 1600
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def generer_variantes(nom, storage=default_storage):
+    """Génère les déclinaisons de l'image ``nom`` et retourne leur description."""
+    with storage.open(nom, 'rb') as fichier:
+        contenu = fichier.read()
+    empreinte = hashlib.sha256(contenu).hexdigest()[:12]
+
+    image = ImageOps.exif_transpose(Image.open(BytesIO(contenu)))
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    racine = os.path.splitext(nom)[0]
+    variantes = {'source': nom, 'empreinte': empreinte, 'formats': {ext: {} for ext in FORMATS}}
+    # Pas d'agrandissement : les largeurs supérieures à l'original sont ignorées
+    largeurs = sorted({min(largeur, image.width) for largeur in LARGEURS})
+    crees = []
+    try:
+        for largeur in largeurs:
+            hauteur = max(1, round(image.height * largeur / image.width))
+            reduite = image.resize((largeur, hauteur), Image.LANCZOS) if largeur != image.width else image
+            for ext, (format_pil, options) in FORMATS.items():
+                chemin = f"{racine}.{empreinte}.{largeur}w.{ext}"
+                if not storage.exists(chemin):
+                    tampon = BytesIO()
+                    reduite.save(tampon, format_pil, **options)
+                    chemin = storage.save(chemin, ContentFile(tampon.getvalue()))
+                    crees.append(chemin)
+                variantes['formats'][ext][str(largeur)] = chemin
+    except Exception:
+        # Pas de déclinaisons partielles laissées par une tentative en erreur
+        supprimer_fichiers(crees, storage)
+        raise
+    return variantes
+
+
+def chemins_variantes(variantes):
+    """Chemins de toutes les déclinaisons décrites par ``variantes``."""
+    return [chemin for declinaisons in (variantes or {}).get('formats', {}).values()
+            for chemin in declinaisons.values()]
+
+
+def supprimer_fichiers(chemins, storage=default_storage):
+    for chemin in chemins:
+        storage.delete(chemin)
+
+
+def urls_photo(ligne):
+    """
+    Remplace, dans une ligne ``values()``, les chemins de la photo et de ses
+    déclinaisons par leurs URL : ``photo`` et ``photo_variantes`` (par format
+    puis par largeur). Déclinaisons vides tant qu'elles ne correspondent pas à
+    la photo actuelle.
+    """
+    nom = ligne.pop('photo')
+    variantes = ligne.pop('photo_variantes') or {}
+    ligne['photo'] = default_storage.url(nom) if nom else None
+    if nom and variantes.get('source') == nom:
+        ligne['photo_variantes'] = {
+            ext: {largeur: default_storage.url(chemin) for largeur, chemin in declinaisons.items()}
+            for ext, declinaisons in variantes['formats'].items()
+        }
+    else:
+        ligne['photo_variantes'] = {}
+    return ligne
+
+
+def normaliser_image(nom, storage=default_storage):
+    """
+    Normalise l'original : orientation EXIF appliquée puis métadonnées retirées,
+    réduction à ``LARGEUR_MAX`` et réencodage en JPEG. Retourne le nom du
+    nouveau fichier, l'original restant en place.
+    """
+    with storage.open(nom, 'rb') as fichier:
+        image = Image.open(BytesIO(fichier.read()))
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        fond = Image.new('RGB', image.size, (255, 255, 255))
+        fond.paste(image, mask=image.getchannel('A'))
+        image = fond
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.width > LARGEUR_MAX:
+        image = image.resize((LARGEUR_MAX, max(1, round(image.height * LARGEUR_MAX / image.width))), Image.LANCZOS)
+
+    tampon = BytesIO()
+    # Sans paramètre exif, Pillow n'écrit aucune métadonnée
+    image.save(tampon, 'JPEG', **FORMATS['jpeg'][1])
+    return storage.save(os.path.splitext(nom)[0] + '.jpg', ContentFile(tampon.getvalue()))
+
+
+def supprimer_remplaces(chemins, conserver=(), storage=default_storage):
+    """Supprime les fichiers d'une photo remplacée, sauf ceux de ``conserver``."""
+    supprimer_fichiers(sorted(set(chemins) - set(conserver)), storage)
+
+
+def traiter_photo(model, pk, photo, remplaces=()):
+    """
+    Normalise la photo ``photo`` de l'objet puis génère ses déclinaisons.
+    Retourne False si la photo a été remplacée ou l'objet supprimé entre-temps.
+    Les fichiers ``remplaces`` de la photo précédente sont supprimés une fois
+    la nouvelle enregistrée.
+    """
+    if not photo:
+        # Photo retirée : il ne reste que les fichiers de la précédente à supprimer
+        supprimer_remplaces(remplaces)
+        return False
+    if not model.objects.filter(pk=pk, photo=photo).exists():
+        return False
+    nom = normaliser_image(photo)
+    try:
+        variantes = generer_variantes(nom)
+    except Exception:
+        # Chaque tentative normalise sous un nouveau nom : celui-ci ne servira plus
+        default_storage.delete(nom)
+        raise
+    # Condition sur photo : une photo téléversée pendant le traitement n'est pas écrasée
+    if not model.objects.filter(pk=pk, photo=photo).update(photo=nom, photo_variantes=variantes,
+                                                            photo_statut='traitee'):
+        # Fichiers propres à ce nom normalisé, cités nulle part
+        supprimer_fichiers([nom, *chemins_variantes(variantes)])
+        return False
+    # L'original n'est supprimé qu'une fois la base à jour : une nouvelle tentative reste possible
+    default_storage.delete(photo)
+    supprimer_remplaces(remplaces, conserver=[nom, *chemins_variantes(variantes)])
+    return True
+
+
+def fichiers_remplaces(instance):
+    """
+    Original et déclinaisons de la photo précédant la sauvegarde (voir
+    ``memoriser_photo``), à supprimer une fois la nouvelle traitée.
+    """
+    avant = getattr(instance, '_photo_avant', None) or ''
+    if not avant or avant == (instance.photo.name or ''):
+        return []
+    variantes = getattr(instance, '_variantes_avant', None) or {}
+    return [avant, *(chemins_variantes(variantes) if variantes.get('source') == avant else [])]
+
+
+def photo_modifiee(instance, created, update_fields=None):
+    """Indique si la sauvegarde a changé la photo (voir ``memoriser_photo``)."""
+    if update_fields is not None and 'photo' not in update_fields:
+        return False
+    nom = instance.photo.name or ''
+    if created:
+        return bool(nom)
+    return nom != (getattr(instance, '_photo_avant', None) or '')
+
+
+def memoriser_photo(instance, update_fields=None):
+    """À appeler en pre_save : conserve le nom de la photo et ses déclinaisons avant modification."""
+    if instance.pk and (update_fields is None or 'photo' in update_fields):
+        instance._photo_avant, instance._variantes_avant = type(instance).objects.filter(pk=instance.pk).values_list(
+            'photo', 'photo_variantes').first() or (None, None)
+
+
+def planifier_traitement_photo(instance, nom_tache, **arguments):
+    """
+    Marque la photo en attente et confie son traitement à la file de tâches,
+    avec la suppression des fichiers de la photo précédente.
+    """
+    from taches.file import planifier
+
+    nom = instance.photo.name or ''
+    remplaces = fichiers_remplaces(instance)
+    instance.photo_variantes = {}
+    instance.photo_statut = 'en_attente' if nom else ''
+    # update() plutôt que save() : pas de nouveau post_save
+    type(instance).objects.filter(pk=instance.pk).update(
+        photo_variantes=instance.photo_variantes, photo_statut=instance.photo_statut,
+    )
+    # Photo retirée : la tâche ne fait que supprimer les fichiers de la précédente
+    if nom or remplaces:
+        planifier(nom_tache, pk=instance.pk, photo=nom, remplaces=remplaces, **arguments)
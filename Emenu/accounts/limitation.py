@@ -0,0 +1,120 @@
+"""
+Limitation des tentatives de connexion, par adresse IP et par email.
+
+Chaque échec incrémente deux compteurs dans le cache Django (locmem, Redis...),
+sans aucune écriture en base. Une tentative est refusée avant
+``authenticate()``, donc sans requête SQL ni hachage de mot de passe, dès
+qu'un compteur atteint sa limite sur la fenêtre glissante : la fenêtre est
+estimée à partir de la tranche en cours et de la précédente, pondérée par
+la part de celle-ci encore couverte (deux entiers par clé, quel que soit le
+nombre de tentatives).
+
+Les échecs ne sont plus journalisés un à un : ils sont comptés en mémoire,
+par email et adresse IP, et un résumé (une ligne ``FAILED_ATTEMPT`` avec le
+nombre de tentatives) est confié à l'écriture différée de l'historique (voir
+audit.py) au plus toutes les ``LOGIN_RESUME_INTERVALLE`` secondes.
+
+Réglages : ``LOGIN_LIMITE_IP`` et ``LOGIN_LIMITE_EMAIL``, couples
+(nombre d'échecs, fenêtre en secondes), ou None pour désactiver.
+"""
+import atexit
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .audit import login_history_writer
+
+
+def _cle(nom, valeur, tranche):
+    # Empreinte : l'email saisi peut contenir n'importe quel caractère
+    empreinte = hashlib.sha256(valeur.encode()).hexdigest()[:20]
+    return f'connexion:{nom}:{empreinte}:{tranche}'
+
+
+class LimiteurConnexion:
+    def __init__(self):
+        self._echecs = Counter()
+        self._verrou = threading.Lock()
+        self._dernier_resume = time.monotonic()
+
+    def _limites(self, ip, email):
+        for nom, valeur, reglage in (('ip', ip, 'LOGIN_LIMITE_IP'), ('email', email, 'LOGIN_LIMITE_EMAIL')):
+            limite = getattr(settings, reglage, None)
+            if limite and valeur:
+                yield nom, valeur, limite
+
+    def attente(self, ip, email):
+        """
+        Secondes à attendre avant une nouvelle tentative, ou 0 si elle est
+        permise. Une seule lecture du cache pour les deux compteurs.
+        """
+        email = email.strip().lower()
+        maintenant = time.time()
+        limites = list(self._limites(ip, email))
+        cles = {}
+        for nom, valeur, (_, fenetre) in limites:
+            tranche = int(maintenant // fenetre)
+            cles[nom] = (_cle(nom, valeur, tranche), _cle(nom, valeur, tranche - 1))
+        valeurs = cache.get_many([cle for paire in cles.values() for cle in paire])
+
+        attente = 0
+        for nom, _, (maximum, fenetre) in limites:
+            courante, precedente = cles[nom]
+            ecoule = maintenant % fenetre
+            estimation = valeurs.get(courante, 0) + valeurs.get(precedente, 0) * (1 - ecoule / fenetre)
+            if estimation >= maximum:
+                attente = max(attente, math.ceil(fenetre - ecoule))
+        return attente
+
+    def echec(self, ip, email, user_agent=''):
+        """Compte un échec dans le cache et dans le résumé en mémoire."""
+        email = email.strip().lower()
+        maintenant = time.time()
+        for nom, valeur, (_, fenetre) in self._limites(ip, email):
+            cle = _cle(nom, valeur, int(maintenant // fenetre))
+            # La tranche doit survivre à la suivante, où elle sert d'estimation
+            cache.add(cle, 0, timeout=2 * fenetre)
+            try:
+                cache.incr(cle)
+            except ValueError:
+                # Expirée entre add() et incr()
+                cache.set(cle, 1, timeout=2 * fenetre)
+
+        if email:
+            with self._verrou:
+                self._echecs[(email, ip, user_agent[:255])] += 1
+        self.publier_resume()
+
+    def reussite(self, email):
+        """Connexion réussie : le compteur de l'email repart de zéro (pas celui de l'adresse IP)."""
+        email = email.strip().lower()
+        for nom, valeur, (_, fenetre) in self._limites(None, email):
+            tranche = int(time.time() // fenetre)
+            cache.delete_many([_cle(nom, valeur, tranche), _cle(nom, valeur, tranche - 1)])
+
+    def publier_resume(self, forcer=False):
+        """Confie à l'historique les échecs comptés depuis le dernier résumé."""
+        intervalle = getattr(settings, 'LOGIN_RESUME_INTERVALLE', 60)
+        with self._verrou:
+            if not self._echecs or (not forcer and time.monotonic() - self._dernier_resume < intervalle):
+                return
+            echecs, self._echecs = self._echecs, Counter()
+            self._dernier_resume = time.monotonic()
+
+        maintenant = timezone.now()
+        for (email, ip, user_agent), nombre in echecs.items():
+            login_history_writer.enregistrer(
+                email=email, ip_address=ip, user_agent=user_agent, login_success=False,
+                action='FAILED_ATTEMPT', tentatives=nombre, login_time=maintenant,
+            )
+
+
+limiteur_connexion = LimiteurConnexion()
+# Avant l'arrêt de l'écriture différée (atexit exécute dans l'ordre inverse)
+atexit.register(limiteur_connexion.publier_resume, forcer=True)
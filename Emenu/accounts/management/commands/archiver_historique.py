@@ -0,0 +1,144 @@
+import glob
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.models import UserLoginHistory
+
+CHAMPS = ['id', 'user_id', 'login_time', 'ip_address', 'user_agent', 'login_success', 'action', 'tentatives']
+
+
+class Command(BaseCommand):
+    help = (
+        "Déplace l'historique de connexion plus ancien que la fenêtre de rétention vers des "
+        "archives mensuelles (fichiers JSONL compressés ou tables), par lots de taille bornée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=settings.LOGIN_HISTORY_RETENTION_DAYS,
+                            help="Fenêtre de rétention en jours")
+        parser.add_argument('--batch', type=int, default=5000, help="Nombre de lignes déplacées par lot")
+        parser.add_argument('--format', choices=['jsonl', 'table'], default='jsonl',
+                            help="jsonl : fichiers historique-AAAA-MM.jsonl.gz ; table : tables <table>_AAAAMM")
+        parser.add_argument('--dossier', default=settings.LOGIN_HISTORY_ARCHIVE_DIR,
+                            help="Dossier des archives JSONL")
+        parser.add_argument('--dry-run', action='store_true', help="Affiche le volume concerné sans rien déplacer")
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['jours'])
+        anciennes = UserLoginHistory.objects.filter(login_time__lt=limite)
+
+        if options['dry_run']:
+            self.stdout.write(f"{anciennes.count()} ligne(s) antérieure(s) au {limite:%Y-%m-%d} à archiver.")
+            return
+
+        if options['format'] == 'jsonl':
+            os.makedirs(options['dossier'], exist_ok=True)
+            self.reprendre(options['dossier'])
+
+        total = 0
+        while True:
+            # Lot borné, lu via l'index sur login_time
+            lot = list(anciennes.order_by('login_time', 'id').values(*CHAMPS)[:options['batch']])
+            if not lot:
+                break
+
+            par_mois = {}
+            for ligne in lot:
+                par_mois.setdefault(ligne['login_time'].strftime('%Y%m'), []).append(ligne)
+
+            if options['format'] == 'jsonl':
+                # Lot écrit à part, ajouté aux archives seulement une fois le DELETE validé
+                temporaires = [self.ecrire_jsonl(options['dossier'], mois, lignes) for mois, lignes in par_mois.items()]
+                try:
+                    with transaction.atomic():
+                        self.supprimer(lot)
+                except BaseException:
+                    for temporaire in temporaires:
+                        os.remove(temporaire)
+                    raise
+                for temporaire in temporaires:
+                    self.fusionner(temporaire)
+            else:
+                # Sur MySQL, CREATE TABLE valide implicitement la transaction : tables créées avant
+                for mois in par_mois:
+                    self.creer_table(mois)
+                with transaction.atomic():
+                    for mois, lignes in par_mois.items():
+                        self.copier_table(mois, [ligne['id'] for ligne in lignes])
+                    self.supprimer(lot)
+
+            total += len(lot)
+            self.stdout.write(f"{total} ligne(s) archivée(s)...")
+
+        self.stdout.write(self.style.SUCCESS(f"Archivage terminé : {total} ligne(s) déplacée(s)."))
+
+    def supprimer(self, lot):
+        # Aucune dépendance ni signal sur ce modèle : un seul DELETE par lot
+        UserLoginHistory.objects.filter(pk__in=[ligne['id'] for ligne in lot]).delete()
+
+    def ecrire_jsonl(self, dossier, mois, lignes):
+        """Écrit un lot dans un fichier temporaire (un membre gzip) et retourne son chemin."""
+        descripteur, chemin = tempfile.mkstemp(prefix=f"historique-{mois[:4]}-{mois[4:]}.",
+                                               suffix='.jsonl.gz.tmp', dir=dossier)
+        with os.fdopen(descripteur, 'wb') as brut:
+            with gzip.open(brut, 'wt', encoding='utf-8') as fichier:
+                for ligne in lignes:
+                    fichier.write(json.dumps(ligne, cls=DjangoJSONEncoder) + '\n')
+            brut.flush()
+            os.fsync(brut.fileno())
+        return chemin
+
+    def fusionner(self, temporaire):
+        # Ajout d'un membre gzip par lot : l'archive du mois reste lisible d'un seul tenant
+        archive = os.path.basename(temporaire).split('.')[0] + '.jsonl.gz'
+        with open(temporaire, 'rb') as source, open(os.path.join(os.path.dirname(temporaire), archive), 'ab') as cible:
+            cible.write(source.read())
+        os.remove(temporaire)
+
+    def reprendre(self, dossier):
+        """
+        Lots temporaires d'une exécution interrompue : ajoutés à l'archive si
+        leur DELETE a été validé (lignes absentes de la table), sinon abandonnés.
+        """
+        for temporaire in sorted(glob.glob(os.path.join(dossier, '*.jsonl.gz.tmp'))):
+            try:
+                with gzip.open(temporaire, 'rt', encoding='utf-8') as fichier:
+                    ids = [json.loads(ligne)['id'] for ligne in fichier]
+            except (OSError, EOFError, ValueError):
+                # Écriture interrompue avant la validation : les lignes sont encore en base
+                ids = None
+            if ids and not UserLoginHistory.objects.filter(pk__in=ids).exists():
+                self.fusionner(temporaire)
+            else:
+                os.remove(temporaire)
+
+    def creer_table(self, mois):
+        qn = connection.ops.quote_name
+        source = UserLoginHistory._meta.db_table
+        archive = qn(f"{source}_{mois}")
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive} LIKE {qn(source)}")
+            else:
+                cursor.execute(f"CREATE TABLE IF NOT EXISTS {archive} AS SELECT * FROM {qn(source)} WHERE 1 = 0")
+
+    def copier_table(self, mois, ids):
+        qn = connection.ops.quote_name
+        source = UserLoginHistory._meta.db_table
+        archive = qn(f"{source}_{mois}")
+        with connection.cursor() as cursor:
+            colonnes = ', '.join(qn(f.column) for f in UserLoginHistory._meta.concrete_fields)
+            marqueurs = ', '.join(['%s'] * len(ids))
+            cursor.execute(
+                f"INSERT INTO {archive} ({colonnes}) SELECT {colonnes} FROM {qn(source)} WHERE {qn('id')} IN ({marqueurs})",
+                ids,
+            )
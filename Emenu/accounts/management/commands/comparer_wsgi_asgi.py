@@ -0,0 +1,86 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.test import AsyncClient, Client
+
+from Emenu.instrumentation import centiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare, en processus, le chemin WSGI (pool de threads) et le chemin ASGI (vues asynchrones) "
+        "sous une population de clients lents : chaque client garde la connexion --latence-client ms "
+        "après la réponse, ce qui immobilise un thread en WSGI mais pas en ASGI."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls', help="URL à interroger (répétable)")
+        parser.add_argument('--clients', type=int, default=100, help="Nombre de clients simultanés")
+        parser.add_argument('--requetes', type=int, default=10, help="Requêtes par client")
+        parser.add_argument('--threads', type=int, default=8, help="Threads du serveur WSGI simulé")
+        parser.add_argument('--latence-client', type=int, default=200,
+                            help="Durée (ms) pendant laquelle un client lent occupe la connexion")
+
+    def handle(self, *args, **options):
+        self.urls = options['urls'] or ['/', '/structure/']
+        self.latence = options['latence_client'] / 1000
+        for nom, mesure in (('WSGI', self.mesurer_wsgi), ('ASGI', self.mesurer_asgi)):
+            self.pic_threads = threading.active_count()
+            debut = time.perf_counter()
+            durees = [duree * 1000 for duree in asyncio.run(mesure(options))]
+            total = time.perf_counter() - debut
+            resume = centiles(durees)
+            self.stdout.write(
+                f"{nom} : {len(durees) / total:7.1f} req/s  p50 {resume['p50']:7.1f} ms  "
+                f"p95 {resume['p95']:7.1f} ms  moyenne {statistics.mean(durees):7.1f} ms  "
+                f"pic de threads {self.pic_threads}"
+            )
+
+    async def clients(self, options, requete):
+        durees = []
+
+        async def client(numero):
+            for i in range(options['requetes']):
+                url = self.urls[(numero + i) % len(self.urls)]
+                debut = time.perf_counter()
+                await requete(url)
+                durees.append(time.perf_counter() - debut)
+                self.pic_threads = max(self.pic_threads, threading.active_count())
+
+        await asyncio.gather(*(client(numero) for numero in range(options['clients'])))
+        return durees
+
+    async def mesurer_wsgi(self, options):
+        pool = ThreadPoolExecutor(max_workers=options['threads'])
+        locaux = threading.local()
+
+        def traiter(url):
+            # Un thread du serveur reste occupé tant que le client lent n'a pas tout reçu
+            if not hasattr(locaux, 'client'):
+                locaux.client = Client()
+            reponse = locaux.client.get(url)
+            time.sleep(self.latence)
+            close_old_connections()
+            return reponse.status_code
+
+        loop = asyncio.get_running_loop()
+        try:
+            return await self.clients(options, lambda url: loop.run_in_executor(pool, traiter, url))
+        finally:
+            pool.shutdown()
+
+    async def mesurer_asgi(self, options):
+        client = AsyncClient()
+
+        async def traiter(url):
+            reponse = await client.get(url)
+            # Attente d'un client lent : aucune ressource immobilisée hormis la coroutine
+            await asyncio.sleep(self.latence)
+            return reponse.status_code
+
+        return await self.clients(options, traiter)
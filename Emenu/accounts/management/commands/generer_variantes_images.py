@@ -0,0 +1,49 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from accounts.images import chemins_variantes, generer_variantes, supprimer_remplaces
+from accounts.models import Structure, User
+from menu.models import Plat
+
+
+class Command(BaseCommand):
+    help = "Génère les déclinaisons redimensionnées des photos existantes, dans un pool de processus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, default=None, help="Taille du pool (défaut : nombre de CPU)")
+        parser.add_argument('--forcer', action='store_true', help="Régénère même les photos déjà traitées")
+
+    def handle(self, *args, **options):
+        taches = []
+        for model in (Plat, Structure, User):
+            for pk, photo, variantes in (model.objects.exclude(photo='').exclude(photo__isnull=True)
+                                         .values_list('pk', 'photo', 'photo_variantes').iterator()):
+                if options['forcer'] or (variantes or {}).get('source') != photo:
+                    taches.append((model, pk, photo, chemins_variantes(variantes)))
+
+        self.stdout.write(f"{len(taches)} photo(s) à traiter.")
+        # Les processus fils ne touchent pas à la base : seules les images y sont traitées
+        connections.close_all()
+
+        traitees = erreurs = 0
+        with ProcessPoolExecutor(max_workers=options['processus'], initializer=django.setup) as pool:
+            futures = {pool.submit(generer_variantes, photo): (model, pk, photo, anciennes)
+                       for model, pk, photo, anciennes in taches}
+            for future in as_completed(futures):
+                model, pk, photo, anciennes = futures[future]
+                try:
+                    variantes = future.result()
+                except Exception as e:
+                    erreurs += 1
+                    self.stderr.write(f"{photo} : {e}")
+                    continue
+                # Condition sur photo : ne pas écraser une photo remplacée entre-temps
+                if model.objects.filter(pk=pk, photo=photo).update(photo_variantes=variantes, photo_statut='traitee'):
+                    # Déclinaisons d'anciennes largeurs
+                    supprimer_remplaces(anciennes, conserver=chemins_variantes(variantes))
+                traitees += 1
+
+        self.stdout.write(self.style.SUCCESS(f"{traitees} photo(s) traitée(s), {erreurs} erreur(s)."))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from accounts import geo
+from accounts.geocodage import get_geocodeur
+from accounts.models import Structure
+from accounts.versioning import invalider_structures
+
+
+class Command(BaseCommand):
+    help = (
+        "Géocode par lots les structures sans position (ou toutes avec --tous) avec le géocodeur "
+        "configuré (réglage GEOCODEUR, table locale des villes par défaut) et renseigne leur cellule."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tous', action='store_true', help="Géocode aussi les structures déjà placées")
+        parser.add_argument('--lot', type=int, default=500, help="Structures enregistrées par requête")
+
+    def handle(self, *args, **options):
+        geocodeur = get_geocodeur()
+        structures = Structure.objects.order_by('pk')
+        if not options['tous']:
+            structures = structures.filter(latitude__isnull=True)
+
+        placees = introuvables = 0
+        lot = []
+        # Lecture par lots sur la clé primaire : seuls les champs utiles sont chargés
+        for structure in structures.only('pk', 'adresse', 'ville').iterator(chunk_size=options['lot']):
+            position = geocodeur(structure.adresse, structure.ville)
+            if position is None:
+                introuvables += 1
+                continue
+            structure.latitude, structure.longitude = position
+            # bulk_update n'émet pas pre_save : la cellule est calculée ici
+            structure.cellule = geo.cellule(*position)
+            lot.append(structure)
+            if len(lot) >= options['lot']:
+                placees += self.enregistrer(lot)
+                lot = []
+        if lot:
+            placees += self.enregistrer(lot)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{placees} structure(s) géocodée(s), {introuvables} adresse(s) introuvable(s)."
+        ))
+
+    def enregistrer(self, lot):
+        Structure.objects.bulk_update(lot, ['latitude', 'longitude', 'cellule'])
+        invalider_structures([structure.pk for structure in lot])
+        return len(lot)
@@ -0,0 +1,83 @@
+import statistics
+import time
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+
+from Emenu.instrumentation import centiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le coût de l'ouverture des connexions à la base : la même série de requêtes passe par "
+        "le gestionnaire WSGI, qui ferme ou conserve la connexion en fin de requête comme en production, "
+        "sans persistance (CONN_MAX_AGE=0) puis avec connexions persistantes et vérifiées. "
+        "Fonctionne sur MySQL comme sur SQLite (Emenu.settings_bench)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/structures/', help="URL interrogée")
+        parser.add_argument('--requetes', type=int, default=2000)
+        parser.add_argument('--echauffement', type=int, default=50)
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            raise CommandError("Base SQLite en mémoire : utilisez un fichier (Emenu.settings_bench).")
+
+        self.handler = WSGIHandler()
+        self.environ = RequestFactory()._base_environ(PATH_INFO=options['url'], REQUEST_METHOD='GET',
+                                                      SERVER_NAME='localhost', HTTP_HOST='localhost')
+        self.ouvertures = 0
+        connection_created.connect(self.compter, dispatch_uid='mesurer_connexions')
+
+        reglages = connection.settings_dict
+        initial = reglages['CONN_MAX_AGE'], reglages['CONN_HEALTH_CHECKS']
+        resultats = {}
+        try:
+            for nom, age, verification in (('sans persistance', 0, False), ('persistante', 600, True)):
+                # Pris en compte à l'ouverture suivante
+                connection.close()
+                reglages['CONN_MAX_AGE'], reglages['CONN_HEALTH_CHECKS'] = age, verification
+                resultats[nom] = self.mesurer(options)
+        finally:
+            reglages['CONN_MAX_AGE'], reglages['CONN_HEALTH_CHECKS'] = initial
+            connection_created.disconnect(dispatch_uid='mesurer_connexions')
+            connection.close()
+
+        for nom, (durees, ouvertures) in resultats.items():
+            resume = centiles(durees)
+            self.stdout.write(
+                f"{nom:18} {ouvertures:6d} connexion(s) ouverte(s)  p50 {resume['p50']:7.3f} ms  "
+                f"p95 {resume['p95']:7.3f} ms  moyenne {statistics.mean(durees):7.3f} ms"
+            )
+        gain = statistics.mean(resultats['sans persistance'][0]) - statistics.mean(resultats['persistante'][0])
+        self.stdout.write(f"Gain moyen par requête : {gain:.3f} ms ({connection.vendor})")
+
+    def compter(self, sender, connection, **kwargs):
+        self.ouvertures += 1
+
+    def requete(self):
+        statut = []
+        environ = {**self.environ, 'wsgi.input': BytesIO()}
+        reponse = self.handler(environ, lambda status, headers: statut.append(status))
+        for _ in reponse:
+            pass
+        # Comme un serveur WSGI : close() émet request_finished, qui ferme ou conserve la connexion
+        reponse.close()
+        if not statut[0].startswith('200'):
+            raise CommandError(f"{self.environ['PATH_INFO']} : statut {statut[0]}")
+
+    def mesurer(self, options):
+        for _ in range(options['echauffement']):
+            self.requete()
+        self.ouvertures = 0
+        durees = []
+        for _ in range(options['requetes']):
+            debut = time.perf_counter()
+            self.requete()
+            durees.append((time.perf_counter() - debut) * 1000)
+        return durees, self.ouvertures
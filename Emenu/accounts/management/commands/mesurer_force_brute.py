@@ -0,0 +1,63 @@
+import time
+
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.audit import login_history_writer
+from accounts.models import User
+from Emenu.instrumentation import centiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Simule une attaque par force brute sur la page de connexion (mots de passe faux, une adresse IP) "
+        "avec puis sans limitation des tentatives : débit, latences, requêtes SQL, hachages de mot de "
+        "passe et événements d'historique produits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tentatives', type=int, default=200, help="Tentatives de la rafale")
+        parser.add_argument('--emails', type=int, default=5, help="Comptes visés, à tour de rôle")
+
+    def handle(self, *args, **options):
+        emails = list(User.objects.order_by('pk').values_list('email', flat=True)[:options['emails']])
+        emails = emails or ['inconnu@example.com']
+        for nom, reglages in (('avec limitation', {}),
+                              ('sans limitation', {'LOGIN_LIMITE_IP': None, 'LOGIN_LIMITE_EMAIL': None})):
+            cache.clear()
+            with override_settings(**reglages):
+                self.mesurer(nom, emails, options['tentatives'])
+
+    def mesurer(self, nom, emails, tentatives):
+        client = Client(REMOTE_ADDR='203.0.113.7', HTTP_USER_AGENT='force-brute')
+        url = reverse('accounts:login')
+        hachages = []
+        compter = lambda sender, **kwargs: hachages.append(1)  # noqa: E731
+        user_login_failed.connect(compter)
+        ecrits_avant = login_history_writer.stats()['ecrits'] + login_history_writer.profondeur()
+
+        durees, statuts = [], {}
+        try:
+            with CaptureQueriesContext(connection) as requetes:
+                debut = time.perf_counter()
+                for i in range(tentatives):
+                    depart = time.perf_counter()
+                    reponse = client.post(url, {'username': emails[i % len(emails)], 'password': 'mauvais'})
+                    durees.append((time.perf_counter() - depart) * 1000)
+                    statuts[reponse.status_code] = statuts.get(reponse.status_code, 0) + 1
+                total = time.perf_counter() - debut
+        finally:
+            user_login_failed.disconnect(compter)
+
+        evenements = login_history_writer.stats()['ecrits'] + login_history_writer.profondeur() - ecrits_avant
+        resume = centiles(durees)
+        self.stdout.write(
+            f"{nom:16} {tentatives / total:8.1f} tentatives/s  p50 {resume['p50']:8.2f} ms  "
+            f"p95 {resume['p95']:8.2f} ms  {len(requetes)} requête(s) SQL  {len(hachages)} hachage(s)  "
+            f"statuts {statuts}  {evenements} événement(s) d'historique"
+        )
@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import Structure
+
+SESSION = 'django.contrib.sessions.middleware.SessionMiddleware'
+
+# Configuration d'origine : base de données, middleware en double, messages en session si besoin
+AVANT = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+    'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    'MIDDLEWARE': [*settings.MIDDLEWARE, SESSION],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compte les requêtes SQL par page authentifiée (tableau de bord, plats, menus) avec la "
+        "configuration de sessions d'origine, la configuration actuelle (cached_db) et des sessions "
+        "en cookie signé. Les requêtes sur django_session sont détaillées."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Requêtes mesurées par page")
+
+    def handle(self, *args, **options):
+        structure = (Structure.objects.annotate(n=Count('menus')).order_by('-n', 'pk')
+                     .select_related('user').first())
+        if structure is None:
+            raise CommandError("Aucune donnée : lancez d'abord « manage.py seed_bench ».")
+
+        pages = [('dashboard', reverse('accounts:dashboard')), ('plat_list', reverse('plat-list')),
+                 ('menu_list', reverse('menus-list'))]
+        configurations = [
+            ('avant (db, middleware en double)', AVANT),
+            ('actuelle (cached_db)', {}),
+            ('cookie signé', {'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies'}),
+        ]
+        for nom, reglages in configurations:
+            cache.clear()
+            with override_settings(**reglages):
+                client = Client()
+                client.force_login(structure.user)
+                self.stdout.write(f"{nom} ({settings.SESSION_ENGINE.rsplit('.', 1)[-1]})")
+                for page, url in pages:
+                    self.mesurer(client, page, url, options['iterations'])
+
+    def mesurer(self, client, page, url, iterations):
+        # Premier passage : caches de rendu et de session remplis
+        client.get(url)
+        requetes = session = 0
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as capture:
+                reponse = client.get(url)
+            if reponse.status_code != 200:
+                raise CommandError(f"{url} : statut {reponse.status_code}")
+            requetes += len(capture)
+            session += sum('django_session' in requete['sql'] for requete in capture.captured_queries)
+        self.stdout.write(f"  {page:10} {requetes / iterations:5.1f} requête(s) SQL par page, "
+                          f"dont {session / iterations:.1f} sur django_session")
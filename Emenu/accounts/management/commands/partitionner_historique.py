@@ -0,0 +1,96 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Min
+from django.utils import timezone
+
+from accounts.models import UserLoginHistory
+
+
+def mois_suivant(jour):
+    return date(jour.year + jour.month // 12, jour.month % 12 + 1, 1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Partitionne (MySQL uniquement) la table d'historique de connexion par mois sur login_time, "
+        "ou ajoute les partitions des mois à venir si elle l'est déjà. Affiche le SQL sans --executer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mois-a-venir', type=int, default=3, help="Nombre de partitions futures à préparer")
+        parser.add_argument('--executer', action='store_true', help="Exécute le SQL au lieu de l'afficher")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError("Le partitionnement par plage n'est disponible que sur MySQL.")
+
+        table = UserLoginHistory._meta.db_table
+        existantes = self.partitions_existantes(table)
+        fin = timezone.now().date().replace(day=1)
+        for _ in range(options['mois_a_venir']):
+            fin = mois_suivant(fin)
+
+        if existantes:
+            instructions = self.sql_ajout(table, existantes, fin)
+        else:
+            instructions = self.sql_partitionnement(table, fin)
+
+        for sql in instructions:
+            if options['executer']:
+                with connection.cursor() as cursor:
+                    cursor.execute(sql)
+            self.stdout.write(sql + ';')
+
+        if not instructions:
+            self.stdout.write("Aucune partition à ajouter.")
+
+    def partitions_existantes(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+                [table],
+            )
+            return {ligne[0] for ligne in cursor.fetchall()}
+
+    def definitions(self, debut, fin):
+        mois, parties = debut, []
+        while mois < fin:
+            suivant = mois_suivant(mois)
+            parties.append(f"PARTITION p{mois:%Y%m} VALUES LESS THAN (TO_DAYS('{suivant:%Y-%m-%d}'))")
+            mois = suivant
+        return parties
+
+    def sql_partitionnement(self, table, fin):
+        qn = connection.ops.quote_name
+        plus_ancien = UserLoginHistory.objects.aggregate(m=Min('login_time'))['m'] or timezone.now()
+        debut = plus_ancien.date().replace(day=1)
+
+        instructions = []
+        # InnoDB ne permet pas de clé étrangère sur une table partitionnée
+        contraintes = connection.introspection.get_constraints(connection.cursor(), table)
+        for nom, contrainte in contraintes.items():
+            if contrainte['foreign_key']:
+                instructions.append(f"ALTER TABLE {qn(table)} DROP FOREIGN KEY {qn(nom)}")
+        # La colonne de partitionnement doit appartenir à la clé primaire
+        instructions.append(f"ALTER TABLE {qn(table)} DROP PRIMARY KEY, ADD PRIMARY KEY (id, login_time)")
+        parties = self.definitions(debut, fin) + ["PARTITION pmax VALUES LESS THAN MAXVALUE"]
+        instructions.append(
+            f"ALTER TABLE {qn(table)} PARTITION BY RANGE (TO_DAYS(login_time)) (\n    "
+            + ",\n    ".join(parties) + "\n)"
+        )
+        return instructions
+
+    def sql_ajout(self, table, existantes, fin):
+        derniere = max(p for p in existantes if p != 'pmax')
+        debut = mois_suivant(date(int(derniere[1:5]), int(derniere[5:7]), 1))
+        parties = self.definitions(debut, fin)
+        if not parties:
+            return []
+        parties.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+        return [
+            f"ALTER TABLE {connection.ops.quote_name(table)} REORGANIZE PARTITION pmax INTO (\n    "
+            + ",\n    ".join(parties) + "\n)"
+        ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='structure',
+            index=models.Index(fields=['ville', 'type', 'date_creation'], name='structure_ville_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='structure',
+            index=models.Index(fields=['type', 'date_creation'], name='structure_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='structure',
+            index=models.Index(fields=['date_creation', 'id'], name='structure_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_structure_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userloginhistory',
+            name='login_time',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_login_time_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userloginhistory',
+            index=models.Index(fields=['user', 'login_time'], name='loginhistory_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userloginhistory',
+            index=models.Index(fields=['login_time'], name='loginhistory_time_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_login_history_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='structure',
+            name='photo_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='photo_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
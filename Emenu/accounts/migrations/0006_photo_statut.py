@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_photo_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='structure',
+            name='photo_statut',
+            field=models.CharField(blank=True, choices=[('', 'Aucune photo'), ('en_attente', 'En cours de traitement'), ('traitee', 'Traitée'), ('echec', 'Échec du traitement')], editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='photo_statut',
+            field=models.CharField(blank=True, choices=[('', 'Aucune photo'), ('en_attente', 'En cours de traitement'), ('traitee', 'Traitée'), ('echec', 'Échec du traitement')], editable=False, max_length=20),
+        ),
+    ]
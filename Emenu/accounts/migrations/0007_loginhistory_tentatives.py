@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_photo_statut'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userloginhistory',
+            name='tentatives',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
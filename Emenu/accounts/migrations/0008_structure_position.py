@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_loginhistory_tentatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='structure',
+            name='cellule',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='structure',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='structure',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='structure',
+            index=models.Index(fields=['cellule', 'latitude', 'longitude'], name='structure_cellule_idx'),
+        ),
+    ]
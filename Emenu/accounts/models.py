@@ -1,8 +1,18 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.validators import RegexValidator
 from django.contrib.auth import get_user_model
 
+# État du traitement hors requête des photos téléversées (voir accounts/traitements.py)
+PHOTO_STATUT_CHOICES = [
+    ('', 'Aucune photo'),
+    ('en_attente', 'En cours de traitement'),
+    ('traitee', 'Traitée'),
+    ('echec', 'Échec du traitement'),
+]
+
+
 class CustomUserManager(BaseUserManager):
     """Gère la création des utilisateurs et superutilisateurs."""
 
@@ -49,6 +59,9 @@ class User(AbstractUser):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='client')
     photo = models.ImageField(upload_to='users/', blank=True, null=True)
+    # Déclinaisons redimensionnées de la photo (voir accounts/images.py)
+    photo_variantes = models.JSONField(default=dict, blank=True, editable=False)
+    photo_statut = models.CharField(max_length=20, choices=PHOTO_STATUT_CHOICES, blank=True, editable=False)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []  # Ajoute 'first_name', 'last_name' si tu veux les rendre obligatoires
@@ -80,12 +93,27 @@ class Structure(models.Model):
     description = models.TextField(blank=True, null=True)
     type = models.CharField(max_length=20, choices=TYPE_CHOICES)
     photo = models.ImageField(upload_to='structures/', blank=True, null=True)
+    # Déclinaisons redimensionnées de la photo (voir accounts/images.py)
+    photo_variantes = models.JSONField(default=dict, blank=True, editable=False)
+    photo_statut = models.CharField(max_length=20, choices=PHOTO_STATUT_CHOICES, blank=True, editable=False)
     date_creation = models.DateTimeField(auto_now_add=True)
+    # Position (voir geocodage.py) et cellule de grille correspondante, tenue à jour par signal (voir geo.py)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    cellule = models.BigIntegerField(null=True, blank=True, editable=False)
 
     featured = models.BooleanField(default=False, verbose_name="Mettre en avant")
 
     class Meta:
         ordering = ['-date_creation']
+        indexes = [
+            # Filtres de l'annuaire (ville + type) avec tri par date de création
+            models.Index(fields=['ville', 'type', 'date_creation'], name='structure_ville_type_date_idx'),
+            models.Index(fields=['type', 'date_creation'], name='structure_type_date_idx'),
+            models.Index(fields=['date_creation', 'id'], name='structure_date_id_idx'),
+            # Recherche par proximité : intervalles de cellules par ligne de la grille
+            models.Index(fields=['cellule', 'latitude', 'longitude'], name='structure_cellule_idx'),
+        ]
 
     def __str__(self):
         return self.nom
@@ -99,11 +127,19 @@ class UserLoginHistory(models.Model):
     ]
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='login_history')
-    login_time = models.DateTimeField(auto_now_add=True)
+    # Horodatage fourni à la mise en file : l'écriture en base est différée (voir audit.py)
+    login_time = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=255, blank=True)
     login_success = models.BooleanField(default=True)
     action = models.CharField(max_length=15, choices=ACTION_CHOICES, default='LOGIN')
+    # Échecs regroupés en une ligne de résumé (voir limitation.py)
+    tentatives = models.PositiveIntegerField(default=1)
 
     class Meta:
-        ordering = ['-login_time']
\ No newline at end of file
+        ordering = ['-login_time']
+        indexes = [
+            # Historique récent d'un utilisateur (tableau de bord) et archivage par date
+            models.Index(fields=['user', 'login_time'], name='loginhistory_user_time_idx'),
+            models.Index(fields=['login_time'], name='loginhistory_time_idx'),
+        ]
\ No newline at end of file
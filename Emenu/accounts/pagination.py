@@ -0,0 +1,111 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible ou falsifié."""
+
+
+class KeysetPage:
+    """Page de résultats obtenue par pagination par curseur (keyset)."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur sur un tri décroissant (champ, pk).
+
+    Contrairement à OFFSET, chaque page est lue directement depuis l'index
+    via une condition « (champ, pk) < (valeur, id) » : le coût d'une page
+    reste constant quelle que soit sa position dans la liste.
+    """
+
+    def __init__(self, queryset, per_page=24, field='date_creation'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode_cursor(self, obj, direction):
+        # Instances de modèle ou dictionnaires issus de values() (clé « id »)
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id']
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        raw = f"{direction}|{value.isoformat()}|{pk}".encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = base64.urlsafe_b64decode(padded).decode().split('|')
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            return direction, datetime.fromisoformat(value), int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def _preparer(self, cursor):
+        try:
+            direction, value, pk = self.decode_cursor(cursor) if cursor else ('n', None, None)
+        except InvalidCursor:
+            direction, value, pk = 'n', None, None
+
+        queryset = self.queryset
+        if direction == 'n':
+            if value is not None:
+                queryset = queryset.filter(
+                    Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, 'pk__lt': pk})
+                )
+            queryset = queryset.order_by(f'-{self.field}', '-pk')
+        else:
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__gt': value}) | Q(**{self.field: value, 'pk__gt': pk})
+            ).order_by(self.field, 'pk')
+        # Une ligne de plus que nécessaire indique s'il existe une page suivante
+        return queryset[:self.per_page + 1], direction, value
+
+    def _page(self, rows, direction, value):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == 'p':
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, value is not None
+
+        next_cursor = self.encode_cursor(rows[-1], 'n') if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], 'p') if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def get_page(self, cursor=None):
+        """Retourne la page désignée par ``cursor`` (première page si absent ou invalide)."""
+        queryset, direction, value = self._preparer(cursor)
+        return self._page(list(queryset), direction, value)
+
+    async def aget_page(self, cursor=None):
+        """Version asynchrone de ``get_page`` (ORM asynchrone)."""
+        queryset, direction, value = self._preparer(cursor)
+        return self._page([row async for row in queryset], direction, value)
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import facets, geo
+from .images import memoriser_photo, photo_modifiee, planifier_traitement_photo
+from .models import Structure, User
+from .structure_utilisateur import invalider_structure_utilisateur
+from .versioning import invalider_structures
+
+
+@receiver(pre_save, sender=Structure)
+def calculer_cellule(sender, instance, **kwargs):
+    instance.cellule = geo.cellule(instance.latitude, instance.longitude)
+
+
+@receiver(pre_save, sender=Structure)
+def memoriser_facettes_structure(sender, instance, **kwargs):
+    """Conserve le type et la ville avant modification : les facettes ne changent qu'avec eux."""
+    if instance.pk:
+        instance._facettes_avant = Structure.objects.filter(pk=instance.pk).values_list('type', 'ville').first()
+
+
+@receiver(post_save, sender=Structure)
+def maj_facettes_structure(sender, instance, created, **kwargs):
+    nouvelles = (instance.type, instance.ville)
+    anciennes = None if created else getattr(instance, '_facettes_avant', None)
+    if anciennes == nouvelles:
+        return
+    # Après validation : le lecteur qui recalcule voit la structure
+    transaction.on_commit(facets.invalider_facettes)
+
+
+@receiver(post_delete, sender=Structure)
+def retirer_facettes_structure(sender, instance, **kwargs):
+    transaction.on_commit(facets.invalider_facettes)
+
+
+@receiver(post_save, sender=Structure)
+@receiver(post_delete, sender=Structure)
+def invalider_cache_structure(sender, instance, **kwargs):
+    invalider_structures([instance.pk])
+
+
+@receiver(post_save, sender=Structure)
+@receiver(post_delete, sender=Structure)
+def invalider_structure_principale(sender, instance, created=True, **kwargs):
+    # Une modification ne change ni le propriétaire ni l'ordre des structures
+    if created:
+        invalider_structure_utilisateur(instance.user_id)
+
+
+@receiver(pre_save, sender=Structure)
+@receiver(pre_save, sender=User)
+def memoriser_photo_compte(sender, instance, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        memoriser_photo(instance, update_fields)
+
+
+@receiver(post_save, sender=Structure)
+@receiver(post_save, sender=User)
+def traiter_photo_compte(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Le traitement de la photo téléversée est confié à la file de tâches."""
+    if not raw and photo_modifiee(instance, created, update_fields):
+        modele = 'structure' if sender is Structure else 'user'
+        planifier_traitement_photo(instance, 'accounts.traiter_photo', modele=modele)
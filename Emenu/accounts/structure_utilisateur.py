@@ -0,0 +1,43 @@
+"""
+Structure principale de chaque utilisateur, mise en cache par utilisateur.
+
+Le menu de navigation (``has_structure``) et la création de menus ont besoin
+de savoir si l'utilisateur possède une structure, et laquelle. La réponse est
+conservée dans le cache Django sous une clé par utilisateur, supprimée à la
+création ou à la suppression d'une de ses structures (voir accounts/signals.py) ;
+une entrée par utilisateur, et non en session, pour que toutes ses sessions
+voient le changement.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Structure
+
+# Délai de sécurité : les signaux invalident l'entrée bien avant
+STRUCTURE_UTILISATEUR_TIMEOUT = 60 * 60 * 24
+
+# Valeur mise en cache pour « aucune structure » (None signifie absence de l'entrée)
+AUCUNE = 0
+
+
+def _cle(user_id):
+    return f'user:{user_id}:structure'
+
+
+def get_structure_principale_id(user_id):
+    """Id de la structure la plus récente de l'utilisateur, ou None."""
+    cle = _cle(user_id)
+    structure_id = cache.get(cle)
+    if structure_id is None:
+        # Même choix qu'auparavant (user.structure.first()) : tri par défaut, la plus récente
+        structure_id = Structure.objects.filter(user_id=user_id).values_list('pk', flat=True).first() or AUCUNE
+        cache.set(cle, structure_id, STRUCTURE_UTILISATEUR_TIMEOUT)
+    return structure_id or None
+
+
+def a_une_structure(user_id):
+    return get_structure_principale_id(user_id) is not None
+
+
+def invalider_structure_utilisateur(user_id):
+    transaction.on_commit(lambda: cache.delete(_cle(user_id)))
@@ -0,0 +1,58 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+
+register = template.Library()
+
+# Largeur d'affichage des cartes selon la taille d'écran (grilles Bootstrap du site)
+SIZES_CARTE = '(min-width: 992px) 25vw, (min-width: 576px) 50vw, 100vw'
+
+
+def _srcset(declinaisons):
+    return ', '.join(f"{url} {largeur}w" for largeur, url in
+                     sorted(declinaisons.items(), key=lambda item: int(item[0])))
+
+
+def _urls(objet, champ):
+    """URL de la photo et de ses déclinaisons (format -> largeur -> URL)."""
+    if isinstance(objet, dict):
+        # Plat d'un menu publié : URL déjà résolues (voir menu/publication.py)
+        return objet.get(champ), objet.get('photo_variantes') or {}
+    fichier = getattr(objet, champ)
+    if not fichier:
+        return None, {}
+    variantes = getattr(objet, 'photo_variantes', None) or {}
+    if variantes.get('source') != fichier.name:
+        return fichier.url, {}
+    return fichier.url, {
+        ext: {largeur: default_storage.url(chemin) for largeur, chemin in declinaisons.items()}
+        for ext, declinaisons in variantes['formats'].items()
+    }
+
+
+@register.simple_tag
+def image_responsive(objet, classe='', alt='', sizes=SIZES_CARTE, style='', champ='photo'):
+    """
+    Affiche la photo d'un objet via ses déclinaisons (``<picture>`` WebP + JPEG).
+
+    Usage : ``{% image_responsive plat "card-img-top" plat.nom %}``. Tant que
+    les déclinaisons n'existent pas, l'original est servi tel quel. ``objet``
+    peut aussi être un plat d'un instantané de menu publié (dictionnaire).
+    """
+    url, formats = _urls(objet, champ)
+    if not url:
+        return ''
+    if not formats:
+        return format_html('<img src="{}" class="{}" alt="{}" style="{}" loading="lazy">',
+                           url, classe, alt, style)
+
+    jpeg = formats['jpeg']
+    plus_petite = jpeg[min(jpeg, key=int)]
+    sources = format_html_join(
+        '', '<source type="image/{}" srcset="{}" sizes="{}">',
+        ((ext, _srcset(declinaisons), sizes) for ext, declinaisons in formats.items() if ext != 'jpeg'),
+    )
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="lazy"></picture>',
+        sources, plus_petite, _srcset(jpeg), sizes, classe, alt, style,
+    )
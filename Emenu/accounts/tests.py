@@ -1,3 +1,550 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from Emenu.instrumentation import statistiques, verifier_budget
+from menu import publication
+from menu.models import Menu, Plat
+from taches.file import executer, reserver
+
+from . import facets, images
+from .audit import LoginHistoryWriter
+from .checks import verifier_cache_sessions
+from .limitation import LimiteurConnexion
+from .management.commands import archiver_historique, partitionner_historique
+from .models import Structure, User, UserLoginHistory
+from .pagination import InvalidCursor, KeysetPaginator
+from .versioning import get_version
+
+
+class MediaTemporaireMixin:
+    """Fichiers téléversés ou générés par les tests écrits dans un dossier temporaire."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp(prefix='emenu-media-')
+        cls._media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+class DonneesMixin(MediaTemporaireMixin):
+    """Un propriétaire, sa structure géolocalisée et un menu publié de deux plats."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='proprio@emenu.tg', password='secret-123')
+        cls.structure = Structure.objects.create(
+            user=cls.user, nom='Chez Ama', telephone='90000000', adresse='Rue 1', ville='Lomé',
+            type='restaurant', latitude=6.13, longitude=1.22,
+        )
+        Structure.objects.create(
+            user=cls.user, nom='Buvette du port', telephone='90000001', adresse='Port', ville='Kara',
+            type='bar', latitude=9.55, longitude=1.19,
+        )
+        cls.plats = [
+            Plat.objects.create(nom=nom, description='Maison', prix=prix, categorie='plat', createur=cls.user)
+            for nom, prix in (('Riz gras', 1500), ('Fufu', 2000))
+        ]
+        cls.menu = Menu.objects.create(nom='Midi', status='actif', structure=cls.structure, createur=cls.user)
+        cls.menu.plats.set(cls.plats)
+        publication.publier(cls.menu)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def verifier_budget_froid_chaud(self, url, **kwargs):
+        # Le budget vaut pour la première requête (caches des versions, des facettes et
+        # de la densité vides) comme pour la suivante, servie depuis ces caches
+        for _ in range(2):
+            response = verifier_budget(self.client, url, **kwargs)
+            self.assertEqual(response.status_code, 200)
+        return response
+
+
+class BudgetRequetesTests(DonneesMixin, TestCase):
+    def test_home(self):
+        self.verifier_budget_froid_chaud(reverse('accounts:home'))
+
+    def test_dashboard(self):
+        self.verifier_budget_froid_chaud(reverse('accounts:dashboard'))
+
+    def test_list_structures(self):
+        self.verifier_budget_froid_chaud(reverse('accounts:structure'))
+        self.verifier_budget_froid_chaud(reverse('accounts:structure') + '?ville=Lomé&type=restaurant&q=Ama')
+
+    def test_list_structures_curseur(self):
+        Structure.objects.bulk_create([
+            Structure(user=self.user, nom=f'Maquis {i}', telephone='90000002', adresse='Rue 2', ville='Lomé',
+                      type='cafe')
+            for i in range(30)
+        ])
+        curseur = self.client.get(reverse('accounts:structure')).context['page_obj'].next_cursor
+        self.assertIsNotNone(curseur)
+        self.verifier_budget_froid_chaud(reverse('accounts:structure') + f'?curseur={curseur}')
+
+    def test_list_structures_proximite(self):
+        self.verifier_budget_froid_chaud(reverse('accounts:structure') + '?lat=6.14&lon=1.21')
+
+    def test_detail(self):
+        response = self.verifier_budget_froid_chaud(reverse('accounts:detail', args=[self.structure.pk]))
+        self.assertContains(response, 'Riz gras')
+
+    def test_detail_visiteur(self):
+        visiteur = User.objects.create_user(email='client@emenu.tg', password='secret-123')
+        self.client.force_login(visiteur)
+        self.verifier_budget_froid_chaud(reverse('accounts:detail', args=[self.structure.pk]))
+
+
+class InstrumentationTests(DonneesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        statistiques.vider()
+
+    def test_temps_gabarits(self):
+        self.client.get(reverse('accounts:home'))
+        vue = statistiques.resume()['accounts:home']
+        self.assertEqual(vue['echantillons'], 1)
+        self.assertGreater(vue['gabarits_ms']['max'], 0)
+
+    def test_vider(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse('accounts:home'))
+        self.assertEqual(self.client.get(reverse('instrumentation-vider')).status_code, 405)
+        self.assertIn('accounts:home', statistiques.resume())
+        self.assertEqual(self.client.post(reverse('instrumentation-vider')).status_code, 200)
+        self.assertNotIn('accounts:home', statistiques.resume())
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    LOGIN_LIMITE_EMAIL=(5, 300), LOGIN_LIMITE_IP=(30, 300),
+    LOGIN_RESUME_INTERVALLE=3600, LOGIN_HISTORY_ASYNC=False,
+)
+class LimitationConnexionTests(DonneesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.logout()
+        # Résumé des échecs propre à chaque test
+        self.limiteur = LimiteurConnexion()
+        patcher = mock.patch('accounts.views.limiteur_connexion', self.limiteur)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connexion(self, password='mauvais', email='proprio@emenu.tg'):
+        return self.client.post(reverse('accounts:login'), {'username': email, 'password': password})
+
+    def test_refus_apres_la_limite(self):
+        for _ in range(5):
+            self.assertEqual(self.connexion().status_code, 302)
+        response = self.connexion(password='secret-123')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response['Retry-After']) <= 300)
+        self.assertNotIn('_auth_user_id', self.client.session)
+
+    def test_remise_a_zero_apres_reussite(self):
+        for _ in range(4):
+            self.connexion()
+        self.assertEqual(self.connexion(password='secret-123').status_code, 302)
+        self.assertIn('_auth_user_id', self.client.session)
+        self.client.logout()
+        # Sans remise à zéro, 8 échecs sur la fenêtre : la connexion serait refusée
+        for _ in range(4):
+            self.connexion()
+        self.assertEqual(self.connexion(password='secret-123').status_code, 302)
+
+    def test_resume_des_echecs(self):
+        for _ in range(3):
+            self.connexion()
+        self.connexion(email='inconnu@emenu.tg')
+        self.assertFalse(UserLoginHistory.objects.filter(action='FAILED_ATTEMPT').exists())
+
+        self.limiteur.publier_resume(forcer=True)
+        # Une ligne par email et adresse IP ; l'email inconnu n'est pas enregistré
+        ligne = UserLoginHistory.objects.get(action='FAILED_ATTEMPT')
+        self.assertEqual((ligne.user_id, ligne.tentatives, ligne.login_success), (self.user.pk, 3, False))
+
+
+class VerificationsDeploiementTests(TestCase):
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_sessions_en_cache_local(self):
+        self.assertEqual([e.id for e in verifier_cache_sessions(None)], ['accounts.E001'])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379/0',
+    }})
+    def test_sessions_en_cache_partage(self):
+        self.assertEqual(verifier_cache_sessions(None), [])
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_sessions_en_base(self):
+        self.assertEqual(verifier_cache_sessions(None), [])
+
+
+class FacettesTests(DonneesMixin, TestCase):
+    def test_compteurs_en_cache(self):
+        attendues = {'type': {'restaurant': 1, 'bar': 1}, 'ville': {'Lomé': 1, 'Kara': 1}}
+        self.assertEqual(facets.get_facettes(), attendues)
+        with self.assertNumQueries(0):
+            self.assertEqual(facets.get_facettes(), attendues)
+            self.assertEqual(async_to_sync(facets.aget_facettes)(), attendues)
+
+    def test_creation_et_suppression(self):
+        facets.get_facettes()
+        with self.captureOnCommitCallbacks(execute=True):
+            nouvelle = Structure.objects.create(user=self.user, nom='Maquis', telephone='90000002',
+                                                adresse='Rue 2', ville='Kara', type='restaurant')
+        self.assertEqual(facets.get_facettes()['ville'], {'Lomé': 1, 'Kara': 2})
+        self.assertEqual(facets.get_facettes()['type']['restaurant'], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            nouvelle.delete()
+        self.assertEqual(facets.get_facettes()['ville'], {'Lomé': 1, 'Kara': 1})
+
+    def test_modification(self):
+        facets.get_facettes()
+        # Ni le type ni la ville ne changent : les compteurs restent en cache
+        with self.captureOnCommitCallbacks(execute=True):
+            self.structure.nom = 'Chez Ama et fils'
+            self.structure.save()
+        self.assertIsNotNone(cache.get(facets.FACETTES_CACHE_KEY))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.structure.ville = 'Kara'
+            self.structure.save()
+        self.assertIsNone(cache.get(facets.FACETTES_CACHE_KEY))
+        self.assertEqual(facets.get_facettes()['ville'], {'Kara': 2})
+
+
+class FragmentsDetailTests(DonneesMixin, TestCase):
+    def afficher(self):
+        """Page publique et nombre de requêtes sur les versions publiées des menus."""
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('accounts:detail', args=[self.structure.pk]))
+        self.assertEqual(response.status_code, 200)
+        return response, sum('menu_menuversion' in q['sql'] for q in requetes.captured_queries)
+
+    def fragment(self, nom):
+        return cache.get(make_template_fragment_key(nom, [self.structure.pk, get_version(self.structure.pk)]))
+
+    def test_succes_puis_echec_apres_nouvelle_version(self):
+        response, lectures = self.afficher()
+        self.assertContains(response, 'Riz gras')
+        self.assertGreater(lectures, 0)
+        self.assertIn('Riz gras', self.fragment('structure_detail_menus'))
+        self.assertIsNotNone(self.fragment('structure_detail_infos'))
+
+        # Modification sans signal : la version ne change pas, le fragment en cache est servi
+        Plat.objects.filter(pk=self.plats[0].pk).update(nom='Riz au poisson')
+        response, lectures = self.afficher()
+        self.assertContains(response, 'Riz gras')
+        self.assertEqual(lectures, 0)
+
+        version = get_version(self.structure.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('plat-actions'), {'action': 'indisponible', 'plats': [self.plats[0].pk]})
+        self.assertGreater(get_version(self.structure.pk), version)
+        response, lectures = self.afficher()
+        self.assertContains(response, 'Riz au poisson')
+        self.assertGreater(lectures, 0)
+
+    def test_structure_modifiee(self):
+        self.afficher()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.structure.adresse = 'Boulevard du 13 janvier'
+            self.structure.save()
+        self.assertIsNone(self.fragment('structure_detail_infos'))
+        self.assertContains(self.afficher()[0], 'Boulevard du 13 janvier')
+
+
+class LoginHistoryWriterTests(DonneesMixin, TestCase):
+    def ecrivain(self, **kwargs):
+        # Lots interceptés : le thread d'écriture ne partage pas la transaction du test
+        ecrivain = LoginHistoryWriter(**kwargs)
+        ecrivain.lots = []
+        ecrivain._ecrire = lambda lot: ecrivain.lots.append([e['email'] for e in lot])
+        self.addCleanup(ecrivain.arreter)
+        return ecrivain
+
+    def test_lots_et_vidage_a_l_arret(self):
+        ecrivain = self.ecrivain(batch_size=3, flush_interval_ms=200)
+        for i in range(7):
+            ecrivain.enregistrer(email=f'{i}@emenu.tg', login_success=False)
+        ecrivain.arreter()
+        self.assertFalse(ecrivain._thread.is_alive())
+        self.assertEqual([len(lot) for lot in ecrivain.lots], [3, 3, 1])
+        self.assertEqual([email for lot in ecrivain.lots for email in lot], [f'{i}@emenu.tg' for i in range(7)])
+        self.assertEqual(ecrivain.profondeur(), 0)
+
+    def test_ecriture_apres_l_intervalle(self):
+        ecrivain = self.ecrivain(batch_size=100, flush_interval_ms=50)
+        ecrivain.enregistrer(email='proprio@emenu.tg')
+        for _ in range(100):
+            if ecrivain.lots:
+                break
+            time.sleep(0.02)
+        self.assertEqual(ecrivain.lots, [['proprio@emenu.tg']])
+
+    @override_settings(LOGIN_HISTORY_ASYNC=False)
+    def test_ecriture_groupee(self):
+        ecrivain = LoginHistoryWriter()
+        # Une requête pour résoudre les emails, un INSERT pour tout le lot
+        with self.assertNumQueries(2):
+            ecrivain._ecrire([
+                {'user_id': self.user.pk, 'login_success': True, 'login_time': timezone.now()},
+                {'email': 'proprio@emenu.tg', 'login_success': False, 'action': 'FAILED_ATTEMPT',
+                 'login_time': timezone.now()},
+                {'email': 'inconnu@emenu.tg', 'login_success': False, 'action': 'FAILED_ATTEMPT',
+                 'login_time': timezone.now()},
+            ])
+        self.assertEqual(ecrivain.stats(), {'profondeur': 0, 'ecrits': 2, 'perdus': 0})
+        self.assertEqual(UserLoginHistory.objects.filter(user=self.user).count(), 2)
+
+        ecrivain.enregistrer(email='proprio@emenu.tg', login_success=False, action='FAILED_ATTEMPT')
+        self.assertEqual(UserLoginHistory.objects.filter(user=self.user).count(), 3)
+
+
+class ArchivageHistoriqueTests(DonneesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.anciennes = [
+            UserLoginHistory.objects.create(user=cls.user, login_time=datetime(2020, mois, jour, tzinfo=dt_timezone.utc))
+            for mois, jour in ((1, 15), (1, 20), (2, 3))
+        ]
+        cls.recente = UserLoginHistory.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.dossier = tempfile.mkdtemp(prefix='emenu-archives-')
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+
+    def archiver(self, *args):
+        sortie = io.StringIO()
+        call_command('archiver_historique', '--dossier', self.dossier, '--batch', '2', *args, stdout=sortie)
+        return sortie.getvalue()
+
+    def archive(self, nom):
+        with gzip.open(os.path.join(self.dossier, nom), 'rt', encoding='utf-8') as fichier:
+            return [json.loads(ligne)['id'] for ligne in fichier]
+
+    def test_jsonl(self):
+        self.assertIn('3 ligne(s) déplacée(s)', self.archiver())
+        self.assertEqual(list(UserLoginHistory.objects.values_list('pk', flat=True)), [self.recente.pk])
+        # Deux lots pour janvier et février : un membre gzip par lot, lisibles d'un seul tenant
+        self.assertEqual(sorted(os.listdir(self.dossier)), ['historique-2020-01.jsonl.gz', 'historique-2020-02.jsonl.gz'])
+        self.assertEqual(self.archive('historique-2020-01.jsonl.gz'), [h.pk for h in self.anciennes[:2]])
+        self.assertEqual(self.archive('historique-2020-02.jsonl.gz'), [self.anciennes[2].pk])
+
+    def test_simulation(self):
+        self.assertIn('3 ligne(s)', self.archiver('--dry-run'))
+        self.assertEqual(UserLoginHistory.objects.count(), 4)
+        self.assertEqual(os.listdir(self.dossier), [])
+
+    def test_reprise(self):
+        commande = archiver_historique.Command()
+        lignes = list(UserLoginHistory.objects.filter(pk=self.anciennes[0].pk).values(*archiver_historique.CHAMPS))
+        # Lot dont le DELETE a été validé, puis lot dont les lignes sont encore en base
+        valide = commande.ecrire_jsonl(self.dossier, '202001', lignes)
+        UserLoginHistory.objects.filter(pk=self.anciennes[0].pk).delete()
+        abandonne = commande.ecrire_jsonl(
+            self.dossier, '202002',
+            list(UserLoginHistory.objects.filter(pk=self.anciennes[2].pk).values(*archiver_historique.CHAMPS)),
+        )
+        commande.reprendre(self.dossier)
+        self.assertFalse(os.path.exists(valide) or os.path.exists(abandonne))
+        self.assertEqual(os.listdir(self.dossier), ['historique-2020-01.jsonl.gz'])
+
+        self.archiver()
+        self.assertEqual(self.archive('historique-2020-01.jsonl.gz'), [h.pk for h in self.anciennes[:2]])
+        self.assertEqual(self.archive('historique-2020-02.jsonl.gz'), [self.anciennes[2].pk])
+
+    def test_tables(self):
+        self.archiver('--format', 'table')
+        self.assertEqual(UserLoginHistory.objects.count(), 1)
+        table = UserLoginHistory._meta.db_table
+        with connection.cursor() as cursor:
+            for mois, attendues in (('202001', self.anciennes[:2]), ('202002', self.anciennes[2:])):
+                cursor.execute(f'SELECT id FROM {connection.ops.quote_name(f"{table}_{mois}")} ORDER BY id')
+                self.assertEqual([ligne[0] for ligne in cursor.fetchall()], [h.pk for h in attendues])
+
+
+class PartitionnementHistoriqueTests(DonneesMixin, TestCase):
+    def test_mysql_uniquement(self):
+        with self.assertRaises(CommandError):
+            call_command('partitionner_historique', stdout=io.StringIO())
+
+    def test_mois_suivant(self):
+        self.assertEqual(partitionner_historique.mois_suivant(date(2024, 12, 1)), date(2025, 1, 1))
+        self.assertEqual(partitionner_historique.mois_suivant(date(2025, 1, 31)), date(2025, 2, 1))
+
+    def test_partitionnement(self):
+        UserLoginHistory.objects.create(user=self.user, login_time=datetime(2024, 11, 5, tzinfo=dt_timezone.utc))
+        instructions = partitionner_historique.Command().sql_partitionnement(
+            UserLoginHistory._meta.db_table, date(2025, 2, 1),
+        )
+        self.assertIn('DROP PRIMARY KEY, ADD PRIMARY KEY (id, login_time)', instructions[-2])
+        self.assertEqual(re.findall(r'PARTITION (\w+) VALUES', instructions[-1]),
+                         ['p202411', 'p202412', 'p202501', 'pmax'])
+        self.assertIn("p202412 VALUES LESS THAN (TO_DAYS('2025-01-01'))", instructions[-1])
+
+    def test_ajout(self):
+        commande = partitionner_historique.Command()
+        table = UserLoginHistory._meta.db_table
+        instructions = commande.sql_ajout(table, {'p202411', 'p202412', 'pmax'}, date(2025, 3, 1))
+        self.assertEqual(len(instructions), 1)
+        self.assertIn('REORGANIZE PARTITION pmax', instructions[0])
+        self.assertEqual(re.findall(r'PARTITION (\w+) VALUES', instructions[0]), ['p202501', 'p202502', 'pmax'])
+        self.assertEqual(commande.sql_ajout(table, {'p202502', 'pmax'}, date(2025, 3, 1)), [])
+
+
+class ImagesTests(DonneesMixin, TestCase):
+    def enregistrer(self, nom, image, format_pil, **options):
+        tampon = io.BytesIO()
+        image.save(tampon, format_pil, **options)
+        return default_storage.save(nom, ContentFile(tampon.getvalue()))
+
+    def ouvrir(self, nom):
+        with default_storage.open(nom, 'rb') as fichier:
+            image = Image.open(io.BytesIO(fichier.read()))
+            image.load()
+        return image
+
+    def test_normalisation(self):
+        # PNG transparent plus large que LARGEUR_MAX : fond blanc, JPEG réduit
+        transparent = Image.new('RGBA', (2000, 1000), (255, 0, 0, 0))
+        nom = images.normaliser_image(self.enregistrer('structures/logo.png', transparent, 'PNG'))
+        image = self.ouvrir(nom)
+        self.assertEqual((nom, image.format, image.mode, image.size), ('structures/logo.jpg', 'JPEG', 'RGB', (1600, 800)))
+        self.assertEqual(image.getpixel((10, 10)), (255, 255, 255))
+
+    def test_orientation_exif(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotation de 90° à appliquer
+        photo = self.enregistrer('structures/portrait.jpg', Image.new('RGB', (40, 20)), 'JPEG', exif=exif)
+        image = self.ouvrir(images.normaliser_image(photo))
+        self.assertEqual(image.size, (20, 40))
+        self.assertNotIn(0x0112, image.getexif())
+
+    def test_declinaisons(self):
+        nom = self.enregistrer('plats/riz.jpg', Image.new('RGB', (1000, 500), 'red'), 'JPEG')
+        variantes = images.generer_variantes(nom)
+        self.assertEqual(variantes['source'], nom)
+        for ext in ('webp', 'jpeg'):
+            self.assertEqual(list(variantes['formats'][ext]), ['200', '400', '800'])
+            chemin = variantes['formats'][ext]['400']
+            self.assertEqual(chemin, f"plats/riz.{variantes['empreinte']}.400w.{ext}")
+            self.assertEqual(self.ouvrir(chemin).size, (400, 200))
+        # Idempotente : mêmes fichiers, aucun nouveau
+        fichiers = sorted(default_storage.listdir('plats')[1])
+        self.assertEqual(images.generer_variantes(nom), variantes)
+        self.assertEqual(sorted(default_storage.listdir('plats')[1]), fichiers)
+
+    def test_pas_d_agrandissement(self):
+        nom = self.enregistrer('plats/petit.jpg', Image.new('RGB', (300, 300)), 'JPEG')
+        self.assertEqual(list(images.generer_variantes(nom)['formats']['jpeg']), ['200', '300'])
+
+    def test_traitement_photo_structure(self):
+        tampon = io.BytesIO()
+        Image.new('RGB', (900, 600), 'green').save(tampon, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.structure.photo.save('facade.png', ContentFile(tampon.getvalue()))
+        original = self.structure.photo.name
+        self.structure.refresh_from_db()
+        self.assertEqual(self.structure.photo_statut, 'en_attente')
+
+        for tache in reserver('worker-test'):
+            self.assertTrue(executer(tache), tache.derniere_erreur)
+        self.structure.refresh_from_db()
+        self.assertEqual(self.structure.photo_statut, 'traitee')
+        self.assertTrue(self.structure.photo.name.endswith('.jpg'))
+        self.assertFalse(default_storage.exists(original))
+        self.assertTrue(all(default_storage.exists(c) for c in images.chemins_variantes(self.structure.photo_variantes)))
+
+    def test_photo_remplacee_pendant_le_traitement(self):
+        photo = self.enregistrer('structures/a.jpg', Image.new('RGB', (300, 200)), 'JPEG')
+        Structure.objects.filter(pk=self.structure.pk).update(photo='structures/b.jpg')
+        fichiers = sorted(default_storage.listdir('structures')[1])
+        self.assertFalse(images.traiter_photo(Structure, self.structure.pk, photo))
+        # Rien n'est écrit ni laissé sur le disque pour une photo qui n'est plus celle de l'objet
+        self.assertEqual(sorted(default_storage.listdir('structures')[1]), fichiers)
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='proprio@emenu.tg', password='secret-123')
+        Structure.objects.bulk_create([
+            Structure(user=user, nom=f'Structure {i}', telephone='90000000', adresse='Rue', ville='Lomé',
+                      type='restaurant')
+            for i in range(7)
+        ])
+        # Dates identiques deux à deux : l'ordre est départagé par la clé primaire
+        base = timezone.now()
+        for i, pk in enumerate(Structure.objects.order_by('pk').values_list('pk', flat=True)):
+            Structure.objects.filter(pk=pk).update(date_creation=base - timedelta(minutes=i // 2))
+        cls.ordre = list(Structure.objects.order_by('-date_creation', '-pk').values_list('pk', flat=True))
+
+    def paginateur(self, queryset=None):
+        return KeysetPaginator(queryset if queryset is not None else Structure.objects.all(), per_page=3)
+
+    def test_pages_suivantes_et_precedentes(self):
+        paginateur = self.paginateur()
+        pages = [paginateur.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginateur.get_page(pages[-1].next_cursor))
+        self.assertEqual([s.pk for page in pages for s in page], self.ordre)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous())
+
+        # Retour arrière depuis la dernière page
+        precedente = paginateur.get_page(pages[-1].previous_cursor)
+        self.assertEqual([s.pk for s in precedente], [s.pk for s in pages[1]])
+        premiere = paginateur.get_page(precedente.previous_cursor)
+        self.assertEqual([s.pk for s in premiere], self.ordre[:3])
+        self.assertFalse(premiere.has_previous())
+        self.assertTrue(premiere.has_next())
+
+    def test_curseur_invalide(self):
+        for curseur in ('nimportequoi', 'eHx5fHo', '!!'):
+            self.assertEqual([s.pk for s in self.paginateur().get_page(curseur)], self.ordre[:3])
+        with self.assertRaises(InvalidCursor):
+            self.paginateur().decode_cursor('eHx5fHo')
+
+    def test_lignes_values(self):
+        paginateur = self.paginateur(Structure.objects.values('id', 'nom', 'date_creation'))
+        page = paginateur.get_page()
+        suivante = paginateur.get_page(page.next_cursor)
+        self.assertEqual([ligne['id'] for ligne in suivante], self.ordre[3:6])
+
+    def test_asynchrone(self):
+        page = async_to_sync(self.paginateur().aget_page)()
+        self.assertEqual([s.pk for s in page], self.ordre[:3])
@@ -0,0 +1,21 @@
+from taches.file import tache
+
+from .images import traiter_photo
+from .models import Structure, User
+from .versioning import invalider_structures
+
+
+def photo_en_echec(modele, pk, photo, remplaces=()):
+    model = {'structure': Structure, 'user': User}[modele]
+    if photo:
+        model.objects.filter(pk=pk, photo=photo).update(photo_statut='echec')
+
+
+@tache('accounts.traiter_photo', max_tentatives=3, en_echec=photo_en_echec)
+def traiter_photo_compte(modele, pk, photo, remplaces=()):
+    """Normalise la photo d'une structure ou d'un utilisateur et génère ses déclinaisons."""
+    if modele == 'structure':
+        if traiter_photo(Structure, pk, photo, remplaces=remplaces):
+            invalider_structures([pk])
+    else:
+        traiter_photo(User, pk, photo, remplaces=remplaces)
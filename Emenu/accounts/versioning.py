@@ -0,0 +1,100 @@
+"""
+Numéro de version par structure, utilisé pour invalider les caches de rendu.
+
+Toute modification d'une structure, de ses menus ou de leurs plats incrémente
+la version (voir les signaux de ``accounts`` et ``menu``). Les fragments mis
+en cache incluent la version dans leur clé : une nouvelle version rend
+simplement les anciennes entrées inaccessibles, sans suppression explicite.
+
+La version vaut un horodatage en millisecondes. Si l'entrée est évincée du
+cache, la valeur recréée reste supérieure aux précédentes et ne peut donc
+pas ressusciter un fragment périmé. Elle sert aussi de date de dernière
+modification. Elle expire au bout de ``VERSION_TIMEOUT`` sans modification,
+pour la même raison sans risque, et n'est créée que pour une structure
+existante : un identifiant quelconque dans l'URL ne crée aucune entrée.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Structure
+
+# Structures à invalider en fin de bloc ``invalidations_groupees`` (None hors bloc)
+_groupe = contextvars.ContextVar('invalidations_groupees', default=None)
+# Une version recréée après expiration est plus récente : les fragments en cache sont simplement recalculés
+VERSION_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _cle(structure_id):
+    return f'structure:{structure_id}:version'
+
+
+def _maintenant():
+    return int(time.time() * 1000)
+
+
+def get_version(structure_id):
+    """Version de la structure, ou None si elle n'existe pas."""
+    cle = _cle(structure_id)
+    version = cache.get(cle)
+    if version is None:
+        if not Structure.objects.filter(pk=structure_id).exists():
+            return None
+        cache.add(cle, _maintenant(), VERSION_TIMEOUT)
+        version = cache.get(cle)
+    return version
+
+
+async def aget_version(structure_id):
+    """Version asynchrone de ``get_version`` (API de cache asynchrone)."""
+    cle = _cle(structure_id)
+    version = await cache.aget(cle)
+    if version is None:
+        if not await Structure.objects.filter(pk=structure_id).aexists():
+            return None
+        await cache.aadd(cle, _maintenant(), VERSION_TIMEOUT)
+        version = await cache.aget(cle)
+    return version
+
+
+def incrementer_versions(structure_ids):
+    """Passe immédiatement les structures données à une nouvelle version."""
+    cles = [_cle(pk) for pk in set(structure_ids) if pk]
+    if not cles:
+        return
+    actuelles = cache.get_many(cles)
+    maintenant = _maintenant()
+    cache.set_many({cle: max(maintenant, actuelles.get(cle, 0) + 1) for cle in cles}, VERSION_TIMEOUT)
+
+
+def invalider_structures(structure_ids):
+    """Incrémente les versions une fois la transaction courante validée."""
+    groupe = _groupe.get()
+    if groupe is not None:
+        groupe.update(structure_ids)
+        return
+    structure_ids = set(structure_ids)
+    if structure_ids:
+        transaction.on_commit(lambda: incrementer_versions(structure_ids))
+
+
+@contextmanager
+def invalidations_groupees():
+    """
+    Regroupe les invalidations émises dans le bloc (signaux ligne à ligne d'une
+    opération en masse) en une seule, à la sortie du bloc.
+    """
+    if _groupe.get() is not None:
+        # Bloc imbriqué : le bloc englobant invalidera
+        yield
+        return
+    structure_ids = set()
+    jeton = _groupe.set(structure_ids)
+    try:
+        yield
+    finally:
+        _groupe.reset(jeton)
+        invalider_structures(structure_ids)
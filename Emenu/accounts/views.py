@@ -1,78 +1,116 @@
 # Importations des modules nécessaires
+import math
+
 from django.contrib.auth.decorators import login_required
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import login, authenticate, logout, update_session_auth_hash
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib import messages
+from django.conf import settings
 
+from Emenu.instrumentation import budget_requetes
 from menu.models import Menu
+from menu.publication import menus_publies
 from .forms import UserLoginForm, UserRegistrationForm, StructureRegistrationForm
+from .audit import login_history_writer
+from . import geo
+from .facets import aget_facettes
+from .limitation import limiteur_connexion
 from .models import Structure, User, UserLoginHistory
+from .pagination import KeysetPaginator
+from .structure_utilisateur import a_une_structure
+from .versioning import aget_version
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from .forms import UserUpdateForm, CustomPasswordChangeForm, UserDeleteForm, StructureUpdateForm
 from django.contrib.auth import get_user_model
 
 # Récupère le modèle User personnalisé (si vous avez un modèle User personnalisé)
 User = get_user_model()
 
+# Nombre de structures affichées par page dans l'annuaire
+STRUCTURES_PAR_PAGE = 24
+
+# Durée de vie (secondes) du fragment en cache de la page publique d'une structure ;
+# toute modification change la version et rend l'ancien fragment inaccessible
+DETAIL_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Icônes Font Awesome des tuiles de catégories de la page d'accueil
+CATEGORIE_ICONES = {
+    'restaurant': 'fa-utensils',
+    'cafe': 'fa-mug-hot',
+    'bar': 'fa-cocktail',
+    'hotel': 'fa-hotel',
+    'autre': 'fa-store',
+}
+
+async def _arender(request, template, context):
+    # Rendu dans le thread synchrone : les querysets paresseux du gabarit (fragments
+    # hors cache) et le processeur de contexte auth y accèdent à la base
+    return await sync_to_async(render)(request, template, context)
+
+def _adresse_ip(request):
+    # X-Forwarded-For est fourni par le client : seules les entrées ajoutées par nos propres
+    # proxies (EMENU_PROXIES_DE_CONFIANCE, comptés depuis la droite) sont crues
+    proxies = settings.EMENU_PROXIES_DE_CONFIANCE
+    if proxies:
+        adresses = [a.strip() for a in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if a.strip()]
+        if len(adresses) >= proxies:
+            return adresses[-proxies]
+    return request.META.get('REMOTE_ADDR')
+
+
+def _journaliser(request, user=None, email=None, **champs):
+    """Dépose un événement de connexion dans la file d'écriture différée (aucun INSERT ici)"""
+    login_history_writer.enregistrer(
+        user_id=user.pk if user else None,
+        email=email,
+        ip_address=_adresse_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],  # Limité à 255 caractères
+        **champs
+    )
+
 def login_view(request):
     # Si l'utilisateur est déjà authentifié, on le redirige
     if request.user.is_authenticated:
         # Vérifie si l'utilisateur a une structure associée
-        if hasattr(request.user, 'structure') and request.user.structure:
+        if a_une_structure(request.user.pk):
             return redirect('accounts:dashboard')
         return redirect('accounts:home')
 
     if request.method == 'POST':
-        # Traitement du formulaire de connexion
+        email = request.POST.get('username', '')
+        ip = _adresse_ip(request)
+        # Refus avant toute requête SQL et tout hachage de mot de passe
+        attente = limiteur_connexion.attente(ip, email)
+        if attente:
+            messages.error(request, "Trop de tentatives de connexion. "
+                                    f"Réessayez dans {math.ceil(attente / 60)} minute(s).")
+            response = render(request, 'accounts/login.html', {'form': UserLoginForm()}, status=429)
+            response['Retry-After'] = str(attente)
+            return response
+
+        # Traitement du formulaire de connexion (authenticate() est appelé par le formulaire)
         form = UserLoginForm(request, data=request.POST)
         if form.is_valid():
-            email = form.cleaned_data.get('username')  # On utilise l'email comme identifiant
-            password = form.cleaned_data.get('password')
-
-            # Authentification de l'utilisateur
-            user = authenticate(request, username=email, password=password)
+            user = form.get_user()
 
             if user is not None:
+                limiteur_connexion.reussite(email)
                 # Enregistrement de la tentative de connexion réussie dans l'historique
-                # Récupération de l'adresse IP (gère les proxies)
-                x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-                ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-
-                # Création d'un enregistrement d'historique de connexion
-                UserLoginHistory.objects.create(
-                    user=user,
-                    ip_address=ip_address,
-                    user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],  # Limité à 255 caractères
-                    login_success=True
-                )
+                _journaliser(request, user=user, login_success=True)
 
                 # Connexion effective de l'utilisateur
                 login(request, user)
                 messages.success(request, f"Bienvenue {user.first_name}!")
 
                 # Redirection selon si l'utilisateur a une structure associée
-                if Structure.objects.filter(user=user).exists():
+                if a_une_structure(user.pk):
                     return redirect('accounts:dashboard')
                 return redirect('accounts:home')
 
-        # Gestion des échecs de connexion
-        email = request.POST.get('username', '')
-        try:
-            user = User.objects.get(email=email) if email else None
-        except User.DoesNotExist:
-            user = None
-
-        if user:
-            # Enregistrement de la tentative de connexion échouée
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-
-            UserLoginHistory.objects.create(
-                user=user,
-                ip_address=ip_address,
-                user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
-                login_success=False
-            )
+        # Échec compté en mémoire ; seul un résumé périodique est journalisé
+        limiteur_connexion.echec(ip, email, request.META.get('HTTP_USER_AGENT', ''))
 
         messages.error(request, "Email ou mot de passe incorrect.")
         return redirect('accounts:login')
@@ -125,6 +163,7 @@ def register_structure(request):
         'structures_count': request.user.structure.count()  # Compte le nombre de structures de l'utilisateur
     })
 
+@budget_requetes(8)
 @login_required
 def dashboard(request):
     """Tableau de bord de l'utilisateur connecté"""
@@ -144,31 +183,29 @@ def dashboard(request):
     }
     return render(request, 'dashboard.html', context)
 
-def home_view(request):
+@budget_requetes(6)
+async def home_view(request):
     """Page d'accueil du site"""
+    # Compteurs par type lus depuis le cache des facettes (aucun COUNT par requête)
+    compteurs = (await aget_facettes())['type']
     context = {
         'categories': [
-            {'name': 'Restaurants', 'icon': 'fa-utensils', 'count': 42},
-            {'name': 'Cafés', 'icon': 'fa-coffee', 'count': 23},
-            {'name': 'Hôtels', 'icon': 'fa-hotel', 'count': 15},
-            {'name': 'Bars', 'icon': 'fa-glass-martini-alt', 'count': 18},
+            {'name': label, 'type': value, 'icon': CATEGORIE_ICONES.get(value, 'fa-store'),
+             'count': compteurs.get(value, 0)}
+            for value, label in Structure.TYPE_CHOICES
         ],
-        'featured_structures': Structure.objects.all()[:4]  # 4 premières structures
+        'featured_structures': [s async for s in Structure.objects.all()[:4]]  # 4 premières structures
     }
-    return render(request, 'index.html', context)
+    return await _arender(request, 'index.html', context)
 
 @login_required
 def logout_view(request):
     """Déconnexion de l'utilisateur"""
     if request.user.is_authenticated:
         # Enregistrement de la déconnexion dans l'historique
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        ip_address = x_forwarded_for.split(',')[0] if x_forwarded_for else request.META.get('REMOTE_ADDR')
-
-        UserLoginHistory.objects.create(
+        _journaliser(
+            request,
             user=request.user,
-            ip_address=ip_address,
-            user_agent=request.META.get('HTTP_USER_AGENT', '')[:255],
             login_success=True,
             action='LOGOUT'  # Champ optionnel pour différencier connexion/déconnexion
         )
@@ -226,21 +263,62 @@ def account_delete(request):
 
     return render(request, 'accounts/account_delete.html', {'form': form})
 
-def list_structures(request):
-    """Liste toutes les structures disponibles"""
-    featured_structures = Structure.objects.all().order_by('-id')
+# Recherche par proximité : une requête de plus par élargissement du rayon (voir geo.py) ;
+# à froid, les facettes et la densité des cellules sont recalculées
+@budget_requetes(7)
+async def list_structures(request):
+    """Annuaire des structures, filtré et paginé côté serveur"""
+    ville = request.GET.get('ville', '').strip()
+    type_structure = request.GET.get('type', '').strip()
+    recherche = request.GET.get('q', '').strip()
+
+    structures = Structure.objects.all()
+    if ville:
+        structures = structures.filter(ville=ville)
+    if type_structure:
+        structures = structures.filter(type=type_structure)
+    if recherche:
+        structures = structures.filter(nom__icontains=recherche)
+
+    point = geo.position(request.GET)
+    if point:
+        # « Près de moi » : les plus proches d'abord, sans pagination
+        proches = await sync_to_async(geo.plus_proches)(structures, *point, nombre=STRUCTURES_PAR_PAGE)
+        par_pk = await Structure.objects.ain_bulk([pk for pk, _ in proches])
+        page_obj = []
+        for pk, distance in proches:
+            structure = par_pk[pk]
+            structure.distance_km = distance
+            page_obj.append(structure)
+    else:
+        # Pagination par curseur : coût constant quelle que soit la page demandée
+        page_obj = await KeysetPaginator(structures, per_page=STRUCTURES_PAR_PAGE).aget_page(request.GET.get('curseur'))
+
+    # Villes et catégories des filtres avec leur nombre de structures (lus depuis le cache)
+    facettes = await aget_facettes()
+    villes = sorted(facettes['ville'].items())
+    categories = [
+        (value, label, facettes['type'].get(value, 0)) for value, label in Structure.TYPE_CHOICES
+    ]
 
-    # Récupère les villes et catégories uniques pour les filtres
-    villes = Structure.objects.values_list('ville', flat=True).distinct()
-    categories = Structure.objects.values_list('type', flat=True).distinct()
+    # Paramètres de filtre à conserver dans les liens de pagination
+    filtres = request.GET.copy()
+    filtres.pop('curseur', None)
 
     context = {
-        'featured_structures': featured_structures,
+        'featured_structures': page_obj,
+        'page_obj': page_obj,
+        'is_paginated': not point and page_obj.has_other_pages(),
+        'proximite': bool(point),
         'villes': villes,
         'categories': categories,
+        'filtres': filtres.urlencode(),
+        'ville': ville,
+        'type': type_structure,
+        'q': recherche,
         'title': 'Nos Structures Partenaires'
     }
-    return render(request, 'structure.html', context)
+    return await _arender(request, 'structure.html', context)
 
 @login_required
 def structure_detail(request, pk):
@@ -248,19 +326,28 @@ def structure_detail(request, pk):
     structure = get_object_or_404(Structure, pk=pk, user=request.user)
     return render(request, 'accounts/structure_detail.html', {'structure': structure})
 
+@budget_requetes(7)
 @login_required(login_url='accounts:login')
-def detail(request, pk):
+async def detail(request, pk):
     """Détails d'une structure spécifique avec les menus et les plats qui la constituent"""
-    structure = get_object_or_404(Structure, pk=pk)
-    menus = Menu.objects.filter(structure=structure).prefetch_related(
-        'plats')  # Récupère tous les menus de cette structure avec leurs plats
+    structure = await aget_object_or_404(Structure, pk=pk)
+    user = await request.auser()
+    # Évalués seulement si le fragment n'est pas en cache : les clients voient
+    # les instantanés des menus publiés, pas les modifications en cours
+    menus = SimpleLazyObject(lambda: menus_publies(structure.pk))
+    has_structure = structure.user_id == user.pk  # Vérifie si l'utilisateur est propriétaire
 
     context = {
         'structure': structure,
         'menus': menus,
-        'has_structure': request.user == structure.user  # Vérifie si l'utilisateur est propriétaire
+        'has_structure': has_structure,
+        # Partie réservée au propriétaire, jamais mise en cache
+        'menus_gestion': (Menu.objects.filter(structure=structure).values('pk', 'nom', 'status')
+                          if has_structure else None),
+        'version': await aget_version(structure.pk),
+        'cache_timeout': DETAIL_CACHE_TIMEOUT,
     }
-    return render(request, 'detail.html', context)
+    return await _arender(request, 'detail.html', context)
 
 @login_required
 def structure_update(request, pk):
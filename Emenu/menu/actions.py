@@ -0,0 +1,73 @@
+"""
+Actions en masse sur les plats d'un propriétaire (liste des plats).
+
+Chaque action s'exécute en un seul ``update()`` ou ``delete()`` sur le
+queryset des plats sélectionnés, déjà restreint au créateur. ``update()``
+n'émettant aucun signal, les menus actifs qui contiennent ces plats sont
+republiés ici, une fois chacun pour tout le lot : les pages publiques et
+l'API lisent les versions publiées.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Round
+
+from accounts.versioning import invalidations_groupees
+from recherche import index
+
+from .models import Plat
+from .publication import menus_contenant, republier
+
+# Plus grand prix représentable (DecimalField max_digits=6, decimal_places=2)
+PRIX_MAX = Decimal('9999.99')
+
+ACTIONS = [
+    ('disponible', 'Marquer disponibles'),
+    ('indisponible', 'Marquer indisponibles'),
+    ('prix_montant', 'Ajuster le prix (montant en Fcfa)'),
+    ('prix_pourcentage', 'Ajuster le prix (pourcentage)'),
+    ('categorie', 'Changer la catégorie'),
+    ('supprimer', 'Supprimer'),
+]
+
+
+def appliquer_action(plats, action, valeur=None, categorie=None, auteur=None):
+    """
+    Applique ``action`` aux plats du queryset ``plats`` et republie les menus
+    actifs qui les contiennent. Retourne le nombre de plats modifiés ; pour
+    les prix, les plats dont le nouveau prix sortirait des bornes sont
+    laissés tels quels.
+    """
+    with transaction.atomic():
+        # Lus avant une éventuelle suppression des plats
+        menus = menus_contenant(plats.values('pk'))
+        if action == 'supprimer':
+            # Les signaux de suppression restent émis ligne à ligne (compteurs, index) ;
+            # leurs invalidations de cache sont regroupées en une seule
+            with invalidations_groupees():
+                nombre = plats.delete()[1].get(Plat._meta.label, 0)
+            republier(menus, auteur=auteur)
+            return nombre
+
+        if action in ('disponible', 'indisponible'):
+            nombre = plats.update(disponibilite=(action == 'disponible'))
+        elif action == 'prix_montant':
+            nombre = plats.filter(prix__gt=-valeur, prix__lte=PRIX_MAX - valeur).update(prix=F('prix') + valeur)
+        elif action == 'prix_pourcentage':
+            facteur = 1 + valeur / 100
+            if facteur <= 0:
+                return 0
+            nombre = (plats.filter(prix__gte=Decimal('0.01') / facteur, prix__lte=PRIX_MAX / facteur)
+                      .update(prix=Round(F('prix') * facteur, 2)))
+        elif action == 'categorie':
+            nombre = plats.update(categorie=categorie)
+            # La catégorie fait partie du texte indexé
+            index.indexer(list(plats))
+        else:
+            raise ValueError(f"Action inconnue : {action}")
+
+        # Une action sans effet (aucun prix dans les bornes) ne change aucune version
+        if nombre:
+            republier(menus, auteur=auteur)
+        return nombre
@@ -0,0 +1,169 @@
+"""
+API JSON publique, en lecture seule : structures, menus actifs et plats.
+
+Les réponses sont construites à partir de ``values()`` et des instantanés
+des menus publiés (voir menu/publication.py), sans aucune instance de
+modèle, et mises en cache sous le numéro de version de la structure (voir
+accounts/versioning.py). Ce même numéro fournit l'ETag et l'en-tête
+Last-Modified : une requête conditionnelle (If-None-Match/If-Modified-Since)
+à jour reçoit un 304 après une seule lecture du cache, sans aucune requête
+SQL. Les bornes et kiosques peuvent donc interroger l'API toutes les
+quelques secondes.
+"""
+import json
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
+from django.views.decorators.http import condition, require_GET
+
+from accounts import geo
+from accounts.images import urls_photo
+from accounts.models import Structure
+from Emenu.instrumentation import budget_requetes
+from accounts.pagination import KeysetPaginator
+from accounts.versioning import get_version
+
+from .publication import menus_publies
+
+API_CACHE_TIMEOUT = 60 * 60 * 24
+STRUCTURES_PAR_PAGE = 50
+
+CHAMPS_STRUCTURE = ['id', 'nom', 'type', 'ville', 'adresse', 'telephone', 'heure_ouverture',
+                    'description', 'latitude', 'longitude', 'photo', 'photo_variantes']
+PROCHES_MAX = 50
+
+
+def _version(request, pk):
+    # Lue une seule fois par requête, pour l'ETag comme pour Last-Modified
+    if not hasattr(request, '_version_structure'):
+        request._version_structure = get_version(pk)
+    return request._version_structure
+
+
+def _etag(request, pk, **kwargs):
+    # Structure inexistante : pas d'ETag, donc jamais de 304 ; la vue répond 404
+    version = _version(request, pk)
+    return f"s{pk}-v{version}" if version is not None else None
+
+
+def _last_modified(request, pk, **kwargs):
+    version = _version(request, pk)
+    return datetime.fromtimestamp(version / 1000, tz=dt_timezone.utc) if version is not None else None
+
+
+def _corps_menu(request, pk, menu_pk):
+    """
+    Corps JSON du menu ``menu_pk`` (en cache sous la version de la
+    structure), None s'il ne fait pas partie des menus publiés. Calculé une
+    seule fois par requête, pour l'ETag, Last-Modified et la vue.
+    """
+    if not hasattr(request, '_corps_menu'):
+        version, corps = _version(request, pk), None
+        if version is not None:
+            cle = f'api:structure:{pk}:menu:{menu_pk}:{version}'
+            corps = cache.get(cle)
+            if corps is None:
+                menus = menus_publies(pk, menu_pk)
+                if menus:
+                    corps = _json(menus[0])
+                    cache.set(cle, corps, API_CACHE_TIMEOUT)
+        request._corps_menu = corps
+    return request._corps_menu
+
+
+def _etag_menu(request, pk, menu_pk):
+    # Menu inexistant ou non publié : pas d'ETag, donc jamais de 304 ; la vue répond 404
+    if _corps_menu(request, pk, menu_pk) is None:
+        return None
+    return f"s{pk}-m{menu_pk}-v{_version(request, pk)}"
+
+
+def _last_modified_menu(request, pk, menu_pk):
+    if _corps_menu(request, pk, menu_pk) is None:
+        return None
+    return _last_modified(request, pk)
+
+
+def _json(contenu):
+    return json.dumps(contenu, cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def _reponse(corps):
+    reponse = HttpResponse(corps, content_type='application/json')
+    # Le client revalide à chaque fois : la revalidation ne coûte qu'une lecture du cache
+    reponse['Cache-Control'] = 'public, no-cache'
+    return reponse
+
+
+@budget_requetes(1)
+@require_GET
+def structures(request):
+    """Liste des structures (filtres ville et type), paginée par curseur."""
+    queryset = Structure.objects.values(*CHAMPS_STRUCTURE, 'date_creation')
+    if request.GET.get('ville'):
+        queryset = queryset.filter(ville=request.GET['ville'])
+    if request.GET.get('type'):
+        queryset = queryset.filter(type=request.GET['type'])
+
+    page = KeysetPaginator(queryset, per_page=STRUCTURES_PAR_PAGE).get_page(request.GET.get('curseur'))
+    return _reponse(_json({
+        'resultats': [urls_photo(ligne) for ligne in page],
+        'curseur_suivant': page.next_cursor,
+        'curseur_precedent': page.previous_cursor,
+    }))
+
+
+@budget_requetes(3)
+@require_GET
+def structures_proches(request):
+    """Les ``n`` structures les plus proches de ``lat``/``lon`` (filtre type), avec leur distance."""
+    point = geo.position(request.GET)
+    if point is None:
+        return HttpResponseBadRequest(_json({'erreur': "Paramètres lat et lon requis."}),
+                                      content_type='application/json')
+    try:
+        nombre = min(max(int(request.GET.get('n', 10)), 1), PROCHES_MAX)
+    except ValueError:
+        nombre = 10
+
+    queryset = Structure.objects.all()
+    if request.GET.get('type'):
+        queryset = queryset.filter(type=request.GET['type'])
+    proches = geo.plus_proches(queryset, *point, nombre=nombre)
+    lignes = {ligne['id']: ligne for ligne in
+              Structure.objects.filter(pk__in=[pk for pk, _ in proches]).values(*CHAMPS_STRUCTURE)}
+    return _reponse(_json({'resultats': [
+        {**urls_photo(lignes[pk]), 'distance_km': round(distance, 3)} for pk, distance in proches
+    ]}))
+
+
+# À froid : version de la structure, structure et menus publiés (deux requêtes)
+@budget_requetes(4)
+@require_GET
+@condition(etag_func=_etag, last_modified_func=_last_modified)
+def structure(request, pk):
+    """Une structure et ses menus actifs, plats compris."""
+    cle = f'api:structure:{pk}:{_version(request, pk)}'
+    # Corps JSON déjà sérialisé en cache
+    corps = cache.get(cle)
+    if corps is None:
+        ligne = Structure.objects.filter(pk=pk).values(*CHAMPS_STRUCTURE).first()
+        if ligne is None:
+            raise Http404("Structure introuvable")
+        corps = _json({'structure': urls_photo(ligne), 'menus': menus_publies(pk)})
+        cache.set(cle, corps, API_CACHE_TIMEOUT)
+    return _reponse(corps)
+
+
+# À froid : version de la structure et menu publié (deux requêtes)
+@budget_requetes(3)
+@require_GET
+@condition(etag_func=_etag_menu, last_modified_func=_last_modified_menu)
+def menu(request, pk, menu_pk):
+    """Un menu actif d'une structure avec ses plats."""
+    corps = _corps_menu(request, pk, menu_pk)
+    if corps is None:
+        raise Http404("Menu introuvable")
+    return _reponse(corps)
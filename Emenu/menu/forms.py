@@ -1,6 +1,9 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from .actions import ACTIONS
 from .models import Plat, Menu, Avis
 
 User = get_user_model()
@@ -58,6 +61,19 @@ class PlatForm(forms.ModelForm):
         return prix
 
 
+class ChoixPlatsField(forms.TypedMultipleChoiceField):
+    """Choix multiple validé par un ensemble, et non choix par choix pour chaque plat coché."""
+
+    def validate(self, value):
+        if self.required and not value:
+            raise ValidationError(self.error_messages['required'], code='required')
+        valides = {str(pk) for pk, _ in self.choices}
+        for valeur in value:
+            if str(valeur) not in valides:
+                raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                                      params={'value': valeur})
+
+
 class MenuForm(forms.ModelForm):
     nom = forms.CharField(
         widget=forms.TextInput(attrs={
@@ -71,8 +87,10 @@ class MenuForm(forms.ModelForm):
             'class': 'form-control'
         })
     )
-    plats = forms.ModelMultipleChoiceField(
-        queryset=Plat.objects.none(),  # Sera surchargé dans __init__
+    # Identifiants des plats : les choix sont lus par une requête values_list légère
+    # et les cases à cocher rendues directement par le gabarit (voir plats_par_categorie)
+    plats = ChoixPlatsField(
+        coerce=int,
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         }),
@@ -81,14 +99,24 @@ class MenuForm(forms.ModelForm):
 
     class Meta:
         model = Menu
-        fields = ['nom', 'status', 'plats']
+        # Les plats sont enregistrés à part (voir _save_m2m), sans instancier de Plat
+        fields = ['nom', 'status']
 
     def __init__(self, *args, **kwargs):
         user = kwargs.pop('user', None)
         super().__init__(*args, **kwargs)
 
+        self._plats = []
         if user:
-            self.fields['plats'].queryset = Plat.objects.filter(createur=user)
+            self._plats = list(Plat.objects.filter(createur=user).order_by('categorie', 'nom')
+                               .values_list('id', 'nom', 'categorie'))
+        self.fields['plats'].choices = [(pk, nom) for pk, nom, _ in self._plats]
+
+        self._plats_actuels = set()
+        if self.instance.pk:
+            self._plats_actuels = set(Menu.plats.through.objects.filter(menu_id=self.instance.pk)
+                                      .values_list('plat_id', flat=True))
+            self.initial.setdefault('plats', list(self._plats_actuels))
 
     def clean_plats(self):
         plats = self.cleaned_data.get('plats')
@@ -96,6 +124,115 @@ class MenuForm(forms.ModelForm):
             raise ValidationError("Vous devez sélectionner au moins un plat.")
         return plats
 
+    def plats_par_categorie(self):
+        """``[(libellé de catégorie, [(id, nom, coché), ...]), ...]`` pour le gabarit."""
+        selection = {int(pk) for pk in (self['plats'].value() or []) if str(pk).isdigit()}
+        # Groupes dans l'ordre des catégories du modèle
+        groupes = {categorie: [] for categorie, _ in Plat.CATEGORIES}
+        for pk, nom, categorie in self._plats:
+            groupes.setdefault(categorie, []).append((pk, nom, pk in selection))
+        libelles = dict(Plat.CATEGORIES)
+        return [(libelles.get(categorie, categorie), plats) for categorie, plats in groupes.items() if plats]
+
+    def _save_m2m(self):
+        super()._save_m2m()
+        menu = self.instance
+        voulus = set(self.cleaned_data['plats'])
+        ajouts = voulus - self._plats_actuels
+        retraits = self._plats_actuels - voulus
+        through = Menu.plats.through
+
+        # Un seul DELETE et un seul INSERT sur la table de liaison, au lieu de set() ;
+        # m2m_changed est émis comme le ferait Django (compteur, cache des structures)
+        with transaction.atomic():
+            if retraits:
+                m2m_changed.send(sender=through, action='pre_remove', instance=menu, reverse=False,
+                                 model=Plat, pk_set=retraits, using=menu._state.db)
+                through.objects.filter(menu_id=menu.pk, plat_id__in=retraits).delete()
+                m2m_changed.send(sender=through, action='post_remove', instance=menu, reverse=False,
+                                 model=Plat, pk_set=retraits, using=menu._state.db)
+            if ajouts:
+                m2m_changed.send(sender=through, action='pre_add', instance=menu, reverse=False,
+                                 model=Plat, pk_set=ajouts, using=menu._state.db)
+                through.objects.bulk_create([through(menu_id=menu.pk, plat_id=pk) for pk in ajouts])
+                m2m_changed.send(sender=through, action='post_add', instance=menu, reverse=False,
+                                 model=Plat, pk_set=ajouts, using=menu._state.db)
+        self._plats_actuels = voulus
+
+
+class ImportPlatsForm(forms.Form):
+    fichier = forms.FileField(
+        help_text="CSV (séparateur « ; » ou « , ») ou XLSX, avec les colonnes nom, description, prix, "
+                  "categorie et disponibilite.",
+        widget=forms.FileInput(attrs={
+            'class': 'form-control',
+            'accept': '.csv,.xlsx'
+        })
+    )
+    menu = forms.ModelChoiceField(
+        queryset=Menu.objects.none(),  # Sera surchargé dans __init__
+        required=False,
+        empty_label="Aucun menu",
+        help_text="Ajoute aussi les plats importés à ce menu.",
+        widget=forms.Select(attrs={
+            'class': 'form-control'
+        })
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        if user:
+            self.fields['menu'].queryset = Menu.objects.filter(createur=user).only('pk', 'nom', 'structure_id')
+
+
+class ActionsPlatsForm(forms.Form):
+    action = forms.ChoiceField(
+        choices=ACTIONS,
+        widget=forms.Select(attrs={
+            'class': 'form-select form-select-sm'
+        })
+    )
+    plats = forms.ModelMultipleChoiceField(
+        queryset=Plat.objects.none(),  # Sera surchargé dans __init__
+        error_messages={'required': "Sélectionnez au moins un plat."}
+    )
+    valeur = forms.DecimalField(
+        required=False,
+        max_digits=8,
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control form-control-sm',
+            'placeholder': 'Montant ou %',
+            'step': '0.01'
+        })
+    )
+    categorie = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Catégorie...')] + list(Plat.CATEGORIES),
+        widget=forms.Select(attrs={
+            'class': 'form-select form-select-sm'
+        })
+    )
+
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+
+        if user:
+            # Toute action est limitée aux plats de l'utilisateur
+            self.fields['plats'].queryset = Plat.objects.filter(createur=user)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+        if action in ('prix_montant', 'prix_pourcentage') and cleaned_data.get('valeur') is None:
+            raise ValidationError("Indiquez le montant ou le pourcentage d'ajustement du prix.")
+        if action == 'categorie' and not cleaned_data.get('categorie'):
+            raise ValidationError("Choisissez la nouvelle catégorie.")
+        return cleaned_data
+
 
 class AvisForm(forms.ModelForm):
     note = forms.ChoiceField(
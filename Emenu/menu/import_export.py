@@ -0,0 +1,263 @@
+"""
+Import et export en masse des plats d'un propriétaire.
+
+L'import lit le fichier ligne à ligne (CSV, ou XLSX si openpyxl est
+installé), valide chaque ligne avec les règles de ``PlatForm`` puis insère les
+plats par lots avec ``bulk_create``. Une ligne dont la colonne ``id`` désigne
+un plat du propriétaire met ce plat à jour (``bulk_update``) : un export
+réimporté ne duplique rien. Les plats peuvent être rattachés à un menu en un
+seul INSERT dans la table de liaison. ``bulk_create`` et ``bulk_update``
+n'émettant aucun signal, l'indexation de recherche, le compteur ``nb_plats``,
+la version des structures et la publication des menus actifs concernés sont
+mis à jour ici. Un fichier plus gros que ``IMPORT_PLATS_TAILLE_MAX`` octets ou
+de plus de ``IMPORT_PLATS_LIGNES_MAX`` lignes est refusé avant lecture.
+
+L'export produit le CSV au fil de l'eau, par lots lus sur la clé primaire :
+la liste complète n'est jamais chargée en mémoire.
+"""
+import csv
+import io
+import os
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from accounts.versioning import invalider_structures
+from recherche import index
+
+from .forms import PlatForm
+from .models import Menu, Plat
+from .publication import menus_contenant, republier
+
+try:
+    import openpyxl
+except ImportError:  # XLSX optionnel
+    openpyxl = None
+
+COLONNES = ['nom', 'description', 'prix', 'categorie', 'disponibilite']
+COLONNES_EXPORT = ['id'] + COLONNES + ['menus']
+VRAI = {'1', 'oui', 'o', 'true', 'vrai', 'x', 'yes', 'y'}
+CATEGORIES_PAR_LIBELLE = {libelle.lower(): valeur for valeur, libelle in Plat.CATEGORIES}
+
+
+class FormatNonSupporte(ValueError):
+    pass
+
+
+class FichierTropVolumineux(ValueError):
+    pass
+
+
+class RapportImport:
+    def __init__(self):
+        self.crees = 0
+        self.modifies = 0
+        self.erreurs = []  # (numéro de ligne, {champ: [messages]})
+
+    @property
+    def lignes_en_erreur(self):
+        return len(self.erreurs)
+
+
+def lire_lignes(fichier, nom, limiter=True):
+    """
+    Itère sur les lignes du fichier sous forme de dictionnaires (en-têtes en
+    minuscules). Avec ``limiter``, lève FichierTropVolumineux si le fichier
+    dépasse les limites d'import, avant d'en lire le contenu.
+    """
+    extension = os.path.splitext(nom)[1].lower()
+    if extension not in ('.xlsx', '.csv', '.txt', ''):
+        raise FormatNonSupporte(f"Format non pris en charge : {extension}")
+    if extension == '.xlsx' and openpyxl is None:
+        raise FormatNonSupporte("L'import XLSX nécessite openpyxl ; utilisez un fichier CSV.")
+    lignes_max = None
+    if limiter:
+        lignes_max = settings.IMPORT_PLATS_LIGNES_MAX
+        _verifier_taille(fichier, settings.IMPORT_PLATS_TAILLE_MAX, lignes_max if extension != '.xlsx' else None)
+    if extension == '.xlsx':
+        return _limiter(_lire_xlsx(fichier, lignes_max), lignes_max)
+    return _limiter(_lire_csv(fichier), lignes_max)
+
+
+def _verifier_taille(fichier, taille_max, lignes_max=None):
+    """Taille du fichier puis, pour un CSV, nombre de fins de ligne (majorant du nombre de lignes)."""
+    fichier.seek(0, os.SEEK_END)
+    taille = fichier.tell()
+    fichier.seek(0)
+    if taille > taille_max:
+        raise FichierTropVolumineux(
+            f"Fichier trop volumineux : {taille // 1024} Ko pour {taille_max // 1024} Ko au plus."
+        )
+    if lignes_max is not None:
+        fins = sum(morceau.count(b'\n') for morceau in iter(lambda: fichier.read(64 * 1024), b''))
+        fichier.seek(0)
+        # En-têtes en plus des lignes de plats
+        if fins > lignes_max + 1:
+            raise FichierTropVolumineux(f"Fichier trop long : {lignes_max} lignes au plus.")
+
+
+def _limiter(lignes, lignes_max):
+    # Filet de sécurité quand le nombre de lignes n'est pas connu d'avance
+    for numero, ligne in enumerate(lignes, start=1):
+        if lignes_max is not None and numero > lignes_max:
+            raise FichierTropVolumineux(f"Fichier trop long : {lignes_max} lignes au plus.")
+        yield ligne
+
+
+def _lire_csv(fichier):
+    texte = io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+    debut = texte.read(4096)
+    texte.seek(0)
+    try:
+        # Excel en français exporte avec « ; »
+        dialecte = csv.Sniffer().sniff(debut, delimiters=',;\t')
+    except csv.Error:
+        dialecte = csv.excel
+    lecteur = csv.reader(texte, dialecte)
+    entetes = [entete.strip().lower() for entete in next(lecteur, [])]
+    for ligne in lecteur:
+        if any(cellule.strip() for cellule in ligne):
+            yield dict(zip(entetes, ligne))
+        else:
+            yield None
+
+
+def _lire_xlsx(fichier, lignes_max=None):
+    classeur = openpyxl.load_workbook(fichier, read_only=True, data_only=True)
+    try:
+        # Dimensions déclarées par le classeur : refus sans lire les lignes
+        if lignes_max is not None and (classeur.active.max_row or 0) > lignes_max + 1:
+            raise FichierTropVolumineux(f"Fichier trop long : {lignes_max} lignes au plus.")
+        lignes = classeur.active.iter_rows(values_only=True)
+        entetes = [str(entete or '').strip().lower() for entete in next(lignes, ())]
+        for ligne in lignes:
+            valeurs = ['' if cellule is None else str(cellule) for cellule in ligne]
+            yield dict(zip(entetes, valeurs)) if any(v.strip() for v in valeurs) else None
+    finally:
+        classeur.close()
+
+
+def _donnees_formulaire(ligne):
+    donnees = {champ: (ligne.get(champ) or '').strip() for champ in COLONNES}
+    # Montants saisis à la française : « 1 500,50 »
+    donnees['prix'] = re.sub(r'\s', '', donnees['prix']).replace(',', '.')
+    donnees['categorie'] = CATEGORIES_PAR_LIBELLE.get(donnees['categorie'].lower(), donnees['categorie'].lower())
+    disponibilite = donnees.pop('disponibilite').lower()
+    # Colonne absente ou vide : disponible, comme la valeur initiale du formulaire
+    if not disponibilite or disponibilite in VRAI:
+        donnees['disponibilite'] = 'on'
+    return donnees
+
+
+def _identifiant(ligne):
+    valeur = (ligne.get('id') or '').strip()
+    return int(valeur) if valeur.isdigit() else None
+
+
+def importer_plats(lignes, createur, menu=None, batch=500):
+    """
+    Valide et insère les plats de ``lignes`` pour ``createur``, en option dans
+    ``menu`` ; une ligne dont l'id est celui d'un plat de ``createur`` le met
+    à jour. Les lignes valides sont importées même si d'autres sont en erreur.
+    """
+    rapport = RapportImport()
+    ids, modifies = [], set()
+    with transaction.atomic():
+        lot = []
+        # Ligne 1 : en-têtes
+        for numero, ligne in enumerate(lignes, start=2):
+            if ligne is None:
+                continue
+            lot.append((numero, _identifiant(ligne), _donnees_formulaire(ligne)))
+            if len(lot) >= batch:
+                _importer_lot(lot, createur, rapport, ids, modifies)
+                lot = []
+        if lot:
+            _importer_lot(lot, createur, rapport, ids, modifies)
+        rapport.crees, rapport.modifies = len(ids), len(modifies)
+
+        if menu is not None and (ids or modifies):
+            Menu.plats.through.objects.bulk_create(
+                [Menu.plats.through(menu_id=menu.pk, plat_id=pk) for pk in ids + sorted(modifies)],
+                ignore_conflicts=True,
+            )
+            # Pas de m2m_changed : compteur, cache de la structure et index mis à jour directement
+            Menu.objects.filter(pk=menu.pk).recalculer_nb_plats()
+            invalider_structures([menu.structure_id])
+            index.indexer_plats(ids + sorted(modifies))
+
+        # Pas de post_save : republication des menus publiés contenant un plat modifié,
+        # et du menu d'import s'il est actif, sans quoi les plats importés n'y seraient pas visibles
+        a_republier = {m.pk: m for m in menus_contenant(sorted(modifies))} if modifies else {}
+        if menu is not None and menu.status == 'actif' and (ids or modifies):
+            a_republier[menu.pk] = menu
+        republier(a_republier.values(), auteur=createur)
+    return rapport
+
+
+def _importer_lot(lot, createur, rapport, ids, modifies):
+    """Valide un lot de lignes, insère les nouveaux plats et met à jour ceux désignés par leur id."""
+    existants = Plat.objects.filter(createur=createur, pk__in={pk for _, pk, _ in lot if pk}).in_bulk()
+    nouveaux, a_modifier = [], {}
+    for numero, pk, donnees in lot:
+        # Id inconnu ou plat d'un autre utilisateur : nouveau plat
+        form = PlatForm(data=donnees, instance=existants.get(pk))
+        if not form.is_valid():
+            rapport.erreurs.append((numero, {champ: list(messages) for champ, messages in form.errors.items()}))
+            continue
+        plat = form.save(commit=False)
+        if plat.pk:
+            a_modifier[plat.pk] = plat
+        else:
+            plat.createur = createur
+            nouveaux.append(plat)
+    if nouveaux:
+        ids += _inserer(nouveaux, createur)
+    if a_modifier:
+        Plat.objects.bulk_update(a_modifier.values(), COLONNES)
+        index.indexer(list(a_modifier.values()))
+        modifies.update(a_modifier)
+
+
+def _inserer(plats, createur):
+    """Insère un lot, l'indexe pour la recherche et retourne les clés créées."""
+    if connection.features.can_return_rows_from_bulk_insert:
+        Plat.objects.bulk_create(plats)
+    else:
+        # MySQL ne renvoie pas les clés : relecture des plats créés après le dernier connu
+        dernier = Plat.objects.filter(createur=createur).aggregate(m=Max('pk'))['m'] or 0
+        Plat.objects.bulk_create(plats)
+        plats = list(Plat.objects.filter(createur=createur, pk__gt=dernier).order_by('pk'))
+    index.indexer(plats)
+    return [plat.pk for plat in plats]
+
+
+class _Tampon:
+    """Pseudo-fichier : csv.writer écrit une ligne, elle est aussitôt renvoyée."""
+
+    def write(self, valeur):
+        return valeur
+
+
+def exporter_csv(createur, batch=500):
+    """Générateur des lignes CSV des plats de ``createur`` et des menus qui les contiennent."""
+    ecrivain = csv.writer(_Tampon(), delimiter=';')
+    # BOM : accents corrects à l'ouverture dans Excel
+    yield '\ufeff' + ecrivain.writerow(COLONNES_EXPORT)
+
+    dernier = 0
+    while True:
+        plats = list(Plat.objects.filter(createur=createur, pk__gt=dernier).order_by('pk')
+                     .values_list('pk', *COLONNES)[:batch])
+        if not plats:
+            return
+        menus = {}
+        for plat_id, nom in (Menu.plats.through.objects.filter(plat_id__in=[p[0] for p in plats])
+                             .order_by('menu__nom').values_list('plat_id', 'menu__nom')):
+            menus.setdefault(plat_id, []).append(nom)
+        for pk, nom, description, prix, categorie, disponibilite in plats:
+            yield ecrivain.writerow([pk, nom, description, str(prix).replace('.', ','), categorie,
+                                     'oui' if disponibilite else 'non', ' | '.join(menus.get(pk, []))])
+        dernier = plats[-1][0]
@@ -0,0 +1,178 @@
+"""
+Menus imprimables (PDF A4, affiche PNG) et QR code de la page d'une structure.
+
+Les fichiers sont rendus avec Pillow une seule fois par version publiée
+(voir publication.py), hors requête, par la tâche
+``menu.generer_impressions`` ; leurs chemins sont conservés dans le champ
+JSON ``MenuVersion.impressions``. Les téléchargements sont de simples liens
+vers ``MEDIA_URL`` : aucun rendu à la demande.
+
+Le nom de chaque fichier contient l'empreinte de ce qui a servi à le rendre
+(contenu de la version, nom de la structure, URL publique, révision de la
+mise en page) : les fichiers sont immuables, une nouvelle tentative ne
+refait que ceux qui manquent et deux versions au contenu identique
+partagent les mêmes fichiers.
+
+Le QR code est rendu par le paquet ``qrcode`` (requirements.txt).
+"""
+import hashlib
+import json
+import textwrap
+from decimal import Decimal, InvalidOperation
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+from .models import Plat
+
+# À incrémenter quand la mise en page change : les fichiers sont alors rendus à nouveau
+REVISION = 1
+DOSSIER = 'impressions'
+# A4 à 150 points par pouce
+LARGEUR, HAUTEUR_PAGE = 1240, 1754
+MARGE = 90
+TAILLE_QR = 240
+RESOLUTION = 150.0
+NOIR, GRIS, FILET = (33, 37, 41), (108, 117, 125), (206, 212, 218)
+
+
+def url_publique(structure_id):
+    """URL absolue de la page publique de la structure, encodée dans le QR code."""
+    return settings.EMENU_URL_PUBLIQUE.rstrip('/') + reverse('accounts:detail', args=[structure_id])
+
+
+def _empreinte(*parties):
+    return hashlib.sha256('\x00'.join(str(partie) for partie in parties).encode()).hexdigest()[:12]
+
+
+def _police(taille, grasse=False):
+    # DejaVu si elle est installée (accents, symboles), sinon la police intégrée à Pillow
+    try:
+        return ImageFont.truetype('DejaVuSans-Bold.ttf' if grasse else 'DejaVuSans.ttf', taille)
+    except OSError:
+        return ImageFont.load_default(taille)
+
+
+def _prix(valeur):
+    try:
+        montant = Decimal(str(valeur))
+    except (InvalidOperation, ValueError):
+        return ''
+    entier = f"{montant.quantize(Decimal('1')):,}".replace(',', ' ')
+    return f"{entier} Fcfa"
+
+
+def image_qr(url, taille=TAILLE_QR):
+    """QR code de ``url`` (image Pillow carrée)."""
+    code = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=2)
+    code.add_data(url)
+    code.make(fit=True)
+    image = code.make_image(fill_color='black', back_color='white').get_image().convert('RGB')
+    # Agrandissement sans lissage : les modules restent nets
+    return image.resize((taille, taille), Image.NEAREST)
+
+
+def _lignes(menu, structure_nom):
+    """
+    Mise en page indépendante de la pagination : liste de (police, texte,
+    couleur, prix, espace avant, lié à la ligne suivante).
+    """
+    titre, sous_titre = _police(56, grasse=True), _police(40)
+    rubrique, plat, detail = _police(34, grasse=True), _police(30), _police(24)
+    lignes = [(titre, structure_nom, NOIR, '', 0, True), (sous_titre, menu['nom'], GRIS, '', 10, False)]
+    libelles = dict(Plat.CATEGORIES)
+    categorie = None
+    for p in menu['plats']:
+        if p['categorie'] != categorie:
+            categorie = p['categorie']
+            lignes.append((rubrique, libelles.get(categorie, categorie) or 'Autres plats', NOIR, '', 40, True))
+        nom = p['nom'] if p['disponibilite'] else f"{p['nom']} (indisponible)"
+        lignes.append((plat, nom, NOIR, _prix(p['prix']), 18, False))
+        for morceau in textwrap.wrap(p['description'] or '', 80)[:3]:
+            lignes.append((detail, morceau, GRIS, '', 4, False))
+    return lignes
+
+
+def _pages(lignes, qr, hauteur_page=None):
+    """
+    Dessine les lignes sur des pages de ``hauteur_page`` pixels ; sans
+    hauteur, sur une seule image à la hauteur du contenu (affiche PNG).
+    """
+    bas_qr = MARGE + TAILLE_QR - 20
+    hauteurs = [ligne[0].getbbox('Hg')[3] + ligne[4] for ligne in lignes]
+    hauteur = hauteur_page or max(HAUTEUR_PAGE // 2, MARGE * 2 + sum(hauteurs) + TAILLE_QR)
+    pages, dessin = [], None
+    y = hauteur
+    for i, ((police, texte, couleur, prix, espace, lie), h) in enumerate(zip(lignes, hauteurs)):
+        # Un titre de rubrique ne reste pas seul en bas de page
+        besoin = h + (hauteurs[i + 1] if lie and i + 1 < len(hauteurs) else 0)
+        if y + besoin > hauteur - MARGE:
+            page = Image.new('RGB', (LARGEUR, hauteur), 'white')
+            dessin = ImageDraw.Draw(page)
+            if not pages:
+                page.paste(qr, (LARGEUR - MARGE - TAILLE_QR + 20, MARGE - 20))
+            pages.append(page)
+            y = MARGE
+        y += espace
+        largeur_prix = dessin.textlength(prix, font=police) if prix else 0
+        # Le texte de gauche ne déborde ni sur le prix ni sur le QR code de la première page
+        limite = LARGEUR - MARGE - (largeur_prix + 30 if prix else 0)
+        if len(pages) == 1 and y < bas_qr:
+            limite = min(limite, LARGEUR - MARGE - TAILLE_QR)
+        while texte and dessin.textlength(texte, font=police) > limite - MARGE:
+            texte = texte[:-2] + '…'
+        dessin.text((MARGE, y), texte, font=police, fill=couleur)
+        if prix:
+            fin_texte = MARGE + dessin.textlength(texte, font=police) + 15
+            debut_prix = LARGEUR - MARGE - largeur_prix
+            milieu = y + h - espace - 10
+            if debut_prix - 15 > fin_texte:
+                dessin.line((fin_texte, milieu, debut_prix - 15, milieu), fill=FILET, width=2)
+            dessin.text((debut_prix, y), prix, font=police, fill=NOIR)
+        y += h - espace
+    return pages
+
+
+def _enregistrer(chemin, rendre):
+    # Fichier immuable : déjà présent, il n'est pas rendu à nouveau
+    if not default_storage.exists(chemin):
+        tampon = BytesIO()
+        rendre(tampon)
+        chemin = default_storage.save(chemin, ContentFile(tampon.getvalue()))
+    return chemin
+
+
+def generer_impressions(version, structure_id, structure_nom):
+    """
+    Rend le QR code, le menu PDF et l'affiche PNG de ``version`` et retourne
+    leurs chemins : ``{'qr': ..., 'pdf': ..., 'png': ...}``.
+    """
+    url = url_publique(structure_id)
+    menu = json.loads(version.contenu)
+    dossier = f"{DOSSIER}/{structure_id}"
+    empreinte = _empreinte(REVISION, version.contenu, structure_nom, url)
+    qr = image_qr(url)
+
+    chemins = {'qr': _enregistrer(f"{dossier}/qr.{_empreinte(REVISION, url)}.png",
+                                  lambda tampon: qr.save(tampon, 'PNG', optimize=True))}
+    lignes = _lignes(menu, structure_nom)
+
+    def pdf(tampon):
+        premiere, *suivantes = _pages(lignes, qr, HAUTEUR_PAGE)
+        premiere.save(tampon, 'PDF', resolution=RESOLUTION, save_all=True, append_images=suivantes,
+                      title=f"{structure_nom} - {menu['nom']}")
+
+    chemins['pdf'] = _enregistrer(f"{dossier}/menu-{menu['id']}.{empreinte}.pdf", pdf)
+    chemins['png'] = _enregistrer(f"{dossier}/menu-{menu['id']}.{empreinte}.png",
+                                  lambda tampon: _pages(lignes, qr)[0].save(tampon, 'PNG', optimize=True))
+    return chemins
+
+
+def urls_impressions(impressions):
+    """URL des fichiers d'impression d'une version (vide tant qu'ils ne sont pas générés)."""
+    return {nature: default_storage.url(chemin) for nature, chemin in (impressions or {}).items()}
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from menu.models import Menu, MenuVersion
+from taches.file import planifier
+
+
+class Command(BaseCommand):
+    help = (
+        "Confie à la file de tâches la génération du QR code et des menus imprimables des versions "
+        "publiées qui n'en ont pas encore ou n'ont pas de QR code (ou de toutes avec --tous, après un changement de mise en page)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tous', action='store_true', help="Régénère aussi les impressions existantes")
+
+    def handle(self, *args, **options):
+        versions = MenuVersion.objects.filter(
+            pk__in=Menu.objects.filter(version_publiee__isnull=False).values('version_publiee'),
+        )
+        if options['tous']:
+            versions.update(impressions={})
+        else:
+            # Sans impressions, ou rendues sans QR code
+            versions = versions.exclude(impressions__has_key='qr')
+
+        planifiees = 0
+        for pk in versions.values_list('pk', flat=True).iterator():
+            planifier('menu.generer_impressions', version=pk)
+            planifiees += 1
+        self.stdout.write(self.style.SUCCESS(f"{planifiees} version(s) confiée(s) à la file de tâches."))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import User
+from menu.import_export import FichierTropVolumineux, FormatNonSupporte, importer_plats, lire_lignes
+from menu.models import Menu
+
+
+class Command(BaseCommand):
+    help = "Importe des plats depuis un fichier CSV ou XLSX pour un utilisateur, en option dans un de ses menus."
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Chemin du fichier CSV ou XLSX")
+        parser.add_argument('--email', required=True, help="Email du propriétaire des plats")
+        parser.add_argument('--menu', type=int, help="Id d'un menu du propriétaire auquel ajouter les plats")
+        parser.add_argument('--batch', type=int, default=500, help="Nombre de plats insérés par lot")
+        parser.add_argument('--sans-limite', action='store_true',
+                            help="Ignore IMPORT_PLATS_TAILLE_MAX et IMPORT_PLATS_LIGNES_MAX")
+
+    def handle(self, *args, **options):
+        try:
+            createur = User.objects.get(email=options['email'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur inconnu : {options['email']}")
+
+        menu = None
+        if options['menu']:
+            menu = Menu.objects.filter(pk=options['menu'], createur=createur).first()
+            if menu is None:
+                raise CommandError(f"Le menu {options['menu']} n'appartient pas à {createur.email}.")
+
+        with open(options['fichier'], 'rb') as fichier:
+            try:
+                lignes = lire_lignes(fichier, options['fichier'], limiter=not options['sans_limite'])
+                rapport = importer_plats(lignes, createur, menu=menu, batch=options['batch'])
+            except (FormatNonSupporte, FichierTropVolumineux) as e:
+                raise CommandError(str(e))
+
+        for numero, erreurs in rapport.erreurs:
+            detail = ' ; '.join(f"{champ} : {' '.join(messages)}" for champ, messages in erreurs.items())
+            self.stderr.write(f"Ligne {numero} : {detail}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{rapport.crees} plat(s) importé(s), {rapport.modifies} mis à jour, "
+            f"{rapport.lignes_en_erreur} ligne(s) en erreur."
+        ))
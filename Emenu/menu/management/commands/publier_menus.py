@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from menu.models import Menu
+from menu.publication import publier
+
+
+class Command(BaseCommand):
+    help = (
+        "Publie les menus actifs qui n'ont pas encore de version publiée (menus antérieurs aux versions "
+        "ou activés en masse) : les pages publiques et l'API n'affichent que les menus publiés."
+    )
+
+    def handle(self, *args, **options):
+        publies = 0
+        for menu in Menu.objects.filter(status='actif', version_publiee__isnull=True).iterator():
+            publier(menu)
+            publies += 1
+        self.stdout.write(self.style.SUCCESS(f"{publies} menu(s) publié(s)."))
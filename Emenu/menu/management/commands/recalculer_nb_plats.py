@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from menu.models import Menu
+
+
+class Command(BaseCommand):
+    help = "Recalcule le compteur nb_plats de tous les menus, par lots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help="Nombre de menus mis à jour par requête")
+
+    def handle(self, *args, **options):
+        batch = options['batch']
+        total = 0
+        dernier_id = 0
+        while True:
+            ids = list(Menu.objects.filter(pk__gt=dernier_id).order_by('pk').values_list('pk', flat=True)[:batch])
+            if not ids:
+                break
+            total += Menu.objects.filter(pk__in=ids).recalculer_nb_plats()
+            dernier_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"{total} menu(s) recalculé(s)."))
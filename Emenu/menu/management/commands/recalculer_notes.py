@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+
+from menu.models import Avis, Menu, Plat
+
+CHAMPS_COMPTEURS = ['nb_avis', 'somme_notes'] + [f'nb_notes_{note}' for note in range(1, 6)]
+
+
+class Command(BaseCommand):
+    help = "Recalcule par lots les agrégats de notes des plats et des menus depuis la table Avis."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=500, help="Nombre d'objets recalculés par lot")
+
+    def handle(self, *args, **options):
+        for model, champ in ((Plat, 'plat'), (Menu, 'menu')):
+            total = self.recalculer(model, champ, options['batch'])
+            self.stdout.write(self.style.SUCCESS(f"{total} {model._meta.verbose_name_plural} recalculé(e)s."))
+
+    def recalculer(self, model, champ, batch):
+        total = 0
+        dernier_id = 0
+        while True:
+            objets = list(model.objects.filter(pk__gt=dernier_id).order_by('pk').only('pk')[:batch])
+            if not objets:
+                return total
+
+            # Un seul GROUP BY par lot pour tous les agrégats
+            stats = {
+                ligne[f'{champ}_id']: ligne
+                for ligne in Avis.objects.filter(**{f'{champ}_id__in': [o.pk for o in objets]})
+                .values(f'{champ}_id')
+                .annotate(
+                    nb_avis=Count('id'),
+                    somme_notes=Sum('note'),
+                    **{f'nb_notes_{note}': Count('id', filter=Q(note=note)) for note in range(1, 6)},
+                )
+            }
+            for objet in objets:
+                ligne = stats.get(objet.pk, {})
+                for nom in CHAMPS_COMPTEURS:
+                    setattr(objet, nom, ligne.get(nom) or 0)
+                objet.note_moyenne = objet.somme_notes / objet.nb_avis if objet.nb_avis else 0
+
+            model.objects.bulk_update(objets, CHAMPS_COMPTEURS + ['note_moyenne'])
+            total += len(objets)
+            dernier_id = objets[-1].pk
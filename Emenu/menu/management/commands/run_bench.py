@@ -0,0 +1,113 @@
+import json
+import platform
+import statistics
+import time
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import Structure, User, UserLoginHistory
+from Emenu.instrumentation import centiles
+from menu.models import Avis, Menu, Plat
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure les pages principales (accueil, annuaire, détail d'une structure, menus, plats) via le "
+        "client de test et produit un rapport JSON : latences p50/p95 et nombre de requêtes SQL. "
+        "À lancer sur un jeu généré par seed_bench, par exemple avec Emenu.settings_bench (SQLite)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help="Requêtes mesurées par page")
+        parser.add_argument('--echauffement', type=int, default=3, help="Requêtes non mesurées par page")
+        parser.add_argument('--sans-cache', action='store_true',
+                            help="Vide le cache avant chaque requête (chemin froid)")
+        parser.add_argument('--sortie', help="Fichier JSON de sortie (sortie standard par défaut)")
+
+    def handle(self, *args, **options):
+        structure = (Structure.objects.annotate(n=Count('menus')).order_by('-n', 'pk')
+                     .select_related('user').first())
+        if structure is None:
+            raise CommandError("Aucune donnée : lancez d'abord « manage.py seed_bench ».")
+
+        anonyme = Client()
+        proprietaire = Client()
+        proprietaire.force_login(structure.user)
+
+        if structure.latitude is None:
+            raise CommandError("Structures sans position : relancez seed_bench ou « manage.py geocoder_structures ».")
+
+        scenarios = [
+            ('home_view', anonyme, reverse('accounts:home')),
+            ('list_structures', anonyme, reverse('accounts:structure')),
+            ('list_structures_filtre', anonyme,
+             f"{reverse('accounts:structure')}?ville={structure.ville}&type={structure.type}"),
+            ('list_structures_proches', anonyme,
+             f"{reverse('accounts:structure')}?lat={structure.latitude}&lon={structure.longitude}"),
+            ('api_structures_proches', anonyme,
+             f"{reverse('api-structures-proches')}?lat={structure.latitude}&lon={structure.longitude}&n=20"),
+            ('detail', proprietaire, reverse('accounts:detail', args=[structure.pk])),
+            ('menu_list', proprietaire, reverse('menus-list')),
+            ('plat_list', proprietaire, reverse('plat-list')),
+        ]
+
+        resultats = {}
+        for nom, client, url in scenarios:
+            resultats[nom] = self.mesurer(client, url, options)
+            self.stderr.write(f"{nom:24} p50 {resultats[nom]['latence_ms']['p50']:8.2f} ms  "
+                              f"p95 {resultats[nom]['latence_ms']['p95']:8.2f} ms  "
+                              f"{resultats[nom]['requetes']['max']} requête(s)")
+
+        rapport = {
+            'date': timezone.now().isoformat(),
+            'environnement': {
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'base': connection.vendor,
+                'cache_vide': options['sans_cache'],
+                'iterations': options['iterations'],
+            },
+            'volumes': {
+                model._meta.model_name: model.objects.count()
+                for model in (User, Structure, Plat, Menu, Avis, UserLoginHistory)
+            },
+            'resultats': resultats,
+        }
+        contenu = json.dumps(rapport, indent=2, ensure_ascii=False)
+        if options['sortie']:
+            with open(options['sortie'], 'w', encoding='utf-8') as fichier:
+                fichier.write(contenu + '\n')
+        else:
+            self.stdout.write(contenu)
+
+    def mesurer(self, client, url, options):
+        for _ in range(options['echauffement']):
+            client.get(url)
+
+        durees, requetes, taille = [], [], 0
+        for _ in range(options['iterations']):
+            if options['sans_cache']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as capture:
+                debut = time.perf_counter()
+                reponse = client.get(url)
+                durees.append((time.perf_counter() - debut) * 1000)
+            if reponse.status_code != 200:
+                raise CommandError(f"{url} : statut {reponse.status_code}")
+            requetes.append(len(capture))
+            taille = len(reponse.content)
+
+        return {
+            'url': url,
+            'latence_ms': {**centiles(durees), 'moyenne': round(statistics.mean(durees), 2)},
+            'requetes': {'min': min(requetes), 'max': max(requetes)},
+            'octets': taille,
+        }
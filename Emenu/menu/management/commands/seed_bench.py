@@ -0,0 +1,159 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.facets import invalider_facettes
+from accounts.geo import cellule
+from accounts.geocodage import geocodeur_local
+from accounts.models import Structure, User, UserLoginHistory
+from menu.models import Avis, Menu, Plat
+
+DOMAINE = 'bench.emenu.local'
+MOT_DE_PASSE = 'bench'
+
+VILLES = ['Lomé', 'Kara', 'Sokodé', 'Kpalimé', 'Atakpamé', 'Dapaong', 'Tsévié', 'Aného', 'Bassar', 'Mango']
+NOMS_PLATS = {
+    'entree': ['Salade de crudités', 'Avocat vinaigrette', 'Beignets de haricots', 'Soupe de légumes', 'Akpan'],
+    'plat': ['Riz sauce arachide', 'Fufu sauce graine', 'Poulet braisé', 'Poisson grillé', 'Ablo et crevettes',
+             'Gboma dessi', 'Koliko et poulet', 'Riz au gras', 'Pâte de maïs sauce gombo', 'Brochettes de bœuf'],
+    'dessert': ['Salade de fruits', 'Beignets de banane', 'Yaourt maison', 'Ananas rôti', 'Gâteau coco'],
+    'boisson': ['Jus de bissap', 'Jus de gingembre', 'Eau minérale', 'Tchoukoutou', 'Café Touba'],
+}
+ADJECTIFS = ['maison', 'du chef', 'traditionnel', 'du jour', 'épicé', 'à l\'ancienne', 'de la mer', 'royal']
+MOTS = ('Une recette savoureuse préparée avec des produits frais du marché, servie chaude avec '
+        'un accompagnement au choix et une sauce pimentée maison.').split()
+
+
+def phrase(alea, minimum=6, maximum=20):
+    return ' '.join(alea.choice(MOTS) for _ in range(alea.randint(minimum, maximum))).capitalize() + '.'
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère un jeu de données synthétique reproductible (utilisateurs, structures, plats, menus, "
+        "avis, historique de connexion) par bulk_create, pour les mesures de performance. "
+        f"Les comptes créés ont une adresse @{DOMAINE} et le mot de passe « {MOT_DE_PASSE} »."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--utilisateurs', type=int, default=200)
+        parser.add_argument('--structures', type=int, default=500)
+        parser.add_argument('--plats', type=int, default=5000)
+        parser.add_argument('--menus', type=int, default=1000)
+        parser.add_argument('--plats-par-menu', type=int, default=8)
+        parser.add_argument('--avis', type=int, default=10000)
+        parser.add_argument('--connexions', type=int, default=20000, help="Lignes d'historique de connexion")
+        parser.add_argument('--batch', type=int, default=1000, help="Taille des lots de bulk_create")
+        parser.add_argument('--graine', type=int, default=42, help="Graine du générateur aléatoire")
+        parser.add_argument('--vider', action='store_true', help=f"Supprime d'abord les données @{DOMAINE}")
+        parser.add_argument('--sans-index', action='store_true', help="Ne reconstruit pas l'index de recherche")
+
+    def handle(self, *args, **options):
+        self.alea = random.Random(options['graine'])
+        self.batch = options['batch']
+        maintenant = timezone.now()
+
+        if options['vider']:
+            supprimes, _ = User.objects.filter(email__endswith='@' + DOMAINE).delete()
+            self.stdout.write(f"{supprimes} objet(s) supprimé(s).")
+
+        with transaction.atomic():
+            # Un seul hachage : le hachage de mot de passe domine sinon la génération
+            mot_de_passe = make_password(MOT_DE_PASSE)
+            debut = User.objects.filter(email__endswith='@' + DOMAINE).count()
+            users = self.creer(User, [
+                User(email=f"bench{debut + i}@{DOMAINE}", password=mot_de_passe,
+                     first_name=f"Prénom{debut + i}", last_name=f"Nom{debut + i}",
+                     ville=self.alea.choice(VILLES), role='structure' if i % 2 == 0 else 'client')
+                for i in range(options['utilisateurs'])
+            ])
+            proprietaires = users[::2] or users
+
+            structures = self.creer(Structure, [
+                Structure(user=self.alea.choice(proprietaires),
+                          nom=f"{self.alea.choice(['Chez', 'Le', 'La Table de', 'Maquis', 'Saveurs de'])} {i}",
+                          telephone=f"+228 90 {i % 100:02d} {i // 100 % 100:02d} {self.alea.randint(10, 99)}",
+                          adresse=f"{self.alea.randint(1, 300)} rue {self.alea.randint(1, 80)}",
+                          ville=ville, heure_ouverture='08h - 22h',
+                          description=phrase(self.alea), type=self.alea.choice(Structure.TYPE_CHOICES)[0],
+                          featured=self.alea.random() < 0.1, **self.position(ville))
+                for i, ville in enumerate(self.alea.choice(VILLES) for _ in range(options['structures']))
+            ])
+
+            plats = self.creer(Plat, [self.plat(self.alea.choice(proprietaires)) for _ in range(options['plats'])])
+            plats_par_createur = {}
+            for plat in plats:
+                plats_par_createur.setdefault(plat.createur_id, []).append(plat)
+
+            menus = self.creer(Menu, [
+                Menu(nom=f"Menu {self.alea.choice(['du midi', 'du soir', 'découverte', 'enfant', 'du week-end'])} {i}",
+                     status=self.alea.choices(['actif', 'inactif', 'brouillon'], [7, 2, 1])[0],
+                     structure=structure, createur_id=structure.user_id,
+                     date_creation=maintenant - timedelta(days=self.alea.randint(0, 365)))
+                for i, structure in enumerate(self.alea.choice(structures) for _ in range(options['menus']))
+            ])
+
+            liens = []
+            for menu in menus:
+                # Plats du même propriétaire que la structure, comme dans l'interface
+                candidats = plats_par_createur.get(menu.createur_id) or plats
+                for plat in self.alea.sample(candidats, min(len(candidats), options['plats_par_menu'])):
+                    liens.append(Menu.plats.through(menu_id=menu.pk, plat_id=plat.pk))
+            self.creer(Menu.plats.through, liens, ignore_conflicts=True)
+
+            self.creer(Avis, [
+                Avis(note=self.alea.choices([1, 2, 3, 4, 5], [1, 1, 3, 5, 4])[0], commentaire=phrase(self.alea),
+                     auteur=self.alea.choice(users), date_publication=maintenant - timedelta(minutes=i),
+                     **({'plat': self.alea.choice(plats)} if self.alea.random() < 0.7 or not menus
+                        else {'menu': self.alea.choice(menus)}))
+                for i in range(options['avis'] if plats else 0)
+            ])
+
+            self.creer(UserLoginHistory, [
+                UserLoginHistory(user=self.alea.choice(users), ip_address=f"10.0.{i % 250}.{i % 200 + 1}",
+                                 user_agent='Mozilla/5.0 (bench)', login_success=self.alea.random() < 0.9,
+                                 login_time=maintenant - timedelta(minutes=self.alea.randint(0, 60 * 24 * 365)),
+                                 action='LOGIN')
+                for i in range(options['connexions'] if users else 0)
+            ])
+
+            # bulk_create n'émet aucun signal : compteurs et agrégats recalculés en masse
+            Menu.objects.filter(pk__in=[menu.pk for menu in menus]).recalculer_nb_plats()
+        call_command('recalculer_notes', batch=self.batch, stdout=self.stdout)
+        # Menus actifs créés en masse : publiés pour apparaître sur les pages publiques
+        call_command('publier_menus', stdout=self.stdout)
+        invalider_facettes()
+        if not options['sans_index']:
+            call_command('reindexer_recherche', batch=self.batch, stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS("Jeu de données de mesure généré."))
+
+    def plat(self, createur):
+        categorie = self.alea.choice(list(NOMS_PLATS))
+        return Plat(nom=f"{self.alea.choice(NOMS_PLATS[categorie])} {self.alea.choice(ADJECTIFS)}",
+                    description=phrase(self.alea), prix=self.alea.randint(5, 95) * 100, categorie=categorie,
+                    disponibilite=self.alea.random() < 0.9, createur=createur)
+
+    def position(self, ville):
+        # Dispersion autour du centre de la ville (écart type ≈ 3 km) ; bulk_create n'émet pas pre_save
+        centre_lat, centre_lon = geocodeur_local('', ville)
+        latitude, longitude = self.alea.gauss(centre_lat, 0.03), self.alea.gauss(centre_lon, 0.03)
+        return {'latitude': latitude, 'longitude': longitude, 'cellule': cellule(latitude, longitude)}
+
+    def creer(self, model, objets, **kwargs):
+        """bulk_create par lots ; retourne les objets avec leur clé primaire."""
+        if objets and not kwargs.get('ignore_conflicts') and not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL ne renvoie pas les clés générées : elles sont attribuées ici
+            suivant = (model.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+            for i, objet in enumerate(objets):
+                objet.pk = suivant + i
+        for i in range(0, len(objets), self.batch):
+            model.objects.bulk_create(objets[i:i + self.batch], **kwargs)
+        self.stdout.write(f"{model.__name__} : {len(objets)} créé(e)s")
+        return objets
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:52
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remplir_nb_plats(apps, schema_editor):
+    Menu = apps.get_model('menu', 'Menu')
+    nb = (Menu.plats.through.objects.filter(menu=OuterRef('pk'))
+          .order_by().values('menu').annotate(n=Count('*')).values('n'))
+    Menu.objects.update(nb_plats=Coalesce(Subquery(nb), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menu',
+            name='nb_plats',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(remplir_nb_plats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:53
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def remplir_notes(apps, schema_editor):
+    Avis = apps.get_model('menu', 'Avis')
+    for nom_model, champ in (('Plat', 'plat'), ('Menu', 'menu')):
+        model = apps.get_model('menu', nom_model)
+        stats = (Avis.objects.filter(**{f'{champ}__isnull': False}).order_by()
+                 .values(f'{champ}_id')
+                 .annotate(nb_avis=Count('id'), somme_notes=Sum('note'),
+                           **{f'nb_notes_{note}': Count('id', filter=Q(note=note)) for note in range(1, 6)}))
+        for ligne in stats.iterator():
+            pk = ligne.pop(f'{champ}_id')
+            ligne['note_moyenne'] = ligne['somme_notes'] / ligne['nb_avis']
+            model.objects.filter(pk=pk).update(**ligne)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_structure_indexes'),
+        ('menu', '0002_menu_nb_plats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menu',
+            name='nb_avis',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='nb_notes_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='nb_notes_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='nb_notes_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='nb_notes_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='nb_notes_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='note_moyenne',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='somme_notes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='nb_avis',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='nb_notes_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='nb_notes_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='nb_notes_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='nb_notes_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='nb_notes_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='note_moyenne',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='plat',
+            name='somme_notes',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='menu',
+            index=models.Index(fields=['-note_moyenne', '-nb_avis'], name='menu_note_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plat',
+            index=models.Index(fields=['-note_moyenne', '-nb_avis'], name='plat_note_idx'),
+        ),
+        migrations.RunPython(remplir_notes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0003_notes_agregees'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plat',
+            name='photo_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0004_plat_photo_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plat',
+            name='photo_statut',
+            field=models.CharField(blank=True, choices=[('', 'Aucune photo'), ('en_attente', 'En cours de traitement'), ('traitee', 'Traitée'), ('echec', 'Échec du traitement')], editable=False, max_length=20),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0005_plat_photo_statut'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.PositiveIntegerField()),
+                ('contenu', models.TextField()),
+                ('date_publication', models.DateTimeField(default=django.utils.timezone.now)),
+                ('auteur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('menu', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='versions', to='menu.menu')),
+            ],
+            options={
+                'ordering': ['-numero'],
+            },
+        ),
+        migrations.AddField(
+            model_name='menu',
+            name='version_publiee',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='menu.menuversion'),
+        ),
+        migrations.AddConstraint(
+            model_name='menuversion',
+            constraint=models.UniqueConstraint(fields=('menu', 'numero'), name='menuversion_numero_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0006_menu_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuversion',
+            name='impressions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:43
+import json
+
+from django.conf import settings
+from django.db import migrations
+
+
+def _chemin(url):
+    # URL du stockage par défaut (MEDIA_URL + chemin) ramenée au chemin
+    if url and url.startswith(settings.MEDIA_URL):
+        return url[len(settings.MEDIA_URL):]
+    return url
+
+
+def urls_en_chemins(apps, schema_editor):
+    MenuVersion = apps.get_model('menu', 'MenuVersion')
+    for version in MenuVersion.objects.only('contenu').iterator():
+        contenu = json.loads(version.contenu)
+        for plat in contenu['plats']:
+            variantes = plat.get('photo_variantes') or {}
+            if 'source' in variantes:
+                continue
+            plat['photo'] = _chemin(plat.get('photo')) or ''
+            plat['photo_variantes'] = {
+                'source': plat['photo'],
+                'formats': {ext: {largeur: _chemin(url) for largeur, url in declinaisons.items()}
+                            for ext, declinaisons in variantes.items()},
+            } if variantes else {}
+        MenuVersion.objects.filter(pk=version.pk).update(
+            contenu=json.dumps(contenu, ensure_ascii=False, separators=(',', ':')),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0007_menuversion_impressions'),
+    ]
+
+    operations = [
+        migrations.RunPython(urls_en_chemins, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,67 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 
-from accounts.models import Structure
+from accounts.models import PHOTO_STATUT_CHOICES, Structure
 
 
-class Plat(models.Model):
+class NotesQuerySetMixin:
+    def mieux_notes(self):
+        return self.filter(nb_avis__gt=0).order_by('-note_moyenne', '-nb_avis')
+
+
+class PlatQuerySet(NotesQuerySetMixin, models.QuerySet):
+    pass
+
+
+class NotesAgregees(models.Model):
+    """
+    Agrégats des avis (nombre, somme, moyenne et histogramme 1 à 5).
+
+    Mis à jour de façon atomique à chaque avis publié ou supprimé, ils
+    permettent d'afficher et de trier par note sans interroger la table Avis.
+    """
+    nb_avis = models.PositiveIntegerField(default=0, editable=False)
+    somme_notes = models.PositiveIntegerField(default=0, editable=False)
+    note_moyenne = models.FloatField(default=0, editable=False)
+    nb_notes_1 = models.PositiveIntegerField(default=0, editable=False)
+    nb_notes_2 = models.PositiveIntegerField(default=0, editable=False)
+    nb_notes_3 = models.PositiveIntegerField(default=0, editable=False)
+    nb_notes_4 = models.PositiveIntegerField(default=0, editable=False)
+    nb_notes_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=['-note_moyenne', '-nb_avis'], name='%(class)s_note_idx'),
+        ]
+
+    @property
+    def histogramme_notes(self):
+        return [(note, getattr(self, f'nb_notes_{note}')) for note in range(1, 6)]
+
+    @classmethod
+    def enregistrer_note(cls, pk, note, sens=1):
+        """Ajoute (sens=1) ou retire (sens=-1) une note aux agrégats de l'objet ``pk``."""
+        note = int(note)
+        lignes = cls.objects.filter(pk=pk)
+        with transaction.atomic():
+            lignes.update(
+                nb_avis=F('nb_avis') + sens,
+                somme_notes=F('somme_notes') + sens * note,
+                **{f'nb_notes_{note}': F(f'nb_notes_{note}') + sens},
+            )
+            # Requête séparée : MySQL évalue les affectations d'un UPDATE de gauche à droite
+            lignes.update(note_moyenne=Case(
+                When(nb_avis=0, then=Value(0.0)),
+                default=Cast('somme_notes', FloatField()) / F('nb_avis'),
+            ))
+
+
+class Plat(NotesAgregees):
     CATEGORIES = (
         ('entree', 'Entrée'),
         ('plat', 'Plat principal'),
@@ -20,13 +75,26 @@ class Plat(models.Model):
     categorie = models.CharField(max_length=20, choices=CATEGORIES)
     disponibilite = models.BooleanField(default=True)
     photo = models.ImageField(upload_to='plats/', null=True, blank=True)
+    # Déclinaisons redimensionnées de la photo (voir accounts/images.py)
+    photo_variantes = models.JSONField(default=dict, blank=True, editable=False)
+    photo_statut = models.CharField(max_length=20, choices=PHOTO_STATUT_CHOICES, blank=True, editable=False)
     createur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
 
+    objects = PlatQuerySet.as_manager()
+
     def __str__(self):
         return self.nom
 
 
-class Menu(models.Model):
+class MenuQuerySet(NotesQuerySetMixin, models.QuerySet):
+    def recalculer_nb_plats(self):
+        """Recalcule le compteur nb_plats des menus du queryset en un seul UPDATE."""
+        nb = (Menu.plats.through.objects.filter(menu=OuterRef('pk'))
+              .order_by().values('menu').annotate(n=Count('*')).values('n'))
+        return self.update(nb_plats=Coalesce(Subquery(nb), 0))
+
+
+class Menu(NotesAgregees):
     STATUS_CHOICES = (
         ('actif', 'Actif'),
         ('inactif', 'Inactif'),
@@ -39,11 +107,44 @@ class Menu(models.Model):
     plats = models.ManyToManyField('Plat', related_name='menus')
     createur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     structure = models.ForeignKey(Structure, on_delete=models.CASCADE, related_name='menus')
+    # Nombre de plats du menu, tenu à jour par les signaux m2m_changed (voir menu/signals.py)
+    nb_plats = models.PositiveIntegerField(default=0, editable=False)
+    # Instantané servi aux clients tant que le menu est actif (voir menu/publication.py)
+    version_publiee = models.ForeignKey('MenuVersion', on_delete=models.SET_NULL, null=True, blank=True,
+                                        related_name='+', editable=False)
+
+    objects = MenuQuerySet.as_manager()
 
     def __str__(self):
         return self.nom
 
 
+class MenuVersion(models.Model):
+    """Instantané immuable d'un menu publié : ses plats, prix et photos en JSON compact."""
+    menu = models.ForeignKey(Menu, on_delete=models.CASCADE, related_name='versions')
+    numero = models.PositiveIntegerField()
+    # JSON déjà sérialisé : servi tel quel, sans nouvel encodage
+    contenu = models.TextField()
+    date_publication = models.DateTimeField(default=timezone.now)
+    auteur = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    # Chemins du QR code et des menus imprimables, générés hors requête (voir menu/impression.py)
+    impressions = models.JSONField(default=dict, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['-numero']
+        constraints = [
+            models.UniqueConstraint(fields=['menu', 'numero'], name='menuversion_numero_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.menu_id} v{self.numero}"
+
+    @property
+    def urls_impressions(self):
+        from .impression import urls_impressions
+        return urls_impressions(self.impressions)
+
+
 class Avis(models.Model):
     NOTE_CHOICES = [
         (1, '1 - Très mauvais'),
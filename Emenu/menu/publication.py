@@ -0,0 +1,148 @@
+"""
+Publication des menus.
+
+Passer un menu à ``actif`` le publie : le menu, ses plats et leurs prix sont
+sérialisés en JSON compact dans une ``MenuVersion``
+numérotée, et ``Menu.version_publiee`` pointe sur elle. Les pages publiques
+et l'API lisent cet instantané en une requête au lieu de joindre
+Menu → plats → Plat. Modifier ou supprimer un plat republie les menus actifs
+qui le contiennent (voir ``republier``), y compris depuis les actions en
+masse et l'import, qui n'émettent pas de signaux. Les versions précédentes sont
+conservées et peuvent être republiées (retour arrière). Un menu actif sans
+version publiée (créé avant les versions) n'est pas affiché tant que la
+commande ``publier_menus`` ne l'a pas publié : une lecture ne publie jamais.
+
+Les versions ne citent aucun fichier : la photo d'un plat et ses
+déclinaisons sont lues sur le plat, par son id, à l'affichage. Le
+traitement d'une photo peut ainsi remplacer ou supprimer des fichiers sans
+réécrire les versions, qui restent un historique immuable.
+
+Chaque nouvelle version est rendue en menu imprimable (PDF, PNG) avec le QR
+code de la structure, hors requête, par la file de tâches (voir
+impression.py) : les liens de téléchargement apparaissent une fois les
+fichiers générés.
+
+Les notes, qui évoluent avec les avis des clients et non avec les
+modifications du propriétaire, sont lues en direct avec les photos, dans la
+même requête.
+"""
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+from accounts.images import urls_photo
+from accounts.versioning import invalider_structures
+from recherche import index
+from taches.file import planifier
+
+from .impression import urls_impressions
+from .models import Menu, MenuVersion, Plat
+
+CHAMPS_PLAT = ['id', 'nom', 'description', 'prix', 'categorie', 'disponibilite']
+
+
+def _serialiser(contenu):
+    return json.dumps(contenu, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def instantane(menu):
+    """
+    Contenu publiable du menu : ses champs et ses plats (une requête), sans
+    leurs photos.
+    """
+    plats = Plat.objects.filter(menus=menu).order_by('categorie', 'nom').values(*CHAMPS_PLAT)
+    return {
+        'id': menu.pk,
+        'nom': menu.nom,
+        'date_creation': menu.date_creation,
+        'plats': list(plats),
+    }
+
+
+def publier(menu, auteur=None):
+    """
+    Publie l'état actuel de ``menu`` et retourne sa version. Un contenu
+    identique à la dernière version ne crée pas de nouvelle version.
+    """
+    contenu = _serialiser(instantane(menu))
+    with transaction.atomic():
+        # Verrou sur le menu : deux publications simultanées ne peuvent prendre le même numéro
+        Menu.objects.select_for_update().filter(pk=menu.pk).exists()
+        derniere = MenuVersion.objects.filter(menu=menu).only('numero', 'contenu', 'impressions').first()
+        if derniere is not None and derniere.contenu == contenu:
+            version = derniere
+        else:
+            version = MenuVersion.objects.create(
+                menu=menu, numero=derniere.numero + 1 if derniere else 1, contenu=contenu, auteur=auteur,
+            )
+        Menu.objects.filter(pk=menu.pk).update(version_publiee=version)
+        if not version.impressions:
+            planifier('menu.generer_impressions', version=version.pk)
+    menu.version_publiee = version
+    invalider_structures([menu.structure_id])
+    # Le menu et ses plats deviennent visibles dans la recherche
+    index.indexer_menus([menu])
+    return version
+
+
+def restaurer(menu, version):
+    """Republie une version antérieure du menu (retour arrière) et réactive le menu."""
+    Menu.objects.filter(pk=menu.pk).update(version_publiee=version, status='actif')
+    if not version.impressions:
+        planifier('menu.generer_impressions', version=version.pk)
+    menu.version_publiee, menu.status = version, 'actif'
+    invalider_structures([menu.structure_id])
+    index.indexer_menus([menu])
+
+
+def menus_contenant(plat_ids):
+    """Menus actifs et publiés contenant l'un des plats ``plat_ids`` (ids ou sous-requête)."""
+    return list(Menu.objects.filter(plats__in=plat_ids, status='actif', version_publiee__isnull=False).distinct())
+
+
+def republier(menus, auteur=None):
+    """
+    Republie ``menus`` après une modification de leurs plats (formulaire,
+    actions en masse, import) : les clients voient le nouveau prix, la
+    nouvelle disponibilité. Un menu dont le contenu n'a pas changé garde sa
+    version.
+    """
+    for menu in menus:
+        publier(menu, auteur=auteur)
+
+
+def menus_publies(structure_id, menu_id=None):
+    """
+    Instantanés des menus actifs de la structure, du plus récent au plus
+    ancien, avec les notes et les photos du moment : deux requêtes au total.
+    """
+    # Un menu actif jamais publié (antérieur aux versions, ou activé en masse) n'est pas affiché :
+    # une lecture ne publie pas, voir la commande publier_menus
+    menus = Menu.objects.filter(structure_id=structure_id, status='actif', version_publiee__isnull=False)
+    if menu_id is not None:
+        menus = menus.filter(pk=menu_id)
+    lignes = menus.order_by('-date_creation').values_list(
+        'pk', 'version_publiee__contenu', 'version_publiee__numero', 'version_publiee__date_publication',
+        'version_publiee__impressions', 'note_moyenne', 'nb_avis',
+    )
+
+    resultats = []
+    for pk, contenu, numero, date_publication, impressions, note_moyenne, nb_avis in lignes:
+        menu = json.loads(contenu)
+        menu.update(version=numero, date_publication=date_publication, nb_plats=len(menu['plats']),
+                    impressions=urls_impressions(impressions), note_moyenne=note_moyenne, nb_avis=nb_avis)
+        resultats.append(menu)
+
+    plats = [plat for menu in resultats for plat in menu['plats']]
+    if plats:
+        actuels = {ligne['id']: ligne for ligne in Plat.objects.filter(pk__in={plat['id'] for plat in plats})
+                   .values('id', 'note_moyenne', 'nb_avis', 'photo', 'photo_variantes')}
+        for plat in plats:
+            # Plat supprimé depuis la publication : sans note ni photo
+            actuel = actuels.get(plat['id'], {})
+            plat['note_moyenne'], plat['nb_avis'] = actuel.get('note_moyenne', 0), actuel.get('nb_avis', 0)
+            plat['photo'], plat['photo_variantes'] = actuel.get('photo'), actuel.get('photo_variantes')
+            urls_photo(plat)
+    return resultats
+
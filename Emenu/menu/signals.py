@@ -0,0 +1,116 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from accounts.images import memoriser_photo, photo_modifiee, planifier_traitement_photo
+from accounts.versioning import invalider_structures
+
+from .models import Avis, Menu, Plat
+
+
+def _structures_des_menus(menu_ids):
+    return Menu.objects.filter(pk__in=menu_ids).values_list('structure_id', flat=True).distinct()
+
+
+@receiver(m2m_changed, sender=Menu.plats.through)
+def maj_nb_plats(sender, instance, action, reverse, pk_set, **kwargs):
+    """Maintient Menu.nb_plats lors des ajouts/retraits de plats (dans les deux sens)."""
+    if reverse and action == 'pre_clear':
+        # plat.menus.clear() : les menus concernés ne sont plus connus après coup
+        instance._menus_avant_clear = list(instance.menus.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        Menu.objects.filter(pk=instance.pk).recalculer_nb_plats()
+        instance.refresh_from_db(fields=['nb_plats'])
+        return
+
+    menu_ids = pk_set if action != 'post_clear' else getattr(instance, '_menus_avant_clear', ())
+    if menu_ids:
+        Menu.objects.filter(pk__in=menu_ids).recalculer_nb_plats()
+
+
+@receiver(pre_delete, sender=Plat)
+def memoriser_menus_plat(sender, instance, **kwargs):
+    # La suppression en cascade de la table de liaison n'émet pas m2m_changed
+    instance._menus_avant_suppression = list(instance.menus.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Plat)
+def maj_nb_plats_apres_suppression(sender, instance, **kwargs):
+    menu_ids = getattr(instance, '_menus_avant_suppression', ())
+    if menu_ids:
+        Menu.objects.filter(pk__in=menu_ids).recalculer_nb_plats()
+
+
+@receiver(post_save, sender=Avis)
+def ajouter_note(sender, instance, created, **kwargs):
+    # Seules les créations sont prises en compte : les avis ne sont pas modifiables
+    if not created:
+        return
+    if instance.plat_id:
+        Plat.enregistrer_note(instance.plat_id, instance.note)
+    if instance.menu_id:
+        Menu.enregistrer_note(instance.menu_id, instance.note)
+
+
+@receiver(post_delete, sender=Avis)
+def retirer_note(sender, instance, **kwargs):
+    if instance.plat_id:
+        Plat.enregistrer_note(instance.plat_id, instance.note, sens=-1)
+    if instance.menu_id:
+        Menu.enregistrer_note(instance.menu_id, instance.note, sens=-1)
+
+
+@receiver(pre_save, sender=Plat)
+def memoriser_photo_plat(sender, instance, update_fields=None, raw=False, **kwargs):
+    if not raw:
+        memoriser_photo(instance, update_fields)
+
+
+@receiver(post_save, sender=Plat)
+def traiter_photo_plat(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    """Le traitement de la photo téléversée est confié à la file de tâches."""
+    if not raw and photo_modifiee(instance, created, update_fields):
+        planifier_traitement_photo(instance, 'menu.traiter_photo_plat')
+
+
+# Invalidation des caches de rendu des structures (voir accounts/versioning.py)
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+def invalider_cache_menu(sender, instance, **kwargs):
+    invalider_structures([instance.structure_id])
+
+
+@receiver(post_save, sender=Plat)
+def invalider_cache_plat(sender, instance, created, **kwargs):
+    if not created:
+        invalider_structures(_structures_des_menus(instance.menus.values('pk')))
+
+
+@receiver(post_delete, sender=Plat)
+def invalider_cache_plat_supprime(sender, instance, **kwargs):
+    invalider_structures(_structures_des_menus(getattr(instance, '_menus_avant_suppression', ())))
+
+
+@receiver(m2m_changed, sender=Menu.plats.through)
+def invalider_cache_plats_menu(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalider_structures([instance.structure_id])
+    else:
+        menu_ids = pk_set if action != 'post_clear' else getattr(instance, '_menus_avant_clear', ())
+        invalider_structures(_structures_des_menus(menu_ids or ()))
+
+
+@receiver(post_save, sender=Avis)
+@receiver(post_delete, sender=Avis)
+def invalider_cache_avis(sender, instance, **kwargs):
+    # Les notes moyennes sont affichées sur la page publique de la structure
+    if instance.plat_id:
+        invalider_structures(_structures_des_menus(Menu.objects.filter(plats=instance.plat_id).values('pk')))
+    if instance.menu_id:
+        invalider_structures(_structures_des_menus([instance.menu_id]))
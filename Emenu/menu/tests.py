@@ -1,3 +1,404 @@
-from django.test import TestCase
+import io
+import json
+import os
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from PIL import Image
+
+from accounts.images import chemins_variantes
+from accounts.models import User
+from accounts.tests import DonneesMixin
+from recherche.models import Document
+from taches.file import executer, reserver
+
+from . import impression, publication
+from .forms import MenuForm
+from .import_export import FichierTropVolumineux, exporter_csv, importer_plats, lire_lignes
+from .models import Avis, Menu, MenuVersion, Plat
+
+
+class BudgetRequetesTests(DonneesMixin, TestCase):
+    def test_plat_list(self):
+        self.verifier_budget_froid_chaud(reverse('plat-list'))
+
+    def test_menu_list(self):
+        self.verifier_budget_froid_chaud(reverse('menus-list'))
+
+    def test_api_structures(self):
+        self.verifier_budget_froid_chaud(reverse('api-structures'))
+        self.verifier_budget_froid_chaud(reverse('api-structures') + '?ville=Lomé&type=restaurant')
+
+    def test_api_structures_proches(self):
+        response = self.verifier_budget_froid_chaud(reverse('api-structures-proches') + '?lat=6.14&lon=1.21&n=1')
+        self.assertEqual([s['nom'] for s in response.json()['resultats']], ['Chez Ama'])
+
+    def test_api_structure(self):
+        response = self.verifier_budget_froid_chaud(reverse('api-structure', args=[self.structure.pk]))
+        self.assertEqual(len(response.json()['menus']), 1)
+
+    def test_api_menu(self):
+        response = self.verifier_budget_froid_chaud(reverse('api-menu', args=[self.structure.pk, self.menu.pk]))
+        self.assertEqual(len(response.json()['plats']), 2)
+
+
+
+class RequetesConditionnellesTests(DonneesMixin, TestCase):
+    def test_structure(self):
+        url = reverse('api-structure', args=[self.structure.pk])
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'])
+        self.assertTrue(response['Last-Modified'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_menu(self):
+        url = reverse('api-menu', args=[self.structure.pk, self.menu.pk])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertIn(f'-m{self.menu.pk}-', etag)
+        self.assertNotEqual(etag, self.client.get(reverse('api-structure', args=[self.structure.pk]))['ETag'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_menu_absent_ou_inactif(self):
+        url = reverse('api-menu', args=[self.structure.pk, self.menu.pk])
+        response = self.client.get(url)
+        inactif = Menu.objects.create(nom='Soir', status='inactif', structure=self.structure, createur=self.user)
+        for menu_pk in (inactif.pk, self.menu.pk + 1000):
+            autre = reverse('api-menu', args=[self.structure.pk, menu_pk])
+            # Les validateurs du menu publié ne valent pas pour un autre menu de la structure
+            for entetes in ({'HTTP_IF_NONE_MATCH': '*'}, {'HTTP_IF_NONE_MATCH': response['ETag']},
+                            {'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']}):
+                self.assertEqual(self.client.get(autre, **entetes).status_code, 404)
+
+    def test_nouvelle_version(self):
+        url = reverse('api-menu', args=[self.structure.pk, self.menu.pk])
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('plat-actions'), {'action': 'indisponible', 'plats': [self.plats[0].pk]})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+class MenuFormTests(DonneesMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.dessert = Plat.objects.create(nom='Dêguê', description='Mil et lait caillé', prix=500,
+                                           categorie='dessert', createur=self.user)
+
+    def indexes(self):
+        return set(Document.objects.filter(type='plat').values_list('objet_id', flat=True))
+
+    def formulaire(self, plats, menu=None, status='actif'):
+        return MenuForm({'nom': 'Soir', 'status': status, 'plats': [p.pk for p in plats]},
+                        instance=menu, user=self.user)
+
+    def test_creation(self):
+        form = self.formulaire([self.plats[0], self.dessert], status='inactif')
+        self.assertTrue(form.is_valid(), form.errors)
+        menu = form.save(commit=False)
+        menu.createur, menu.structure = self.user, self.structure
+        menu.save()
+        form.save_m2m()
+        menu.refresh_from_db()
+        self.assertEqual(set(menu.plats.all()), {self.plats[0], self.dessert})
+        self.assertEqual(menu.nb_plats, 2)
+        # Menu inactif : le dessert n'est dans aucun menu publié
+        self.assertNotIn(self.dessert.pk, self.indexes())
+
+    def test_modification(self):
+        form = self.formulaire([self.plats[0], self.dessert], menu=self.menu)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.menu.refresh_from_db()
+        self.assertEqual(set(self.menu.plats.all()), {self.plats[0], self.dessert})
+        self.assertEqual(self.menu.nb_plats, 2)
+        # Le plat retiré du seul menu publié quitte l'index, le plat ajouté y entre
+        self.assertEqual(self.indexes(), {self.plats[0].pk, self.dessert.pk})
+
+    def test_modification_sans_changement(self):
+        form = self.formulaire(self.plats, menu=self.menu)
+        self.assertTrue(form.is_valid(), form.errors)
+        with CaptureQueriesContext(connection) as requetes:
+            form.save()
+        # Ni DELETE ni INSERT sur la table de liaison
+        self.assertFalse([q for q in requetes.captured_queries
+                          if 'menu_menu_plats' in q['sql'] and not q['sql'].startswith('SELECT')])
+
+    def test_tous_les_plats_retires(self):
+        form = self.formulaire([], menu=self.menu)
+        self.assertFalse(form.is_valid())
+        self.assertIn('plats', form.errors)
+        self.assertEqual(self.menu.plats.count(), 2)
+
+        # Sans la validation du formulaire, _save_m2m vide bien le menu
+        form = self.formulaire([self.plats[0]], menu=self.menu)
+        self.assertTrue(form.is_valid(), form.errors)
+        form.cleaned_data['plats'] = []
+        form.save()
+        self.menu.refresh_from_db()
+        self.assertEqual(self.menu.nb_plats, 0)
+        self.assertFalse(self.menu.plats.exists())
+        self.assertEqual(self.indexes(), set())
+
+    def test_plat_d_un_autre_utilisateur(self):
+        autre = User.objects.create_user(email='autre@emenu.tg', password='secret-123')
+        plat = Plat.objects.create(nom='Intrus', description='-', prix=100, categorie='plat', createur=autre)
+        form = self.formulaire([self.plats[0], plat], menu=self.menu)
+        self.assertFalse(form.is_valid())
+
+
+class NbPlatsTests(DonneesMixin, TestCase):
+    def nb_plats(self):
+        return Menu.objects.get(pk=self.menu.pk).nb_plats
+
+    def test_ajout_et_retrait(self):
+        dessert = Plat.objects.create(nom='Dêguê', description='-', prix=500, categorie='dessert',
+                                      createur=self.user)
+        self.menu.plats.add(dessert)
+        self.assertEqual(self.nb_plats(), 3)
+        self.menu.plats.remove(self.plats[0])
+        self.assertEqual(self.nb_plats(), 2)
+        self.menu.plats.clear()
+        self.assertEqual(self.nb_plats(), 0)
+
+    def test_sens_inverse(self):
+        soir = Menu.objects.create(nom='Soir', status='inactif', structure=self.structure, createur=self.user)
+        self.plats[0].menus.add(soir)
+        self.assertEqual(Menu.objects.get(pk=soir.pk).nb_plats, 1)
+        self.plats[0].menus.clear()
+        self.assertEqual(Menu.objects.get(pk=soir.pk).nb_plats, 0)
+        self.assertEqual(self.nb_plats(), 1)
+
+    def test_suppression_du_plat(self):
+        self.plats[1].delete()
+        self.assertEqual(self.nb_plats(), 1)
+
+    def test_recalcul(self):
+        Menu.objects.filter(pk=self.menu.pk).update(nb_plats=42)
+        Menu.objects.filter(pk=self.menu.pk).recalculer_nb_plats()
+        self.assertEqual(self.nb_plats(), 2)
+
+
+class NotesTests(DonneesMixin, TestCase):
+    def avis(self, note, plat=None, menu=None):
+        return Avis.objects.create(note=note, commentaire='-', auteur=self.user, plat=plat, menu=menu)
+
+    def test_agregats(self):
+        plat = self.plats[0]
+        for note in (5, 4, 4):
+            self.avis(note, plat=plat)
+        plat.refresh_from_db()
+        self.assertEqual((plat.nb_avis, plat.somme_notes), (3, 13))
+        self.assertAlmostEqual(plat.note_moyenne, 13 / 3)
+        self.assertEqual(plat.histogramme_notes, [(1, 0), (2, 0), (3, 0), (4, 2), (5, 1)])
+
+    def test_suppression(self):
+        avis = self.avis(2, menu=self.menu)
+        self.avis(4, menu=self.menu)
+        avis.delete()
+        self.menu.refresh_from_db()
+        self.assertEqual((self.menu.nb_avis, self.menu.note_moyenne, self.menu.nb_notes_2), (1, 4.0, 0))
+        Avis.objects.filter(menu=self.menu).get().delete()
+        self.menu.refresh_from_db()
+        self.assertEqual((self.menu.nb_avis, self.menu.somme_notes, self.menu.note_moyenne), (0, 0, 0.0))
+
+    def test_mieux_notes(self):
+        self.avis(3, plat=self.plats[0])
+        self.avis(5, plat=self.plats[1])
+        self.assertEqual(list(Plat.objects.mieux_notes()), [self.plats[1], self.plats[0]])
+        self.assertFalse(Menu.objects.mieux_notes().exists())
+
+
+class ActionsPlatsTests(DonneesMixin, TestCase):
+    def actions(self, action, plats=None, **donnees):
+        plats = self.plats if plats is None else plats
+        return self.client.post(reverse('plat-actions'), {'action': action, 'plats': [p.pk for p in plats],
+                                                          **donnees})
+
+    def prix(self):
+        return [Plat.objects.get(pk=plat.pk).prix for plat in self.plats]
+
+    def test_disponibilite(self):
+        self.actions('indisponible')
+        self.assertFalse(Plat.objects.filter(pk__in=[p.pk for p in self.plats], disponibilite=True).exists())
+        self.actions('disponible', plats=self.plats[:1])
+        self.assertEqual(list(Plat.objects.filter(disponibilite=True)), self.plats[:1])
+
+    def test_prix_montant(self):
+        self.actions('prix_montant', valeur='-500')
+        self.assertEqual(self.prix(), [Decimal('1000'), Decimal('1500')])
+        # Prix négatif ou nul : le plat est laissé tel quel
+        self.actions('prix_montant', valeur='-1200')
+        self.assertEqual(self.prix(), [Decimal('1000'), Decimal('300')])
+
+    def test_prix_pourcentage(self):
+        self.actions('prix_pourcentage', valeur='10')
+        self.assertEqual(self.prix(), [Decimal('1650'), Decimal('2200')])
+        self.actions('prix_pourcentage', valeur='-100')
+        self.assertEqual(self.prix(), [Decimal('1650'), Decimal('2200')])
+
+    def test_valeur_obligatoire(self):
+        self.actions('prix_montant')
+        self.assertEqual(self.prix(), [Decimal('1500'), Decimal('2000')])
+
+    def test_categorie(self):
+        self.actions('categorie', categorie='dessert')
+        self.assertEqual(set(Plat.objects.values_list('categorie', flat=True)), {'dessert'})
+        # Le libellé de la catégorie fait partie du texte indexé
+        self.assertIn('Dessert', Document.objects.get(type='plat', objet_id=self.plats[0].pk).contenu)
+
+    def test_supprimer(self):
+        self.actions('supprimer', plats=self.plats[:1])
+        self.assertFalse(Plat.objects.filter(pk=self.plats[0].pk).exists())
+        self.assertEqual(Menu.objects.get(pk=self.menu.pk).nb_plats, 1)
+        self.assertFalse(Document.objects.filter(type='plat', objet_id=self.plats[0].pk).exists())
+
+    def test_plats_d_un_autre_utilisateur(self):
+        autre = User.objects.create_user(email='autre@emenu.tg', password='secret-123')
+        plat = Plat.objects.create(nom='Intrus', description='-', prix=100, categorie='plat', createur=autre)
+        self.actions('supprimer', plats=[plat])
+        self.assertTrue(Plat.objects.filter(pk=plat.pk).exists())
+
+
+class ImportExportTests(DonneesMixin, TestCase):
+    def exporter(self, createur=None):
+        return ''.join(exporter_csv(createur or self.user)).encode('utf-8')
+
+    def test_reimport_de_l_export(self):
+        contenu = self.exporter().replace(b'Riz gras', b'Riz au gras')
+        rapport = importer_plats(lire_lignes(io.BytesIO(contenu), 'plats.csv'), self.user)
+        self.assertEqual((rapport.crees, rapport.modifies, rapport.erreurs), (0, 2, []))
+        self.assertEqual(Plat.objects.filter(createur=self.user).count(), 2)
+        self.assertEqual(Plat.objects.get(pk=self.plats[0].pk).nom, 'Riz au gras')
+        self.assertEqual(Document.objects.get(type='plat', objet_id=self.plats[0].pk).titre, 'Riz au gras')
+
+    def test_id_d_un_autre_utilisateur(self):
+        autre = User.objects.create_user(email='autre@emenu.tg', password='secret-123')
+        rapport = importer_plats(lire_lignes(io.BytesIO(self.exporter()), 'plats.csv'), autre)
+        self.assertEqual((rapport.crees, rapport.modifies), (2, 0))
+        self.assertEqual(Plat.objects.filter(createur=self.user).count(), 2)
+
+    def test_import_dans_un_menu_actif(self):
+        contenu = 'nom;description;prix;categorie\nAlloco;Banane plantain frite;800;entree\n'.encode()
+        with self.captureOnCommitCallbacks(execute=True):
+            rapport = importer_plats(lire_lignes(io.BytesIO(contenu), 'plats.csv'), self.user, menu=self.menu)
+        self.assertEqual(rapport.crees, 1)
+        alloco = Plat.objects.get(nom='Alloco')
+        # Indexé une fois rattaché au menu publié, et visible des clients
+        self.assertTrue(Document.objects.filter(type='plat', objet_id=alloco.pk).exists())
+        self.assertEqual(self.menu.versions.count(), 2)
+        response = self.client.get(reverse('api-structure', args=[self.structure.pk]))
+        self.assertIn('Alloco', [p['nom'] for p in response.json()['menus'][0]['plats']])
+
+    def test_limites(self):
+        with override_settings(IMPORT_PLATS_LIGNES_MAX=1), self.assertRaises(FichierTropVolumineux):
+            lire_lignes(io.BytesIO(self.exporter()), 'plats.csv')
+        with override_settings(IMPORT_PLATS_TAILLE_MAX=10), self.assertRaises(FichierTropVolumineux):
+            lire_lignes(io.BytesIO(self.exporter()), 'plats.csv')
+        lignes = lire_lignes(io.BytesIO(self.exporter()), 'plats.csv', limiter=False)
+        self.assertEqual(len(list(lignes)), 2)
+
+
+class ImpressionTests(DonneesMixin, TestCase):
+    def test_generation(self):
+        Plat.objects.filter(pk=self.plats[0].pk).update(categorie='entree')
+        version = publication.publier(self.menu)
+        chemins = impression.generer_impressions(version, self.structure.pk, self.structure.nom)
+        self.assertEqual(set(chemins), {'qr', 'pdf', 'png'})
+        for chemin in chemins.values():
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, chemin)))
+        # Fichiers immuables : une nouvelle génération réutilise les mêmes
+        self.assertEqual(impression.generer_impressions(version, self.structure.pk, self.structure.nom), chemins)
+
+    def test_rubriques(self):
+        menu = json.loads(publication.publier(self.menu).contenu)
+        menu['plats'][0]['categorie'] = 'entree'
+        textes = [ligne[1] for ligne in impression._lignes(menu, 'Chez Ama')]
+        self.assertIn('Entrée', textes)
+        self.assertIn('Plat principal', textes)
+        self.assertNotIn('entree', textes)
+
+
+class PhotosPubliees(DonneesMixin, TestCase):
+    def image(self, couleur):
+        tampon = io.BytesIO()
+        Image.new('RGB', (500, 300), couleur).save(tampon, 'PNG')
+        return SimpleUploadedFile('riz.png', tampon.getvalue(), content_type='image/png')
+
+    def traiter(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pass
+        for tache_obj in reserver('worker-test'):
+            self.assertTrue(executer(tache_obj), tache_obj.derniere_erreur)
+
+    def test_photo_lue_sur_le_plat(self):
+        versions = list(MenuVersion.objects.values_list('pk', 'contenu'))
+        plat = self.plats[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            plat.photo = self.image('red')
+            plat.save()
+        self.traiter()
+        plat.refresh_from_db()
+        self.assertEqual(plat.photo_statut, 'traitee')
+
+        # Aucune version réécrite : la photo traitée est lue sur le plat à l'affichage
+        self.assertEqual(list(MenuVersion.objects.values_list('pk', 'contenu')), versions)
+        response = self.client.get(reverse('api-structure', args=[self.structure.pk]))
+        photos = {p['id']: p for p in response.json()['menus'][0]['plats']}
+        self.assertTrue(photos[plat.pk]['photo'].endswith(plat.photo.name))
+        self.assertEqual(set(photos[plat.pk]['photo_variantes']), {'webp', 'jpeg'})
+
+        # Nouvelle photo : les fichiers de la précédente sont supprimés après traitement
+        anciens = [plat.photo.name, *chemins_variantes(plat.photo_variantes)]
+        with self.captureOnCommitCallbacks(execute=True):
+            plat.photo = self.image('blue')
+            plat.save()
+        self.traiter()
+        self.assertFalse(any(default_storage.exists(chemin) for chemin in anciens))
+
+
+class RepublicationTests(DonneesMixin, TestCase):
+    def plats_api(self):
+        response = self.client.get(reverse('api-structure', args=[self.structure.pk]))
+        return {p['id']: p for p in response.json()['menus'][0]['plats']}
+
+    def test_action_en_masse_visible_dans_l_api(self):
+        # Réponse en cache : elle n'est renouvelée qu'avec la version de la structure
+        self.plats_api()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('plat-actions'), {'action': 'indisponible', 'plats': [self.plats[0].pk]})
+            self.client.post(reverse('plat-actions'), {'action': 'prix_montant', 'valeur': '250',
+                                                       'plats': [self.plats[1].pk]})
+        plats = self.plats_api()
+        self.assertFalse(plats[self.plats[0].pk]['disponibilite'])
+        self.assertEqual(Decimal(plats[self.plats[1].pk]['prix']), Decimal('2250'))
+        self.assertEqual(self.menu.versions.count(), 3)
+
+    def test_suppression_en_masse(self):
+        self.client.post(reverse('plat-actions'), {'action': 'supprimer', 'plats': [self.plats[0].pk]})
+        self.assertEqual(list(self.plats_api()), [self.plats[1].pk])
+
+    def test_modification_d_un_plat(self):
+        self.client.post(reverse('plat-update', args=[self.plats[0].pk]), {
+            'nom': 'Riz gras', 'description': 'Maison', 'prix': '1800', 'categorie': 'plat',
+        })
+        plat = self.plats_api()[self.plats[0].pk]
+        self.assertEqual((Decimal(plat['prix']), plat['disponibilite']), (Decimal('1800'), False))
+
+    def test_suppression_d_un_plat(self):
+        self.client.post(reverse('plat-delete', args=[self.plats[1].pk]))
+        self.assertEqual(list(self.plats_api()), [self.plats[0].pk])
+
+    def test_menu_inactif_non_publie(self):
+        Menu.objects.filter(pk=self.menu.pk).update(status='inactif')
+        self.client.post(reverse('plat-actions'), {'action': 'indisponible', 'plats': [self.plats[0].pk]})
+        self.assertEqual(self.menu.versions.count(), 1)
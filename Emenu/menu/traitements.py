@@ -0,0 +1,33 @@
+from accounts.images import traiter_photo
+from accounts.versioning import invalider_structures
+from taches.file import tache
+
+from . import impression
+from .models import Menu, MenuVersion, Plat
+
+
+def photo_plat_en_echec(pk, photo, remplaces=()):
+    if photo:
+        Plat.objects.filter(pk=pk, photo=photo).update(photo_statut='echec')
+
+
+@tache('menu.traiter_photo_plat', max_tentatives=3, en_echec=photo_plat_en_echec)
+def traiter_photo_plat(pk, photo, remplaces=()):
+    """Normalise la photo d'un plat et génère ses déclinaisons."""
+    # Les versions publiées ne citent pas la photo : rien à réécrire, seules les pages sont invalidées
+    if traiter_photo(Plat, pk, photo, remplaces=remplaces):
+        invalider_structures(Menu.objects.filter(plats=pk).values_list('structure_id', flat=True).distinct())
+
+
+@tache('menu.generer_impressions', max_tentatives=3)
+def generer_impressions(version):
+    """Rend le QR code et les menus imprimables d'une version publiée."""
+    version = MenuVersion.objects.select_related('menu__structure').filter(pk=version).first()
+    # Déjà rendues ; celles d'avant le QR code obligatoire n'ont pas de clé 'qr'
+    if version is None or 'qr' in version.impressions:
+        return
+    structure = version.menu.structure
+    chemins = impression.generer_impressions(version, structure.pk, structure.nom)
+    MenuVersion.objects.filter(pk=version.pk).update(impressions=chemins)
+    # Les liens de téléchargement apparaissent sur les pages publiques
+    invalider_structures([structure.pk])
@@ -1,10 +1,13 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Plats
     path('plats/', views.plat_list, name='plat-list'),
     path('plats/nouveau/', views.plat_create, name='plat-create'),
+    path('plats/actions/', views.plat_actions, name='plat-actions'),
+    path('plats/importer/', views.plat_import, name='plat-import'),
+    path('plats/exporter/', views.plat_export, name='plat-export'),
     path('plats/<int:pk>/modifier/', views.plat_update, name='plat-update'),
     path('plats/<int:pk>/supprimer/', views.plat_delete, name='plat-delete'),
 
@@ -13,9 +16,16 @@ urlpatterns = [
     path('menus/nouveau/', views.menu_create, name='menus-create'),
     path('menus/<int:pk>/modifier/', views.menu_update, name='menus-update'),
     path('menus/<int:pk>/supprimer/', views.menu_delete, name='menus-delete'),
+    path('menus/<int:pk>/versions/', views.menu_versions, name='menus-versions'),
 
     # Avis
     path('plats/<int:plat_pk>/avis/nouveau/', views.avis_create, name='avis-create-plat'),
     path('menus/<int:menu_pk>/avis/nouveau/', views.avis_create, name='avis-create-menus'),
     path('avis/<int:pk>/supprimer/', views.avis_delete, name='avis-delete'),
+
+    # API JSON (lecture seule)
+    path('api/structures/', api.structures, name='api-structures'),
+    path('api/structures/proches/', api.structures_proches, name='api-structures-proches'),
+    path('api/structures/<int:pk>/', api.structure, name='api-structure'),
+    path('api/structures/<int:pk>/menus/<int:menu_pk>/', api.menu, name='api-menu'),
 ]
\ No newline at end of file
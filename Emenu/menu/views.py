@@ -1,17 +1,26 @@
+import csv
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Plat, Menu, Avis
-from .forms import PlatForm, MenuForm, AvisForm
+from Emenu.instrumentation import budget_requetes
+from accounts.structure_utilisateur import get_structure_principale_id
+from .models import Plat, Menu, MenuVersion, Avis
+from .publication import menus_contenant, publier, republier, restaurer
+from .actions import ACTIONS, appliquer_action
+from .forms import PlatForm, MenuForm, AvisForm, ImportPlatsForm, ActionsPlatsForm
+from .import_export import FichierTropVolumineux, FormatNonSupporte, exporter_csv, importer_plats, lire_lignes
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 # CRUD pour Plat
+@budget_requetes(3)
 @login_required
 def plat_list(request):
     plats = Plat.objects.filter(createur=request.user)
-    return render(request, 'plats/list.html', {'plats': plats})
+    return render(request, 'plats/list.html', {'plats': plats, 'actions_form': ActionsPlatsForm()})
 
 
 @login_required
@@ -36,6 +45,8 @@ def plat_update(request, pk):
         form = PlatForm(request.POST, request.FILES, instance=plat)
         if form.is_valid():
             form.save()
+            # Prix, disponibilité... visibles des clients dès maintenant
+            republier(menus_contenant([plat.pk]), auteur=request.user)
             messages.success(request, 'Plat mis à jour avec succès!')
             return redirect('plat-list')
     else:
@@ -43,20 +54,83 @@ def plat_update(request, pk):
     return render(request, 'plats/form.html', {'form': form, 'title': 'Modifier le plat'})
 
 
+@login_required
+def plat_actions(request):
+    """Action en masse sur les plats cochés dans la liste"""
+    if request.method == 'POST':
+        form = ActionsPlatsForm(request.POST, user=request.user)
+        if form.is_valid():
+            action = form.cleaned_data['action']
+            # Identifiants déjà validés par le formulaire : pas de nouvelle requête
+            selectionnes = len(set(form.data.getlist('plats')))
+            nombre = appliquer_action(form.cleaned_data['plats'], action, valeur=form.cleaned_data['valeur'],
+                                      categorie=form.cleaned_data['categorie'], auteur=request.user)
+            message = f"{dict(ACTIONS)[action]} : {nombre} plat(s) sur {selectionnes}."
+            if nombre < selectionnes and action.startswith('prix'):
+                message += " Les autres auraient eu un prix hors limites."
+            messages.success(request, message)
+        else:
+            for erreurs in form.errors.values():
+                for erreur in erreurs:
+                    messages.error(request, erreur)
+    return redirect('plat-list')
+
+
+@login_required
+def plat_import(request):
+    """Import en masse de plats depuis un fichier CSV ou XLSX"""
+    rapport = None
+    if request.method == 'POST':
+        form = ImportPlatsForm(request.POST, request.FILES, user=request.user)
+        if form.is_valid():
+            fichier = form.cleaned_data['fichier']
+            try:
+                lignes = lire_lignes(fichier, fichier.name)
+                rapport = importer_plats(lignes, request.user, menu=form.cleaned_data['menu'])
+            except FichierTropVolumineux as e:
+                messages.error(request, str(e))
+            except (FormatNonSupporte, UnicodeDecodeError, csv.Error) as e:
+                messages.error(request, f"Fichier illisible : {e}")
+            else:
+                if rapport.crees:
+                    messages.success(request, f"{rapport.crees} plat(s) importé(s).")
+                if rapport.modifies:
+                    messages.success(request, f"{rapport.modifies} plat(s) mis à jour.")
+                if rapport.erreurs:
+                    messages.warning(request, f"{rapport.lignes_en_erreur} ligne(s) ignorée(s), voir le détail.")
+    else:
+        form = ImportPlatsForm(user=request.user)
+    return render(request, 'plats/import.html', {'form': form, 'rapport': rapport})
+
+
+@login_required
+def plat_export(request):
+    """Export CSV des plats de l'utilisateur, produit au fil de l'eau"""
+    response = StreamingHttpResponse(exporter_csv(request.user), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="plats.csv"'
+    return response
+
+
 @login_required
 def plat_delete(request, pk):
     plat = get_object_or_404(Plat, pk=pk, createur=request.user)
     if request.method == 'POST':
+        menus = menus_contenant([plat.pk])
         plat.delete()
+        republier(menus, auteur=request.user)
         messages.success(request, 'Plat supprimé avec succès!')
         return redirect('plat-list')
     return render(request, 'plats/confirm_delete.html', {'object': plat})
 
 
 # CRUD pour Menu
+@budget_requetes(4)
 @login_required
 def menu_list(request):
-    menus = Menu.objects.filter(createur=request.user)
+    # Les plats sont préchargés en une requête ; le nombre de plats est lu depuis nb_plats
+    # Version publiée jointe (sans son contenu) pour les liens d'impression
+    menus = (Menu.objects.filter(createur=request.user).prefetch_related('plats')
+             .select_related('version_publiee').defer('version_publiee__contenu'))
     return render(request, 'menus/list.html', {'menus': menus})
 
 
@@ -67,10 +141,15 @@ def menu_create(request):
         if form.is_valid():
             menu = form.save(commit=False)
             menu.createur = request.user
-            # Associer automatiquement à la structure de l'utilisateur
-            menu.structure = request.user.structure.first()
+            # Associer automatiquement à la structure de l'utilisateur (lue depuis le cache)
+            menu.structure_id = get_structure_principale_id(request.user.pk)
+            if menu.structure_id is None:
+                messages.error(request, "Enregistrez d'abord une structure pour pouvoir créer un menu.")
+                return redirect('accounts:register_structure')
             menu.save()
             form.save_m2m()  # Pour sauvegarder les relations many-to-many
+            if menu.status == 'actif':
+                publier(menu, auteur=request.user)
             messages.success(request, 'Menu créé avec succès!')
             return redirect('menus-list')
     else:
@@ -83,11 +162,14 @@ def menu_create(request):
 
 @login_required
 def menu_update(request, pk):
-    menu = get_object_or_404(Menu, pk=pk)
+    menu = get_object_or_404(Menu, pk=pk, createur=request.user)
     if request.method == 'POST':
         form = MenuForm(request.POST, instance=menu, user=request.user)
         if form.is_valid():
             menu = form.save()  # Sauvegarde l'instance principale
+            if menu.status == 'actif':
+                # Les clients voient désormais ce nouvel état du menu
+                publier(menu, auteur=request.user)
             messages.success(request, 'Le menu a été mis à jour avec succès.')
             return redirect('menus-list')
     else:
@@ -95,6 +177,18 @@ def menu_update(request, pk):
 
     return render(request, 'menus/form.html', {'form': form, 'title': 'Modifier un menu'})
 
+@login_required
+def menu_versions(request, pk):
+    """Historique des publications d'un menu, avec retour à une version antérieure"""
+    menu = get_object_or_404(Menu, pk=pk, createur=request.user)
+    if request.method == 'POST':
+        version = get_object_or_404(MenuVersion, pk=request.POST.get('version'), menu=menu)
+        restaurer(menu, version)
+        messages.success(request, f'La version {version.numero} du menu est de nouveau publiée.')
+        return redirect('menus-versions', pk=menu.pk)
+    versions = menu.versions.select_related('auteur').defer('contenu')
+    return render(request, 'menus/versions.html', {'menu': menu, 'versions': versions})
+
 @login_required
 def menu_delete(request, pk):
     menu = get_object_or_404(Menu, pk=pk, createur=request.user)
@@ -0,0 +1,276 @@
+"""
+Indexation et interrogation du moteur de recherche.
+
+Deux implémentations partagent la table ``Document`` :
+
+* ``FulltextBackend`` (MySQL) s'appuie sur l'index FULLTEXT créé par la
+  migration initiale et classe les résultats avec ``MATCH ... AGAINST`` ;
+* ``IndexInverseBackend`` (SQLite, tests) maintient en Python un index
+  inversé pondéré dans la table ``Terme`` et classe par TF-IDF.
+
+Les deux renvoient un queryset de couples ``(document_id, score)`` triés par
+pertinence, directement paginable.
+
+Seul ce que voient les clients est indexé : les menus actifs et publiés, et
+les plats d'au moins un de ces menus, rattachés à la structure de ce menu.
+Un objet qui cesse d'être visible perd son document ; publier, dépublier ou
+recomposer un menu réindexe ses plats (voir signals.py et
+``menu.publication``).
+
+Le repli ``IndexInverseBackend`` écarte les termes présents dans plus de
+``RECHERCHE_FREQUENCE_MAX`` du corpus quand la requête en contient de plus
+sélectifs (faute de quoi seul le plus rare est lu), et toute recherche est
+limitée aux ``RECHERCHE_RESULTATS_MAX`` meilleurs résultats.
+
+Mesure (SQLite, ``seed_bench --plats 100000 --menus 20000``, 76 000
+documents, première page, médiane de 5) : « poulet braisé » 18 -> 16 ms,
+« attiéké poisson épicé » 31 -> 25 ms, « riz sauce » 104 -> 16 ms,
+« sauce pimentée maison » 267 -> 68 ms. Une requête dont tous les termes
+sont fréquents lit encore toutes les entrées du plus rare : l'objectif de
+50 ms n'est pas tenu dans ce cas ; le backend MySQL n'a pas été mesuré.
+"""
+import math
+import re
+import unicodedata
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from accounts.models import Structure
+from menu.models import Menu, Plat
+
+from .models import Document, Terme
+
+MOTS_VIDES = {
+    'au', 'aux', 'avec', 'ce', 'ces', 'dans', 'de', 'des', 'du', 'en', 'et', 'la', 'le', 'les',
+    'leur', 'ou', 'par', 'pour', 'sa', 'se', 'ses', 'son', 'sur', 'un', 'une',
+}
+
+# Poids appliqué aux termes selon le champ dont ils proviennent
+POIDS_TITRE = 3
+POIDS_CONTENU = 1
+
+
+def normaliser(texte):
+    """Minuscules sans accents : « Crêpe Sucrée » -> « crepe sucree »."""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    return ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+
+
+def extraire_termes(texte):
+    """Découpe un texte en termes indexables (mots vides retirés, pluriels simplifiés)."""
+    termes = []
+    for mot in re.findall(r'\w+', normaliser(texte)):
+        if len(mot) < 2 or mot in MOTS_VIDES:
+            continue
+        if len(mot) > 3 and mot[-1] in 'sx':
+            mot = mot[:-1]
+        termes.append(mot[:64])
+    return termes
+
+
+def menu_public(menu):
+    return menu.status == 'actif' and menu.version_publiee_id is not None
+
+
+def structures_des_plats(plats):
+    """
+    ``{plat_id: structure_id}`` des plats présents dans un menu actif et
+    publié (structure du premier de ces menus) ; les autres plats sont absents.
+    """
+    if not plats:
+        return {}
+    return dict(
+        Menu.plats.through.objects
+        .filter(plat_id__in=[plat.pk for plat in plats], menu__status='actif', menu__version_publiee__isnull=False)
+        .order_by('-menu_id').values_list('plat_id', 'menu__structure_id')
+    )
+
+
+def decrire(objet, structures_des_plats):
+    """
+    Retourne ``(type, structure_id, titre, contenu)`` pour un objet indexable,
+    ou ``(type, None, None, None)`` s'il n'est pas visible des clients.
+    """
+    if isinstance(objet, Structure):
+        contenu = ' '.join(filter(None, [objet.description, objet.ville, objet.get_type_display()]))
+        return 'structure', objet.pk, objet.nom, contenu
+    if isinstance(objet, Menu):
+        if not menu_public(objet):
+            return 'menu', None, None, None
+        return 'menu', objet.structure_id, objet.nom, ''
+    if isinstance(objet, Plat):
+        if objet.pk not in structures_des_plats:
+            return 'plat', None, None, None
+        contenu = ' '.join(filter(None, [objet.description, objet.get_categorie_display()]))
+        return 'plat', structures_des_plats[objet.pk], objet.nom, contenu
+    raise TypeError(f"Objet non indexable : {objet!r}")
+
+
+class FulltextBackend:
+    """Recherche MySQL via l'index FULLTEXT (titre, contenu)."""
+
+    def indexer_termes(self, documents):
+        # MySQL maintient lui-même l'index FULLTEXT
+        pass
+
+    def rechercher(self, requete):
+        score = RawSQL(
+            "MATCH (recherche_document.titre, recherche_document.contenu) AGAINST (%s IN NATURAL LANGUAGE MODE)",
+            [requete],
+        )
+        return (Document.objects.annotate(score=score).filter(score__gt=0)
+                .order_by('-score', 'pk').values_list('pk', 'score'))
+
+
+class IndexInverseBackend:
+    """Index inversé pondéré stocké dans la table Terme, classement TF-IDF."""
+
+    def indexer_termes(self, documents):
+        Terme.objects.filter(document__in=documents).delete()
+        termes = []
+        for document in documents:
+            poids = Counter()
+            for terme in extraire_termes(document.titre):
+                poids[terme] += POIDS_TITRE
+            for terme in extraire_termes(document.contenu):
+                poids[terme] += POIDS_CONTENU
+            termes.extend(Terme(terme=t, document=document, poids=p) for t, p in poids.items())
+        Terme.objects.bulk_create(termes, batch_size=1000)
+
+    def rechercher(self, requete):
+        termes = set(extraire_termes(requete))
+        if not termes:
+            return Terme.objects.none().values_list('document', 'poids')
+
+        # Fréquence documentaire de chaque terme, pour l'IDF
+        total = Document.objects.count() or 1
+        frequences = dict(Terme.objects.filter(terme__in=termes).values('terme')
+                          .annotate(n=Count('id')).values_list('terme', 'n'))
+
+        # Coupure anticipée : un terme présent dans plus de RECHERCHE_FREQUENCE_MAX du corpus
+        # pèse peu (IDF faible) mais toutes ses entrées seraient lues et sommées. Il est écarté
+        # dès que la requête contient un terme plus sélectif ; sinon seul le plus rare est lu.
+        seuil = getattr(settings, 'RECHERCHE_FREQUENCE_MAX', 0.25) * total
+        selectifs = {t: n for t, n in frequences.items() if n <= seuil}
+        if not selectifs and frequences:
+            rare = min(frequences, key=lambda t: (frequences[t], t))
+            selectifs = {rare: frequences[rare]}
+        frequences = selectifs
+
+        idf = Case(
+            *[When(terme=t, then=Value(math.log(1 + total / n))) for t, n in frequences.items()],
+            default=Value(0.0), output_field=FloatField(),
+        )
+        return (Terme.objects.filter(terme__in=frequences)
+                .values('document')
+                .annotate(score=Sum(idf * F('poids'), output_field=FloatField()))
+                .order_by('-score', 'document')
+                .values_list('document', 'score'))
+
+
+def get_backend():
+    chemin = getattr(settings, 'RECHERCHE_BACKEND', None)
+    if chemin:
+        return import_string(chemin)()
+    if connection.vendor == 'mysql':
+        return FulltextBackend()
+    return IndexInverseBackend()
+
+
+def _documents(cles):
+    """Documents correspondant à des couples (type, objet_id), une condition par type."""
+    par_type = {}
+    for type_objet, pk in cles:
+        par_type.setdefault(type_objet, []).append(pk)
+    return Document.objects.filter(
+        Q(*[Q(type=t, objet_id__in=ids) for t, ids in par_type.items()], _connector=Q.OR)
+    )
+
+
+@transaction.atomic
+def indexer(objets):
+    """
+    Crée, met à jour ou supprime les documents des objets donnés (un lot à la
+    fois) selon qu'ils sont visibles des clients ou non.
+    """
+    # Visibilité et structure des plats : une requête par lot
+    plats = structures_des_plats([o for o in objets if isinstance(o, Plat)])
+
+    descriptions, masques = {}, []
+    for objet in objets:
+        type_objet, structure_id, titre, contenu = decrire(objet, plats)
+        if titre is None:
+            masques.append((type_objet, objet.pk))
+        else:
+            descriptions[(type_objet, objet.pk)] = (structure_id, titre[:255], contenu)
+    if masques:
+        _documents(masques).delete()
+    if not descriptions:
+        return []
+
+    existants = {(d.type, d.objet_id): d for d in _documents(descriptions)}
+    nouveaux, modifies = [], []
+    for (type_objet, pk), (structure_id, titre, contenu) in descriptions.items():
+        document = existants.get((type_objet, pk))
+        if document is None:
+            nouveaux.append(Document(type=type_objet, objet_id=pk, structure_id=structure_id,
+                                     titre=titre, contenu=contenu))
+        else:
+            document.structure_id, document.titre, document.contenu = structure_id, titre, contenu
+            document.date_maj = timezone.now()
+            modifies.append(document)
+
+    Document.objects.bulk_create(nouveaux)
+    if modifies:
+        Document.objects.bulk_update(modifies, ['structure', 'titre', 'contenu', 'date_maj'])
+    if nouveaux and nouveaux[0].pk is None:
+        # Backends sans RETURNING : relecture des identifiants
+        nouveaux = list(_documents((d.type, d.objet_id) for d in nouveaux))
+
+    documents = nouveaux + modifies
+    get_backend().indexer_termes(documents)
+    return documents
+
+
+def indexer_menus(menus):
+    """Réindexe des menus et leurs plats (statut, publication ou composition modifiés)."""
+    menus = list(menus)
+    plats = Plat.objects.filter(menus__in=[menu.pk for menu in menus]).distinct()
+    return indexer(menus + list(plats))
+
+
+def indexer_plats(plat_ids):
+    """Réindexe des plats par identifiant (ajoutés à un menu ou retirés)."""
+    if plat_ids:
+        return indexer(list(Plat.objects.filter(pk__in=plat_ids)))
+    return []
+
+
+def supprimer(type_objet, objet_id):
+    Document.objects.filter(type=type_objet, objet_id=objet_id).delete()
+
+
+def rechercher(requete):
+    """
+    Queryset de couples ``(document_id, score)`` classés par pertinence,
+    limité aux ``RECHERCHE_RESULTATS_MAX`` meilleurs.
+    """
+    return get_backend().rechercher(requete)[:getattr(settings, 'RECHERCHE_RESULTATS_MAX', 1000)]
+
+
+def charger_documents(resultats):
+    """Charge les documents d'une page de résultats en conservant l'ordre et le score."""
+    scores = dict(resultats)
+    documents = Document.objects.in_bulk(list(scores))
+    page = []
+    for pk, score in scores.items():
+        if pk in documents:
+            documents[pk].score = score
+            page.append(documents[pk])
+    return page
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Structure
+from menu.models import Menu, Plat
+from recherche import index
+from recherche.models import Document
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des structures, menus et plats, par lots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help="Nombre d'objets indexés par lot")
+        parser.add_argument('--vider', action='store_true', help="Supprime l'index existant avant reconstruction")
+
+    def handle(self, *args, **options):
+        if options['vider']:
+            Document.objects.all().delete()
+
+        batch = options['batch']
+        for model in (Structure, Menu, Plat):
+            total = 0
+            dernier_id = 0
+            while True:
+                objets = list(model.objects.filter(pk__gt=dernier_id).order_by('pk')[:batch])
+                if not objets:
+                    break
+                index.indexer(objets)
+                total += len(objets)
+                dernier_id = objets[-1].pk
+            self.stdout.write(f"{model._meta.verbose_name_plural} : {total} indexé(e)s")
+
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit."))
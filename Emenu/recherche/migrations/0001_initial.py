@@ -0,0 +1,59 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def creer_index_fulltext(apps, schema_editor):
+    # Index FULLTEXT propre à MySQL ; les autres bases utilisent l'index inversé (table Terme)
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'ALTER TABLE recherche_document ADD FULLTEXT INDEX recherche_document_ft (titre, contenu)'
+        )
+
+
+def supprimer_index_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE recherche_document DROP INDEX recherche_document_ft')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0002_structure_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('structure', 'Structure'), ('menu', 'Menu'), ('plat', 'Plat')], max_length=20)),
+                ('objet_id', models.PositiveBigIntegerField()),
+                ('titre', models.CharField(max_length=255)),
+                ('contenu', models.TextField(blank=True)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+                ('structure', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='accounts.structure')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Terme',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terme', models.CharField(max_length=64)),
+                ('poids', models.PositiveIntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termes', to='recherche.document')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='document',
+            constraint=models.UniqueConstraint(fields=('type', 'objet_id'), name='recherche_document_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='terme',
+            index=models.Index(fields=['terme', 'document', 'poids'], name='recherche_terme_idx'),
+        ),
+        migrations.RunPython(creer_index_fulltext, supprimer_index_fulltext),
+    ]
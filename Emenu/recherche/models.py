@@ -0,0 +1,47 @@
+from django.db import models
+from django.urls import reverse
+
+from accounts.models import Structure
+
+
+class Document(models.Model):
+    """Texte indexé d'une structure, d'un menu ou d'un plat."""
+    TYPE_CHOICES = (
+        ('structure', 'Structure'),
+        ('menu', 'Menu'),
+        ('plat', 'Plat'),
+    )
+
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    objet_id = models.PositiveBigIntegerField()
+    # Structure vers laquelle pointe le résultat (page publique de la structure)
+    structure = models.ForeignKey(Structure, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    titre = models.CharField(max_length=255)
+    contenu = models.TextField(blank=True)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['type', 'objet_id'], name='recherche_document_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_type_display()} : {self.titre}"
+
+    def get_absolute_url(self):
+        if self.structure_id:
+            return reverse('accounts:detail', args=[self.structure_id])
+        return None
+
+
+class Terme(models.Model):
+    """Entrée de l'index inversé (terme -> document) utilisé hors MySQL."""
+    terme = models.CharField(max_length=64)
+    document = models.ForeignKey(Document, on_delete=models.CASCADE, related_name='termes')
+    poids = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            # Index couvrant : la recherche ne lit jamais la table elle-même
+            models.Index(fields=['terme', 'document', 'poids'], name='recherche_terme_idx'),
+        ]
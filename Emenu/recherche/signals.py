@@ -0,0 +1,53 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import Structure
+from menu.models import Menu, Plat
+
+from . import index
+
+TYPES_INDEXES = {Structure: 'structure', Menu: 'menu', Plat: 'plat'}
+
+
+@receiver(post_save, sender=Structure)
+@receiver(post_save, sender=Plat)
+def indexer_objet(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index.indexer([instance])
+
+
+@receiver(post_save, sender=Menu)
+def indexer_menu(sender, instance, raw=False, **kwargs):
+    # Le statut du menu décide aussi de la visibilité de ses plats
+    if not raw:
+        index.indexer_menus([instance])
+
+
+@receiver(m2m_changed, sender=Menu.plats.through)
+def indexer_plats_menu(sender, instance, action, reverse, pk_set, **kwargs):
+    """Un plat ajouté à un menu publié, ou retiré, change de visibilité."""
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            index.indexer([instance])
+        return
+    if action == 'pre_clear':
+        instance._plats_avant_clear = list(instance.plats.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        index.indexer_plats(pk_set)
+    elif action == 'post_clear':
+        index.indexer_plats(getattr(instance, '_plats_avant_clear', ()))
+
+
+@receiver(pre_delete, sender=Menu)
+def memoriser_plats_menu(sender, instance, **kwargs):
+    # La suppression en cascade de la table de liaison n'émet pas m2m_changed
+    instance._plats_avant_suppression = list(instance.plats.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Structure)
+@receiver(post_delete, sender=Menu)
+@receiver(post_delete, sender=Plat)
+def desindexer_objet(sender, instance, **kwargs):
+    index.supprimer(TYPES_INDEXES[sender], instance.pk)
+    if sender is Menu:
+        index.indexer_plats(getattr(instance, '_plats_avant_suppression', ()))
@@ -0,0 +1,85 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from accounts.tests import DonneesMixin
+from menu.models import Plat
+
+from . import index
+from .models import Document, Terme
+
+
+class BudgetRequetesTests(DonneesMixin, TestCase):
+    def test_resultats(self):
+        response = self.verifier_budget_froid_chaud(reverse('recherche:resultats') + '?q=riz')
+        self.assertContains(response, 'Riz gras')
+
+    def test_sans_requete(self):
+        self.verifier_budget_froid_chaud(reverse('recherche:resultats'))
+
+
+class CoupureTests(DonneesMixin, TestCase):
+    # « maison » décrit les deux plats : 2 documents sur 5 (deux structures, un menu, deux plats)
+
+    def titres(self, requete):
+        documents = Document.objects.in_bulk([pk for pk, _ in index.rechercher(requete)])
+        return [documents[pk].titre for pk, _ in index.rechercher(requete)]
+
+    @override_settings(RECHERCHE_FREQUENCE_MAX=1)
+    def test_sans_coupure(self):
+        self.assertEqual(self.titres('riz maison'), ['Riz gras', 'Fufu'])
+
+    @override_settings(RECHERCHE_FREQUENCE_MAX=0.3)
+    def test_terme_frequent_ecarte(self):
+        self.assertEqual(self.titres('riz maison'), ['Riz gras'])
+
+    @override_settings(RECHERCHE_FREQUENCE_MAX=0.3)
+    def test_seul_terme_frequent_conserve(self):
+        self.assertCountEqual(self.titres('maison'), ['Riz gras', 'Fufu'])
+
+    @override_settings(RECHERCHE_RESULTATS_MAX=1)
+    def test_nombre_de_resultats_borne(self):
+        self.assertEqual(len(self.titres('maison')), 1)
+        self.assertEqual(index.rechercher('maison').count(), 1)
+
+
+class RechercheTests(DonneesMixin, TestCase):
+    def titres(self, requete):
+        documents = Document.objects.in_bulk([pk for pk, _ in index.rechercher(requete)])
+        return [documents[pk].titre for pk, _ in index.rechercher(requete)]
+
+    def test_extraire_termes(self):
+        self.assertEqual(index.extraire_termes("Crêpes SUCRÉES à la mangue et au miel"),
+                         ['crepe', 'sucree', 'mangue', 'miel'])
+
+    def test_accents_et_casse(self):
+        for requete in ('Lomé', 'lome', 'LOME'):
+            self.assertEqual(self.titres(requete), ['Chez Ama'])
+
+    def test_classement(self):
+        # Terme du titre pondéré au triple du même terme dans la description
+        accompagnement = Plat.objects.create(nom='Sauce gombo', description='Servie avec du fufu',
+                                             prix=500, categorie='plat', createur=self.user)
+        self.menu.plats.add(accompagnement)
+        self.assertEqual(self.titres('fufu'), ['Fufu', 'Sauce gombo'])
+        self.assertEqual(self.titres('gombo fufu')[0], 'Sauce gombo')
+
+    def test_reindexation_incrementale(self):
+        autres = dict(Terme.objects.exclude(document__titre='Riz gras').values_list('pk', 'document_id'))
+        plat = self.plats[0]
+        plat.nom = 'Riz au poisson'
+        plat.save()
+        self.assertEqual(self.titres('poisson'), ['Riz au poisson'])
+        self.assertEqual(self.titres('gras'), [])
+        # Seul le document du plat modifié est réécrit
+        self.assertEqual(dict(Terme.objects.filter(pk__in=autres).values_list('pk', 'document_id')), autres)
+
+    def test_visibilite(self):
+        self.menu.plats.remove(self.plats[1])
+        self.assertEqual(self.titres('fufu'), [])
+        self.menu.plats.add(self.plats[1])
+        self.assertEqual(self.titres('fufu'), ['Fufu'])
+
+        self.menu.status = 'inactif'
+        self.menu.save()
+        self.assertEqual(self.titres('fufu midi'), [])
+        self.assertFalse(Document.objects.filter(type__in=['menu', 'plat']).exists())
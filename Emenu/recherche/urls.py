@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'recherche'
+
+urlpatterns = [
+    path('recherche/', views.resultats, name='resultats'),
+]
@@ -0,0 +1,30 @@
+from django.core.paginator import Paginator
+from django.shortcuts import render
+
+from Emenu.instrumentation import budget_requetes
+
+from . import index
+
+RESULTATS_PAR_PAGE = 20
+
+
+@budget_requetes(8)
+def resultats(request):
+    """Résultats de recherche classés par pertinence sur les structures, menus et plats"""
+    requete = request.GET.get('q', '').strip()
+    page_obj = None
+    documents = []
+
+    if requete:
+        paginator = Paginator(index.rechercher(requete), RESULTATS_PAR_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        # Seuls les documents de la page courante sont chargés
+        documents = index.charger_documents(page_obj.object_list)
+
+    context = {
+        'q': requete,
+        'documents': documents,
+        'page_obj': page_obj,
+        'is_paginated': page_obj is not None and page_obj.has_other_pages(),
+    }
+    return render(request, 'recherche/resultats.html', context)
@@ -0,0 +1,151 @@
+"""
+File de tâches locale, stockée en base (modèle Tache), sans courtier externe.
+
+Une tâche est une fonction déclarée avec ``@tache('nom')`` dans le module
+``traitements.py`` d'une application. ``planifier('nom', **arguments)``
+l'ajoute à la file à la validation de la transaction courante ; la commande
+``python manage.py executer_taches`` la traite hors requête.
+
+Plusieurs workers peuvent tourner en parallèle : une tâche est réservée par
+un UPDATE conditionnel sur son statut, que seul un worker peut gagner. En
+cas d'exception, la tâche est replanifiée avec un délai croissant jusqu'à
+``max_tentatives`` ; la fonction ``en_echec`` éventuelle est alors appelée.
+
+Les tâches terminées ou en échec sont conservées ``TACHES_RETENTION_JOURS``
+jours pour diagnostic, puis supprimées par ``purger`` (appelée par le worker
+et par la commande ``purger_taches``).
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tache
+
+logger = logging.getLogger(__name__)
+
+REGISTRE = {}
+
+
+class TacheInconnue(Exception):
+    pass
+
+
+def tache(nom, max_tentatives=3, en_echec=None):
+    """Déclare une tâche ; ``en_echec(**arguments)`` est appelée après la dernière tentative."""
+    def decorateur(fonction):
+        REGISTRE[nom] = {'fonction': fonction, 'max_tentatives': max_tentatives, 'en_echec': en_echec}
+        return fonction
+    return decorateur
+
+
+def planifier(nom, **arguments):
+    """Ajoute une tâche à la file, à la validation de la transaction courante."""
+    if nom not in REGISTRE:
+        raise TacheInconnue(nom)
+
+    if not getattr(settings, 'TACHES_ASYNC', True):
+        # Mode synchrone (développement sans worker) : exécution après validation
+        transaction.on_commit(lambda: executer_maintenant(nom, arguments))
+        return
+
+    transaction.on_commit(lambda: Tache.objects.create(
+        nom=nom, arguments=arguments, max_tentatives=REGISTRE[nom]['max_tentatives'],
+    ))
+
+
+def executer_maintenant(nom, arguments):
+    try:
+        REGISTRE[nom]['fonction'](**arguments)
+    except Exception:
+        logger.exception("Échec de la tâche %s", nom)
+        if REGISTRE[nom]['en_echec']:
+            REGISTRE[nom]['en_echec'](**arguments)
+
+
+def identifiant_worker():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def liberer_expirees():
+    """Remet en file les tâches dont le worker a disparu en cours d'exécution."""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'TACHES_VERROU_EXPIRATION', 600))
+    return Tache.objects.filter(statut=Tache.EN_COURS, verrouille_le__lt=limite).update(
+        statut=Tache.EN_ATTENTE, verrouille_par='',
+    )
+
+
+def purger(jours=None, lot=1000):
+    """
+    Supprime, par lots, les tâches terminées ou en échec depuis plus de
+    ``jours`` jours (``TACHES_RETENTION_JOURS`` par défaut). Retourne le
+    nombre de tâches supprimées.
+    """
+    if jours is None:
+        jours = getattr(settings, 'TACHES_RETENTION_JOURS', 7)
+    limite = timezone.now() - timedelta(days=jours)
+    anciennes = Tache.objects.filter(statut__in=(Tache.TERMINEE, Tache.ECHEC), date_maj__lt=limite)
+    supprimees = 0
+    # Lots bornés : pas de verrou long sur la table pendant que les workers réservent
+    while pks := list(anciennes.values_list('pk', flat=True)[:lot]):
+        supprimees += Tache.objects.filter(pk__in=pks).delete()[0]
+    return supprimees
+
+
+def reserver(worker, limite=10):
+    """Réserve jusqu'à ``limite`` tâches prêtes pour ``worker`` et les retourne."""
+    maintenant = timezone.now()
+    candidates = list(
+        Tache.objects.filter(statut=Tache.EN_ATTENTE, executer_apres__lte=maintenant)
+        .order_by('executer_apres', 'id').values_list('pk', flat=True)[:limite]
+    )
+    reservees = []
+    for pk in candidates:
+        # Un seul worker voit une ligne modifiée : les autres passent à la suivante
+        if Tache.objects.filter(pk=pk, statut=Tache.EN_ATTENTE).update(
+            statut=Tache.EN_COURS, verrouille_par=worker, verrouille_le=maintenant,
+            tentatives=F('tentatives') + 1,
+        ):
+            reservees.append(pk)
+    return list(Tache.objects.filter(pk__in=reservees).order_by('executer_apres', 'id'))
+
+
+def executer(tache_obj):
+    """Exécute une tâche réservée et enregistre son résultat."""
+    definition = REGISTRE.get(tache_obj.nom)
+    try:
+        if definition is None:
+            raise TacheInconnue(tache_obj.nom)
+        definition['fonction'](**tache_obj.arguments)
+    except Exception:
+        erreur = traceback.format_exc()
+        logger.warning("Tâche %s #%s en erreur (tentative %d/%d)", tache_obj.nom, tache_obj.pk,
+                       tache_obj.tentatives, tache_obj.max_tentatives)
+        if definition is not None and tache_obj.tentatives < tache_obj.max_tentatives:
+            # Délai croissant : 30 s, 60 s, 120 s...
+            delai = getattr(settings, 'TACHES_DELAI_RETRY', 30) * 2 ** (tache_obj.tentatives - 1)
+            Tache.objects.filter(pk=tache_obj.pk).update(
+                statut=Tache.EN_ATTENTE, executer_apres=timezone.now() + timedelta(seconds=delai),
+                verrouille_par='', derniere_erreur=erreur, date_maj=timezone.now(),
+            )
+            return False
+        Tache.objects.filter(pk=tache_obj.pk).update(
+            statut=Tache.ECHEC, derniere_erreur=erreur, date_maj=timezone.now(),
+        )
+        if definition is not None and definition['en_echec']:
+            try:
+                definition['en_echec'](**tache_obj.arguments)
+            except Exception:
+                logger.exception("Échec du rappel en_echec de la tâche %s", tache_obj.nom)
+        return False
+
+    Tache.objects.filter(pk=tache_obj.pk).update(
+        statut=Tache.TERMINEE, derniere_erreur='', date_maj=timezone.now(),
+    )
+    return True
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from taches.file import executer, identifiant_worker, liberer_expirees, purger, reserver
+
+# Purge des anciennes tâches terminées, au plus une fois par heure
+INTERVALLE_PURGE = 3600
+
+
+class Command(BaseCommand):
+    help = "Worker de la file de tâches locale : traite les tâches en attente, en boucle ou une seule fois."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--une-fois', action='store_true', help="Vide la file puis s'arrête")
+        parser.add_argument('--intervalle', type=float, default=1.0,
+                            help="Attente en secondes lorsque la file est vide")
+        parser.add_argument('--lot', type=int, default=10, help="Nombre de tâches réservées à la fois")
+
+    def handle(self, *args, **options):
+        worker = identifiant_worker()
+        self.stdout.write(f"Worker {worker} démarré.")
+        reussies = echouees = 0
+        derniere_purge = None
+        try:
+            while True:
+                close_old_connections()
+                liberer_expirees()
+                if derniere_purge is None or time.monotonic() - derniere_purge > INTERVALLE_PURGE:
+                    purger()
+                    derniere_purge = time.monotonic()
+                lot = reserver(worker, options['lot'])
+                for tache in lot:
+                    if executer(tache):
+                        reussies += 1
+                    else:
+                        echouees += 1
+                if not lot:
+                    if options['une_fois']:
+                        break
+                    time.sleep(options['intervalle'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"{reussies} tâche(s) réussie(s), {echouees} en erreur."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from taches.file import purger
+
+
+class Command(BaseCommand):
+    help = "Supprime les tâches terminées ou en échec plus anciennes que la durée de conservation."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=None,
+                            help="Durée de conservation en jours (TACHES_RETENTION_JOURS par défaut)")
+        parser.add_argument('--lot', type=int, default=1000, help="Nombre de tâches supprimées par requête")
+
+    def handle(self, *args, **options):
+        supprimees = purger(options['jours'], options['lot'])
+        self.stdout.write(self.style.SUCCESS(f"{supprimees} tâche(s) supprimée(s)."))
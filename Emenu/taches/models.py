@@ -0,0 +1,40 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tache(models.Model):
+    EN_ATTENTE = 'en_attente'
+    EN_COURS = 'en_cours'
+    TERMINEE = 'terminee'
+    ECHEC = 'echec'
+    STATUT_CHOICES = [
+        (EN_ATTENTE, 'En attente'),
+        (EN_COURS, 'En cours'),
+        (TERMINEE, 'Terminée'),
+        (ECHEC, 'Échec'),
+    ]
+
+    nom = models.CharField(max_length=100)
+    arguments = models.JSONField(default=dict, blank=True)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default=EN_ATTENTE)
+    tentatives = models.PositiveSmallIntegerField(default=0)
+    max_tentatives = models.PositiveSmallIntegerField(default=3)
+    executer_apres = models.DateTimeField(default=timezone.now)
+    verrouille_par = models.CharField(max_length=100, blank=True)
+    verrouille_le = models.DateTimeField(null=True, blank=True)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Tâche"
+        verbose_name_plural = "Tâches"
+        indexes = [
+            # Sélection des tâches prêtes par le worker
+            models.Index(fields=['statut', 'executer_apres'], name='tache_pretes_idx'),
+            # Purge des tâches terminées ou en échec anciennes
+            models.Index(fields=['statut', 'date_maj'], name='tache_purge_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} #{self.pk} ({self.get_statut_display()})"
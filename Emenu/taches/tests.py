@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .file import executer, liberer_expirees, planifier, purger, reserver, tache
+from .models import Tache
+
+APPELS = []
+
+
+def noter_echec(valeur, echecs):
+    APPELS.append(('en_echec', valeur))
+
+
+@tache('tests.instable', max_tentatives=3, en_echec=noter_echec)
+def instable(valeur, echecs):
+    """Échoue lors des ``echecs`` premières tentatives."""
+    APPELS.append(('appel', valeur))
+    if sum(1 for nature, v in APPELS if nature == 'appel' and v == valeur) <= echecs:
+        raise RuntimeError(f"échec {valeur}")
+
+
+@override_settings(TACHES_ASYNC=True, TACHES_DELAI_RETRY=30)
+class FileTachesTests(TestCase):
+    def setUp(self):
+        APPELS.clear()
+
+    def planifier(self, **arguments):
+        with self.captureOnCommitCallbacks(execute=True):
+            planifier('tests.instable', **arguments)
+        return Tache.objects.latest('pk')
+
+    def rendre_prete(self, tache_obj):
+        Tache.objects.filter(pk=tache_obj.pk).update(executer_apres=timezone.now())
+
+    def executer_une(self):
+        lot = reserver('worker-test')
+        self.assertEqual(len(lot), 1)
+        return executer(lot[0])
+
+    def test_reussite(self):
+        tache_obj = self.planifier(valeur='a', echecs=0)
+        self.assertEqual(tache_obj.max_tentatives, 3)
+        self.assertTrue(self.executer_une())
+        tache_obj.refresh_from_db()
+        self.assertEqual((tache_obj.statut, tache_obj.tentatives), (Tache.TERMINEE, 1))
+
+    def test_nouvelle_tentative_avec_delai_croissant(self):
+        tache_obj = self.planifier(valeur='b', echecs=2)
+        avant = timezone.now()
+        self.assertFalse(self.executer_une())
+        tache_obj.refresh_from_db()
+        self.assertEqual((tache_obj.statut, tache_obj.tentatives, tache_obj.verrouille_par),
+                         (Tache.EN_ATTENTE, 1, ''))
+        self.assertIn('échec b', tache_obj.derniere_erreur)
+        self.assertGreaterEqual(tache_obj.executer_apres, avant + timedelta(seconds=30))
+        # Pas encore prête : aucun worker ne la réserve
+        self.assertEqual(reserver('worker-test'), [])
+
+        self.rendre_prete(tache_obj)
+        debut = timezone.now()
+        self.assertFalse(self.executer_une())
+        tache_obj.refresh_from_db()
+        self.assertGreaterEqual(tache_obj.executer_apres, debut + timedelta(seconds=60))
+
+        self.rendre_prete(tache_obj)
+        self.assertTrue(self.executer_une())
+        tache_obj.refresh_from_db()
+        self.assertEqual((tache_obj.statut, tache_obj.tentatives, tache_obj.derniere_erreur),
+                         (Tache.TERMINEE, 3, ''))
+        self.assertNotIn(('en_echec', 'b'), APPELS)
+
+    def test_echec_definitif(self):
+        tache_obj = self.planifier(valeur='c', echecs=5)
+        for _ in range(3):
+            self.rendre_prete(tache_obj)
+            self.assertFalse(self.executer_une())
+        tache_obj.refresh_from_db()
+        self.assertEqual((tache_obj.statut, tache_obj.tentatives), (Tache.ECHEC, 3))
+        self.assertEqual(APPELS.count(('en_echec', 'c')), 1)
+        self.assertEqual(reserver('worker-test'), [])
+
+    def test_tache_inconnue(self):
+        tache_obj = Tache.objects.create(nom='tests.inconnue', arguments={})
+        self.assertFalse(self.executer_une())
+        tache_obj.refresh_from_db()
+        self.assertEqual(tache_obj.statut, Tache.ECHEC)
+        self.assertIn('TacheInconnue', tache_obj.derniere_erreur)
+
+    def test_reservation_exclusive(self):
+        self.planifier(valeur='d', echecs=0)
+        self.assertEqual(len(reserver('worker-1')), 1)
+        self.assertEqual(reserver('worker-2'), [])
+
+    def test_liberation_des_taches_abandonnees(self):
+        tache_obj = self.planifier(valeur='e', echecs=0)
+        reserver('worker-disparu')
+        Tache.objects.filter(pk=tache_obj.pk).update(verrouille_le=timezone.now() - timedelta(hours=1))
+        self.assertEqual(liberer_expirees(), 1)
+        tache_obj.refresh_from_db()
+        self.assertEqual(tache_obj.statut, Tache.EN_ATTENTE)
+        self.assertTrue(self.executer_une())
+
+    def test_purge(self):
+        ancienne = timezone.now() - timedelta(days=30)
+        for statut in (Tache.TERMINEE, Tache.ECHEC, Tache.EN_ATTENTE):
+            Tache.objects.create(nom='tests.instable', statut=statut)
+        Tache.objects.update(date_maj=ancienne)
+        recente = Tache.objects.create(nom='tests.instable', statut=Tache.TERMINEE)
+        self.assertEqual(purger(jours=7, lot=1), 2)
+        self.assertEqual(set(Tache.objects.values_list('statut', flat=True)), {Tache.EN_ATTENTE, Tache.TERMINEE})
+        self.assertTrue(Tache.objects.filter(pk=recente.pk).exists())